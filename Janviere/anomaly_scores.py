@@ -0,0 +1,136 @@
+"""
+Robust z-score screening of suspicious trips, per pickup hour x distance category.
+
+Each trip is compared with the trips of its group (pickup_hour x distance_category)
+on duration, distance and speed. The comparison uses the modified z-score
+    z = 0.6745 * (x - group median) / group MAD
+and a trip is flagged when its largest |z| exceeds ANOMALY_Z_THRESHOLD (3.5, the
+Iglewicz-Hoaglin cutoff). The reason code names the feature behind that largest |z|
+and its direction (e.g. 'slow_speed').
+
+The features are right-skewed and multiplicative, so they are scored on the log scale:
+a trip five times longer than usual scores like one five times shorter. Values are
+clipped to [LOG_FLOOR, LOG_CEILING] first, so zero distances/speeds get the lowest bucket.
+
+AnomalyStats keeps, per feature, a dense (group x log bucket) count table with buckets
+LOG_BUCKET_WIDTH wide (about 2% apart). update() is one np.bincount per feature, and
+tables built on separate chunks or workers are combined with merge() (a sum). baseline()
+turns the table into per-group medians and MADs without looping over groups: the median
+comes from a row-wise cumsum, and the MAD from the same counts sorted by distance to the median.
+Both are exact to within one bucket. The MAD is floored at one bucket width, and groups with fewer
+than ANOMALY_MIN_GROUP_TRIPS trips are not scored. The resulting AnomalyBaseline is a
+few small arrays, cheap to ship to worker processes, and scores any number of rows with
+fancy indexing.
+"""
+
+import numpy as np
+
+ANOMALY_FEATURES = ('trip_duration', 'trip_distance_km', 'trip_speed_kmh')
+# Reason codes, two per feature in ANOMALY_FEATURES order: (above the group, below the group)
+ANOMALY_REASONS = ('long_duration', 'short_duration', 'long_distance', 'short_distance', 'high_speed', 'low_speed')
+ANOMALY_Z_THRESHOLD = 3.5
+ANOMALY_MIN_GROUP_TRIPS = 30
+MAD_TO_Z = 0.6745          # MAD of a normal distribution, in standard deviations
+
+LOG_FLOOR = 1e-3           # seconds, km and km/h below this share the first bucket
+LOG_CEILING = 1e7
+LOG_BUCKET_WIDTH = 0.02
+_LOG_MIN = np.log(LOG_FLOOR)
+N_LOG_BUCKETS = int(np.ceil((np.log(LOG_CEILING) - _LOG_MIN) / LOG_BUCKET_WIDTH)) + 1
+_BUCKET_CENTERS = _LOG_MIN + (np.arange(N_LOG_BUCKETS) + 0.5) * LOG_BUCKET_WIDTH
+
+
+def log_values(values):
+    # Natural log of the clipped values (NaN stays NaN)
+    return np.log(np.clip(np.asarray(values, dtype=np.float64), LOG_FLOOR, LOG_CEILING))
+
+
+class AnomalyStats:
+    def __init__(self, n_groups, features=ANOMALY_FEATURES):
+        self.n_groups = n_groups
+        self.features = tuple(features)
+        self.counts = {feature: np.zeros((n_groups, N_LOG_BUCKETS), dtype=np.int64) for feature in self.features}
+
+    @property
+    def trips(self):
+        # Trips per group (of the first feature; rows with a NaN feature are not counted for it)
+        return self.counts[self.features[0]].sum(axis=1)
+
+    def update(self, groups, values):
+        # Add a batch: groups are codes in [0, n_groups), values maps each feature to an array
+        groups = np.asarray(groups, dtype=np.int64)
+        for feature in self.features:
+            logs = log_values(values[feature])
+            valid = ~np.isnan(logs) & (groups >= 0) & (groups < self.n_groups)
+            buckets = ((logs[valid] - _LOG_MIN) / LOG_BUCKET_WIDTH).astype(np.int64)
+            cells = groups[valid] * N_LOG_BUCKETS + np.minimum(buckets, N_LOG_BUCKETS - 1)
+            self.counts[feature] += np.bincount(cells, minlength=self.n_groups * N_LOG_BUCKETS).reshape(
+                self.n_groups, N_LOG_BUCKETS)
+        return self
+
+    def merge(self, other):
+        if other.n_groups != self.n_groups or other.features != self.features:
+            raise ValueError("Cannot merge anomaly statistics over different groups or features")
+        for feature in self.features:
+            self.counts[feature] += other.counts[feature]
+        return self
+
+    def baseline(self, min_group_trips=ANOMALY_MIN_GROUP_TRIPS):
+        # Per-group log-scale medians and z-score scales of every feature
+        medians = np.full((len(self.features), self.n_groups), np.nan)
+        scales = np.full((len(self.features), self.n_groups), np.nan)
+        for i, feature in enumerate(self.features):
+            counts = self.counts[feature]
+            scored = counts.sum(axis=1) >= max(min_group_trips, 1)
+            median = _weighted_median(np.broadcast_to(_BUCKET_CENTERS, counts.shape), counts)
+            deviations = np.abs(_BUCKET_CENTERS[None, :] - median[:, None])
+            order = np.argsort(deviations, axis=1, kind='stable')
+            mad = _weighted_median(np.take_along_axis(deviations, order, axis=1),
+                                   np.take_along_axis(counts, order, axis=1))
+            medians[i, scored] = median[scored]
+            scales[i, scored] = np.maximum(mad[scored], LOG_BUCKET_WIDTH) / MAD_TO_Z
+        return AnomalyBaseline(self.features, medians, scales)
+
+
+class AnomalyBaseline:
+    def __init__(self, features, medians, scales):
+        # medians/scales: (feature, group) arrays on the log scale; NaN for unscored groups
+        self.features = tuple(features)
+        self.medians = medians
+        self.scales = scales
+
+    def z_scores(self, groups, values):
+        # (feature, row) robust z-scores; NaN where the group is unscored or the value is missing
+        groups = np.asarray(groups, dtype=np.int64)
+        known = (groups >= 0) & (groups < self.medians.shape[1])
+        safe_groups = np.where(known, groups, 0)
+        z = np.empty((len(self.features), len(groups)))
+        for i, feature in enumerate(self.features):
+            z[i] = (log_values(values[feature]) - self.medians[i, safe_groups]) / self.scales[i, safe_groups]
+        z[:, ~known] = np.nan
+        return z
+
+    def score(self, groups, values, threshold=ANOMALY_Z_THRESHOLD):
+        # Per row: anomaly score (largest |z|, NaN if unscored), reason code index into
+        # ANOMALY_REASONS (-1 if not flagged) and the flagged mask (score > threshold)
+        z = self.z_scores(groups, values)
+        magnitude = np.abs(z)
+        unscored = np.isnan(magnitude).all(axis=0)
+        strongest = np.argmax(np.where(np.isnan(magnitude), -1.0, magnitude), axis=0)
+        columns = np.arange(z.shape[1])
+        score = np.where(unscored, np.nan, magnitude[strongest, columns])
+        flagged = score > threshold
+        reason = np.where(flagged, 2 * strongest + (z[strongest, columns] < 0), -1)
+        return score.astype(np.float32), reason.astype(np.int8), flagged
+
+
+def _weighted_median(values, counts):
+    # Row-wise median of values (each row sorted ascending) repeated counts times;
+    # the mean of the two middle values for even counts
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1]
+    middle = []
+    for rank in ((total - 1) // 2, total // 2):
+        position = np.argmax(cumulative > rank[:, None], axis=1)
+        middle.append(np.take_along_axis(values, position[:, None], axis=1)[:, 0])
+    return np.where(total > 0, (middle[0] + middle[1]) / 2, np.nan)
@@ -0,0 +1,91 @@
+"""
+Benchmark the cleaning pipeline on synthetic NYC-like trip data.
+
+Usage:
+    python benchmark.py                          # 100k, 1M and 10M rows, eager pipeline
+    python benchmark.py --sizes 100000 --mode chunks --report bench/report.json
+    python benchmark.py --sizes 1000000 --mode lazy   # eager chain run through the lazy planner
+
+For every size a synthetic train.csv is written (streamed, so 10M rows never sit in
+memory at once), the pipeline runs with a StageProfiler attached, and per-stage wall
+time, CPU time, peak RSS and rows in/out are printed and collected into one JSON report.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+from cleaning_script import TrainDataCleaner
+from pipeline_profiler import StageProfiler
+from synthetic_trips import write_synthetic_trips
+
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def run_pipeline(input_csv, output_dir, mode, chunksize, workers):
+    cleaner = TrainDataCleaner(input_csv, profiler=StageProfiler())
+    output_csv = os.path.join(output_dir, 'train_cleaned.csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'chunks':
+            cleaner.clean_in_chunks(output_csv, chunksize=chunksize)
+        elif mode == 'parallel':
+            cleaner.clean_in_parallel(output_csv, workers=workers)
+        else:
+            # lazy: the same chain planned by pipeline_plan before it runs
+            pipeline = cleaner.lazy() if mode == 'lazy' else cleaner
+            (pipeline
+             .load_data()
+             .handle_missing_values()
+             .parse_datetime_columns()
+             .remove_duplicates()
+             .validate_data_integrity()
+             .validate_trip_durations()
+             .detect_outliers()
+             .handle_outliers(method='cap')
+             .normalize_data()
+             .create_derived_features()
+             .create_idle_features()
+             .score_anomalies()
+             .validate_derived_features()
+             .save_cleaned_data(output_csv))
+            if mode == 'lazy':
+                pipeline.collect()
+    return cleaner.profiler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TrainDataCleaner on synthetic trip data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="row counts to benchmark")
+    parser.add_argument('--mode', choices=['eager', 'lazy', 'chunks', 'parallel'], default='eager')
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--workdir', default=None, help="where synthetic inputs/outputs go (default: temp dir)")
+    parser.add_argument('--report', default='benchmark_report.json', help="JSON report path")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for n_rows in args.sizes:
+            input_csv = os.path.join(workdir, f'train_{n_rows}.csv')
+            print(f"\nGenerating {n_rows} synthetic trips...")
+            write_synthetic_trips(input_csv, n_rows)
+
+            print(f"Running {args.mode} pipeline...")
+            profiler = run_pipeline(input_csv, os.path.join(workdir, f'out_{n_rows}'), args.mode,
+                                    args.chunksize, args.workers)
+            profiler.print_summary()
+            report = profiler.report()
+            report.update({'rows': n_rows, 'mode': args.mode})
+            results.append(report)
+            os.remove(input_csv)
+
+    with open(args.report, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nBenchmark report saved to: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
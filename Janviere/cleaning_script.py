@@ -17,33 +17,344 @@ from datetime import datetime  # this will deal with date and time, this also ca
 import warnings           #during data operation this can help in controlling warning messages 
 import math               # offers mathematical operations 
 import os                 # file system operations for saving outputs
+import shutil
+import io
+import time
+import contextlib
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
+from quantile_sketch import QuantileSketch
+from table_writer import TableWriter, output_path_for, read_output_version, write_output_version
+from incremental_state import IncrementalState, file_content_hash
+from dedup_index import DedupIndex, duplicated, duplicated_rows, fingerprint, trip_id_keys
+from pipeline_profiler import StageProfiler, profile_stage
+from pipeline_plan import ALL_COLUMNS, LazyPipeline, StageSpec
+from exclusion_log import REASON_COLUMN, ExclusionLog
+from rollup_cube import ROLLUP_FILE, RollupCube
+from od_matrix import OD_MATRIX_FILE, OD_ZONE_ZOOM, ODMatrix
+from spatial_index import cell_codes
+from timestamps import calendar_features, datetime_seconds, parse_timestamps
+from summary_stats import SummaryStats
+from sort_index import SORT_INDEX_SOURCE_COLUMNS, build_sort_index, sort_index_path_for
+from anomaly_scores import ANOMALY_FEATURES, ANOMALY_REASONS, ANOMALY_Z_THRESHOLD, AnomalyStats
+from trip_query_api import read_cleaned_data
+
+
+# Per-record transparency logs written next to the cleaned data (log name -> file name).
+# Stages record row numbers in TrainDataCleaner.exclusions; the rows are read back from
+# the source file when the logs are saved (see exclusion_log)
+TRANSPARENCY_LOG_FILES = {
+    'invalid_records': 'excluded_invalid_records.csv',
+    'capped_records': 'capped_trip_durations.csv',
+    'removed_missing_records': 'removed_missing_rows.csv',
+    'removed_exact_duplicates': 'removed_exact_duplicates.csv',
+    'removed_id_duplicates': 'removed_id_duplicates.csv',
+    'duration_mismatch_records': 'duration_mismatch_records.csv',
+    'suspicious_trips': 'suspicious_trips.csv',
+}
+
+# Largest accepted gap (seconds) between trip_duration and dropoff - pickup
+DURATION_TOLERANCE_SECONDS = 60
+
+# Declared dtypes for typed loading (float32 coordinates, small nullable ints, categoricals).
+# Nullable Int types keep rows with missing values loadable so handle_missing_values can log them.
+TRAIN_SCHEMA = {
+    'id': 'string',
+    'vendor_id': 'Int8',
+    'passenger_count': 'Int8',
+    'pickup_longitude': 'float32',
+    'pickup_latitude': 'float32',
+    'dropoff_longitude': 'float32',
+    'dropoff_latitude': 'float32',
+    'store_and_fwd_flag': 'category',
+    'trip_duration': 'Int32',
+    'fare_amount': 'float32',
+    'tip_amount': 'float32',
+}
+DATETIME_COLUMNS = ['pickup_datetime', 'dropoff_datetime']
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def read_train_csv(filepath, schema=TRAIN_SCHEMA, engine=None, **kwargs):
+    # Schema-driven read_csv: declared dtypes, datetimes parsed at load with an explicit
+    # format, and columns outside the schema pruned with usecols.
+    # engine='pyarrow' uses the multi-threaded Arrow parser (not available with chunksize).
+    header = pd.read_csv(filepath, nrows=0).columns
+    if hasattr(filepath, 'seek'):
+        filepath.seek(0)
+    datetime_cols = [col for col in DATETIME_COLUMNS if col in header]
+    usecols = [col for col in header if col in schema or col in datetime_cols]
+    dtypes = {col: dtype for col, dtype in schema.items() if col in usecols}
+
+    df = pd.read_csv(filepath, engine=engine, usecols=usecols, dtype=dtypes,
+                     parse_dates=datetime_cols, date_format=DATETIME_FORMAT, **kwargs)
+    if engine == 'pyarrow':
+        # Arrow returns usecols in list order; keep the file's column order
+        df = df[[col for col in header if col in df.columns]]
+    return df
+
+
+# Default NYC bounding box used by the coordinate range rules
+NYC_BOUNDING_BOX = {'lat_min': 40.4, 'lat_max': 41.0, 'lon_min': -74.3, 'lon_max': -73.7}
+
+# Declarative integrity rules: (rule name, description, conditions OR-ed together).
+# A condition is (column, comparison, right-hand side); the right-hand side is a number,
+# another column name, or a NYC_BOUNDING_BOX key.
+VALIDATION_RULES = [
+    ('invalid_duration', 'Invalid trip duration (<=0)', [('trip_duration', 'le', 0)]),
+    ('invalid_time_order', 'Invalid time order (dropoff <= pickup)',
+     [('dropoff_datetime', 'le', 'pickup_datetime')]),
+    ('invalid_passengers', 'Invalid passenger count',
+     [('passenger_count', 'le', 0), ('passenger_count', 'gt', 8)]),
+    ('invalid_pickup_latitude', 'Pickup latitude outside bounding box',
+     [('pickup_latitude', 'lt', 'lat_min'), ('pickup_latitude', 'gt', 'lat_max')]),
+    ('invalid_pickup_longitude', 'Pickup longitude outside bounding box',
+     [('pickup_longitude', 'lt', 'lon_min'), ('pickup_longitude', 'gt', 'lon_max')]),
+    ('invalid_dropoff_latitude', 'Dropoff latitude outside bounding box',
+     [('dropoff_latitude', 'lt', 'lat_min'), ('dropoff_latitude', 'gt', 'lat_max')]),
+    ('invalid_dropoff_longitude', 'Dropoff longitude outside bounding box',
+     [('dropoff_longitude', 'lt', 'lon_min'), ('dropoff_longitude', 'gt', 'lon_max')]),
+    ('zero_coordinates', 'Zero coordinates',
+     [('pickup_latitude', 'eq', 0), ('pickup_longitude', 'eq', 0),
+      ('dropoff_latitude', 'eq', 0), ('dropoff_longitude', 'eq', 0)]),
+]
+
+_COMPARISONS = {'lt': np.less, 'le': np.less_equal, 'gt': np.greater, 'ge': np.greater_equal, 'eq': np.equal}
+
+
+def evaluate_validation_rules(df, rules=VALIDATION_RULES, bounding_box=NYC_BOUNDING_BOX, with_reasons=False):
+    # Single fused pass over the rule table using three preallocated boolean buffers.
+    # Returns (combined invalid mask, per-rule violation counts), plus with_reasons=True a
+    # uint64 bitmask per row with bit i set when the row breaks rules[i].
+    n_rows = len(df)
+    combined = np.zeros(n_rows, dtype=bool)
+    rule_mask = np.empty(n_rows, dtype=bool)
+    condition_mask = np.empty(n_rows, dtype=bool)
+    reasons = np.zeros(n_rows, dtype=np.uint64) if with_reasons else None
+    columns = {}
+    counts = {}
+
+    def column(name):
+        if name not in columns:
+            columns[name] = df[name].to_numpy()
+        return columns[name]
+
+    for bit, (name, _, conditions) in enumerate(rules):
+        rule_mask.fill(False)
+        for col, comparison, rhs in conditions:
+            if isinstance(rhs, str):
+                rhs = bounding_box[rhs] if rhs in bounding_box else column(rhs)
+            _COMPARISONS[comparison](column(col), rhs, out=condition_mask)
+            np.logical_or(rule_mask, condition_mask, out=rule_mask)
+        counts[name] = int(np.count_nonzero(rule_mask))
+        np.logical_or(combined, rule_mask, out=combined)
+        if with_reasons and counts[name]:
+            reasons[rule_mask] |= np.uint64(1 << bit)
+
+    if with_reasons:
+        return combined, pd.Series(counts, dtype='int64'), reasons
+    return combined, pd.Series(counts, dtype='int64')
+
+
+# Columns added by create_derived_features (fare columns only when fare data is present)
+DERIVED_COLUMNS = (
+    'trip_distance_km', 'trip_duration_hours', 'trip_speed_kmh', 'trip_efficiency',
+    'pickup_day_of_week', 'pickup_hour', 'pickup_month',
+    'trip_duration_category', 'distance_category', 'speed_category',
+    'pickup_cell', 'dropoff_cell', 'fare_per_km', 'fare_per_min', 'tip_percentage',
+)
+COORDINATE_COLUMNS = ('pickup_longitude', 'pickup_latitude', 'dropoff_longitude', 'dropoff_latitude')
+DISTANCE_CATEGORY_BINS = [0, 1, 3, 5, 10, float('inf')]
+DISTANCE_CATEGORY_LABELS = ['Very Short (0-1km)', 'Short (1-3km)', 'Medium (3-5km)',
+                            'Long (5-10km)', 'Very Long (10km+)']
+# Anomaly scoring groups: pickup hour x distance category (zero distances count as the shortest)
+ANOMALY_GROUPS = 24 * len(DISTANCE_CATEGORY_LABELS)
+# Columns covered by the summary statistics (see summary_stats)
+SUMMARY_NUMERIC_COLUMNS = ('trip_duration', 'passenger_count') + COORDINATE_COLUMNS + (
+    'trip_distance_km', 'trip_speed_kmh', 'trip_efficiency')
+SUMMARY_CATEGORY_COLUMNS = ('vendor_id', 'store_and_fwd_flag')
+SUMMARY_DATETIME_COLUMNS = ('pickup_datetime',)
+_RULE_COLUMNS = tuple(sorted(
+    {col for _, _, conditions in VALIDATION_RULES for col, _, _ in conditions}
+    | {rhs for _, _, conditions in VALIDATION_RULES for _, _, rhs in conditions
+       if isinstance(rhs, str) and rhs not in NYC_BOUNDING_BOX}))
+
+# Stage table for lazy pipelines (see pipeline_plan).
+# parse_datetime_columns is not row-local: without a format, pandas infers it from the first row.
+# handle_outliers takes its bounds from all rows. build_rollups only reads the frame, so it counts as a report.
+# normalize_data is not row-local either: vendor_id/store_and_fwd_flag get the categories found in the frame.
+PIPELINE_STAGES = {
+    'load_data': StageSpec('source', writes=ALL_COLUMNS, parses=DATETIME_COLUMNS, parse_option='typed'),
+    'basic_info': StageSpec('report'),
+    'check_missing_values': StageSpec('report'),
+    'handle_missing_values': StageSpec('filter', reads=ALL_COLUMNS),
+    'parse_datetime_columns': StageSpec('transform', writes=DATETIME_COLUMNS, parses=DATETIME_COLUMNS),
+    'check_duplicates': StageSpec('report'),
+    'remove_duplicates': StageSpec('filter', reads=ALL_COLUMNS),
+    'validate_data_integrity': StageSpec('filter', reads=_RULE_COLUMNS, row_local=True),
+    'validate_trip_durations': StageSpec('filter', reads=('trip_duration',) + tuple(DATETIME_COLUMNS),
+                                         writes=('duration_mismatch',), row_local=True),
+    'detect_outliers': StageSpec('report'),
+    'handle_outliers': StageSpec('transform', reads=('trip_duration',), writes=('trip_duration',)),
+    'normalize_data': StageSpec('transform',
+                                writes=COORDINATE_COLUMNS + tuple(DATETIME_COLUMNS) + (
+                                    'passenger_count', 'trip_duration', 'vendor_id', 'store_and_fwd_flag'),
+                                parses=DATETIME_COLUMNS, parse_option='parse_datetimes'),
+    'create_derived_features': StageSpec('transform', reads=COORDINATE_COLUMNS + (
+                                             'trip_duration', 'pickup_datetime', 'fare_amount', 'tip_amount'),
+                                         writes=DERIVED_COLUMNS, row_local=True),
+    'create_idle_features': StageSpec('transform', reads=('vendor_id',) + tuple(DATETIME_COLUMNS),
+                                      writes=('pickup_gap_sec', 'idle_time_sec')),
+    'score_anomalies': StageSpec('transform', reads=('trip_duration', 'trip_distance_km', 'trip_speed_kmh',
+                                                     'pickup_hour'),
+                                 writes=('anomaly_score', 'anomaly_reason')),
+    'validate_derived_features': StageSpec('report'),
+    'build_rollups': StageSpec('report'),
+    'build_od_matrix': StageSpec('report'),
+    'create_summary_statistics': StageSpec('report'),
+    'build_sort_index': StageSpec('report'),
+    'save_cleaned_data': StageSpec('sink'),
+    'save_transparency_logs': StageSpec('sink'),
+    'print_cleaning_summary': StageSpec('report'),
+}
+
+# Column run_row_local keeps the rows' positions in
+_ROW_POSITION = '_row_position'
+
+# Adjacent stages that share one computation when run lazily: (first, second, keyword, function of the frame).
+# Runs of row-local stages are fused separately (see run_row_local).
+FUSED_STAGES = [
+    ('check_missing_values', 'handle_missing_values', 'isnull', lambda df: df.isnull()),
+    ('check_duplicates', 'remove_duplicates', 'keys', fingerprint),
+]
 
 class TrainDataCleaner:
-    def __init__(self, filepath):
+    def __init__(self, filepath, quantile_accuracy=None, bounding_box=None, profiler=None, od_zoom=OD_ZONE_ZOOM):
         self.filepath = filepath
+        # Optional StageProfiler (or True for a default one) recording per-stage time/memory/rows
+        self.profiler = StageProfiler() if profiler is True else profiler
+        self.bounding_box = dict(NYC_BOUNDING_BOX, **(bounding_box or {}))
+        self.validation_counts = None
+        # None = exact quantiles; e.g. 0.01 = sketch quantiles within 1% relative error
+        self.quantile_accuracy = quantile_accuracy
+        self.quantile_sketches = {}
         self.df = None
         self.original_shape = None
         self.cleaning_log = []
-        self.invalid_records = None
-        self.capped_records = None
-        self.removed_missing_records = None
-        self.removed_exact_duplicates = None
-        self.removed_id_duplicates = None
+        # Row numbers of removed/capped rows per transparency log (see exclusion_log)
+        self.exclusions = self._new_exclusion_log()
+        # Transparency logs to record; a stage records nothing for a log left out here
+        self.keep_logs = set(TRANSPARENCY_LOG_FILES)
+        self.rows_written = None
+        self.chunk_ids = None
+        self.trip_id_keys = None
+        self.new_ids = None
+        self.stream_sketches = None
+        self.written_path = None
+        self.rollups = None
+        # Zone grid zoom for the origin-destination matrix (see od_matrix)
+        self.od_zoom = od_zoom
+        self.od_matrix = None
+        # Group medians/MADs the anomaly scores were taken against (see anomaly_scores)
+        self.anomaly_baseline = None
+        # SummaryStats of the cleaned rows and the frame it was computed from
+        # (None for streamed runs, which accumulate it chunk by chunk)
+        self.summary = None
+        self.summary_source = None
 
-    def load_data(self):
+    def lazy(self):
+        # Chain stages on the returned LazyPipeline as on the cleaner, then call .collect()
+        # to plan and run them (see pipeline_plan), or .explain() to print the plan
+        return LazyPipeline(self, PIPELINE_STAGES, FUSED_STAGES)
+
+    def run_row_local(self, stages):
+        # Run consecutive row-local stages (see PIPELINE_STAGES) as one pass: the stages work on a frame
+        # of only the columns they read or write, so their filters copy those columns alone; the other
+        # columns are gathered once at the end for the rows every filter kept.
+        # stages: (stage name, args, kwargs)
+        df = self.df
+        # Row positions in df travel with the rows, so gathering a column is a positional take
+        self.df = pd.DataFrame({_ROW_POSITION: np.arange(len(df))}, index=df.index)
+        for name, args, kwargs in stages:
+            reads = [col for col in PIPELINE_STAGES[name].reads if col in df.columns and col not in self.df.columns]
+            if reads:
+                self.df = pd.concat([self.df, self._gather(df, reads)], axis=1)
+            getattr(self, name)(*args, **kwargs)
+
+        rest = self._gather(df, df.columns.difference(self.df.columns, sort=False))
+        columns = self.df.drop(columns=_ROW_POSITION)
+        order = list(df.columns) + [col for col in columns.columns if col not in df.columns]
+        self.df = pd.concat([rest, columns], axis=1)[order]
+        return self
+
+    def _gather(self, df, columns):
+        # columns of df for the rows still in self.df (see run_row_local)
+        if len(self.df) == len(df):
+            return df[columns]
+        return df[columns].take(self.df[_ROW_POSITION].to_numpy())
+
+    @profile_stage
+    def load_data(self, typed=False, engine=None):
         # Loads the dataset
+        # typed=True uses the TRAIN_SCHEMA dtypes (see read_train_csv); engine='pyarrow' for the Arrow parser
         print("Loading train dataset...")
-        self.df = pd.read_csv(self.filepath)
+        start = time.perf_counter()
+        if typed:
+            self.df = read_train_csv(self.filepath, engine=engine)
+        else:
+            self.df = pd.read_csv(self.filepath, engine=engine)
+        load_seconds = time.perf_counter() - start
         self.original_shape = self.df.shape # .shape it a special attribute of dataframe that returns size of loaded data in tuple
         print(f"Original train dataset shape: {self.original_shape}")
         self.log_step(f"Original train dataset loaded: {self.original_shape[0]} rows, {self.original_shape[1]} columns")
+
+        memory_mb = self.df.memory_usage(deep=True).sum() / 1024**2
+        self.log_step(f"Load time: {load_seconds:.2f}s, memory usage: {memory_mb:.2f} MB")
+        if typed and len(self.df) > 0:
+            # Estimate the untyped footprint from a sample instead of loading the file twice
+            sample_rows = min(len(self.df), 10_000)
+            sample = pd.read_csv(self.filepath, nrows=sample_rows)
+            untyped_mb = sample.memory_usage(deep=True).sum() / sample_rows * len(self.df) / 1024**2
+            self.log_step(f"Untyped load would use ~{untyped_mb:.2f} MB "
+                          f"({(1 - memory_mb / untyped_mb) * 100:.0f}% saved by typed schema)")
         return self
     def log_step(self, message):
           # Log cleaning steps
           self.cleaning_log.append(f"{datetime.now().strftime('%H:%M:%S')} - {message}")
           print(message)
 
+    def _record_exclusions(self, log_name, mask, **columns):
+        # Record the source row numbers (frame index) of the masked rows in a transparency log;
+        # columns: extra per-row values for the log, aligned with the masked rows
+        if log_name in self.keep_logs:
+            mask = np.asarray(mask, dtype=bool)
+            self.exclusions.add(log_name, self.df.index.to_numpy()[mask], **columns)
+
+    def excluded_records(self, log_name):
+        # Rows of one transparency log read back from the source file (None if it is empty)
+        return self.exclusions.records(self.filepath, log_name, parse_dates=self._source_datetime_columns())
+
+    @staticmethod
+    def _new_summary():
+        return SummaryStats(SUMMARY_NUMERIC_COLUMNS, SUMMARY_CATEGORY_COLUMNS, SUMMARY_DATETIME_COLUMNS)
+
+    def _current_summary(self):
+        # One pass over self.df, shared by the report stages until the frame is replaced
+        if self.df is not None and self.summary_source is not self.df:
+            self.summary = self._new_summary().update(self.df)
+            self.summary_source = self.df
+        return self.summary
+
+    @staticmethod
+    def _new_exclusion_log():
+        return ExclusionLog({'invalid_records': [name for name, _, _ in VALIDATION_RULES]})
+
+    def _source_datetime_columns(self):
+        header = pd.read_csv(self.filepath, nrows=0).columns
+        return [col for col in DATETIME_COLUMNS if col in header]
+
+    @profile_stage
     def basic_info(self):
           # Dispaly basic info about train dataset
           print("\nTRAIN DATASET OVERVIEW: \n")
@@ -55,9 +366,11 @@ class TrainDataCleaner:
           print(self.df.head())
 
           return self
-    def check_missing_values(self):
+    @profile_stage
+    def check_missing_values(self, isnull=None):
+          # isnull: precomputed self.df.isnull(), shared with handle_missing_values in lazy pipelines
           print("\nMISSING VALUES ANALYSIS")
-          missing = self.df.isnull().sum()
+          missing = (isnull if isnull is not None else self.df.isnull()).sum()
           missing_pct = (missing / len(self.df)) * 100
 
           missing_df = pd.DataFrame({
@@ -77,18 +390,16 @@ class TrainDataCleaner:
           self.log_step(f"Missing values check completed")
           return self
     
-    def handle_missing_values(self):
+    @profile_stage
+    def handle_missing_values(self, isnull=None):
         print("\nHANDLING MISSING VALUES")
 
         initial_rows = len(self.df)
         
         # Remove rows with any missing values (since all columns are important for train trips)
-        try:
-            missing_mask = self.df.isnull().any(axis=1)
-            self.removed_missing_records = self.df[missing_mask].copy()
-        except Exception:
-            self.removed_missing_records = None
-        self.df = self.df.dropna()
+        missing_mask = (isnull if isnull is not None else self.df.isnull()).any(axis=1)
+        self._record_exclusions('removed_missing_records', missing_mask)
+        self.df = self.df[~missing_mask]
         
         rows_removed = initial_rows - len(self.df)
         if rows_removed > 0:
@@ -98,49 +409,54 @@ class TrainDataCleaner:
             
         return self
     
-    def check_duplicates(self):
+    @profile_stage
+    def check_duplicates(self, keys=None):
         print("\nDUPLICATE ANALYSIS")
     
+        # One hashing pass gives id, trip-signature and whole-row keys (see dedup_index);
+        # keys can be passed in to share that pass with remove_duplicates
+        if keys is None:
+            keys = fingerprint(self.df)
+
         # Check for exact duplicates
-        exact_duplicates = self.df.duplicated().sum()
+        exact_duplicates = duplicated_rows(self.df, keys['row']).sum()
         print(f"Exact duplicate rows: {exact_duplicates}")
         
         # Check for duplicate trip IDs
-        id_duplicates = self.df['id'].duplicated().sum()
+        id_duplicates = duplicated(keys['id']).sum()
         print(f"Duplicate trip IDs: {id_duplicates}")
         
         # Check for potential duplicate trips (same pickup/dropoff times and locations)
-        trip_duplicates = self.df.duplicated(subset=['pickup_datetime', 'dropoff_datetime', 
-                                                   'pickup_longitude', 'pickup_latitude',
-                                                   'dropoff_longitude', 'dropoff_latitude']).sum()
+        trip_duplicates = duplicated(keys['signature']).sum()
         print(f"Potential duplicate trips: {trip_duplicates}")
         
         self.log_step("Duplicate analysis completed")
         return self
     
-    def remove_duplicates(self):
+    @profile_stage
+    def remove_duplicates(self, keys=None):
         # Remove duplicate records
+        # keys: precomputed fingerprint(self.df), e.g. shared with check_duplicates
         print("\nREMOVING DUPLICATES")
         
         initial_rows = len(self.df)
+        if keys is None:
+            keys = fingerprint(self.df)
         
         # Remove exact duplicates
-        try:
-            exact_removed_mask = self.df.duplicated(keep='first')
-            self.removed_exact_duplicates = self.df[exact_removed_mask].copy()
-        except Exception:
-            self.removed_exact_duplicates = None
-        self.df = self.df.drop_duplicates()
+        exact_removed_mask = duplicated_rows(self.df, keys['row'])
+        self._record_exclusions('removed_exact_duplicates', exact_removed_mask)
+        self.df = self.df[~exact_removed_mask]
+        id_keys = keys['id'][~exact_removed_mask]
         exact_removed = initial_rows - len(self.df)
         
         # Remove duplicate IDs (keep first occurrence)
         initial_rows = len(self.df)
-        try:
-            id_removed_mask = self.df.duplicated(subset=['id'], keep='first')
-            self.removed_id_duplicates = self.df[id_removed_mask].copy()
-        except Exception:
-            self.removed_id_duplicates = None
-        self.df = self.df.drop_duplicates(subset=['id'])
+        id_removed_mask = duplicated(id_keys)
+        self._record_exclusions('removed_id_duplicates', id_removed_mask)
+        self.df = self.df[~id_removed_mask]
+        # Integer trip-ID keys of the kept rows, reused for cross-chunk/cross-file checks
+        self.trip_id_keys = id_keys[~id_removed_mask]
         id_removed = initial_rows - len(self.df)
         
         if exact_removed > 0:
@@ -152,13 +468,15 @@ class TrainDataCleaner:
             
         return self
     
+    @profile_stage
     def parse_datetime_columns(self):
         # Parse datetime columns
         print("\nPARSING DATETIME COLUMNS")
 
+        # Fixed 'YYYY-MM-DD HH:MM:SS' columns take the fast path (see timestamps), anything else pd.to_datetime
         try:
-            self.df['pickup_datetime'] = pd.to_datetime(self.df['pickup_datetime'])
-            self.df['dropoff_datetime'] = pd.to_datetime(self.df['dropoff_datetime'])
+            self.df['pickup_datetime'] = parse_timestamps(self.df['pickup_datetime'])
+            self.df['dropoff_datetime'] = parse_timestamps(self.df['dropoff_datetime'])
             self.log_step("Successfully parsed datetime columns")
         except Exception as e:
             print(f"Error parsing datetime columns: {e}")
@@ -166,51 +484,23 @@ class TrainDataCleaner:
         return self
     
     
+    @profile_stage
     def validate_data_integrity(self):
         # Check for invalid records
         print("\nDATA INTEGRITY VALIDATION")
         
         initial_rows = len(self.df)
-        issues_found = []
-        
-        # Check for negative or zero trip duration
-        invalid_duration = self.df['trip_duration'] <= 0
-        issues_found.append(f"Invalid trip duration (<=0): {invalid_duration.sum()}")
-        
-        # Check for trips where dropoff is before pickup
-        invalid_time_order = self.df['dropoff_datetime'] <= self.df['pickup_datetime']
-        issues_found.append(f"Invalid time order (dropoff <= pickup): {invalid_time_order.sum()}")
-        
-        # Check for invalid passenger counts
-        invalid_passengers = (self.df['passenger_count'] <= 0) | (self.df['passenger_count'] > 8)
-        issues_found.append(f"Invalid passenger count: {invalid_passengers.sum()}")
-        
-        # Check for invalid coordinates 
-        invalid_pickup_lat = (self.df['pickup_latitude'] < 40.4) | (self.df['pickup_latitude'] > 41.0)
-        invalid_pickup_lon = (self.df['pickup_longitude'] < -74.3) | (self.df['pickup_longitude'] > -73.7)
-        invalid_dropoff_lat = (self.df['dropoff_latitude'] < 40.4) | (self.df['dropoff_latitude'] > 41.0)
-        invalid_dropoff_lon = (self.df['dropoff_longitude'] < -74.3) | (self.df['dropoff_longitude'] > -73.7)
-        
-        invalid_coords = invalid_pickup_lat | invalid_pickup_lon | invalid_dropoff_lat | invalid_dropoff_lon
-        issues_found.append(f"Invalid coordinates: {invalid_coords.sum()}")
-        
-        # Check for zero coordinates (likely missing/invalid)
-        zero_coords = ((self.df['pickup_latitude'] == 0) | (self.df['pickup_longitude'] == 0) |
-                      (self.df['dropoff_latitude'] == 0) | (self.df['dropoff_longitude'] == 0))
-        issues_found.append(f"Zero coordinates: {zero_coords.sum()}")
-        
-        for issue in issues_found:
-            print(f"  {issue}")
-            
-        # Combine all invalid conditions
-        invalid_rows = (invalid_duration | invalid_time_order | invalid_passengers | 
-                       invalid_coords | zero_coords)
-        
-        # Store invalid rows for transparency before removal
-        try:
-            self.invalid_records = self.df[invalid_rows].copy()
-        except Exception:
-            self.invalid_records = None
+
+        # All rules from VALIDATION_RULES in one pass: combined mask plus per-rule counts
+        invalid_rows, rule_counts, reasons = evaluate_validation_rules(self.df, bounding_box=self.bounding_box,
+                                                                       with_reasons=True)
+        self.validation_counts = rule_counts
+
+        for name, description, _ in VALIDATION_RULES:
+            print(f"  {description}: {rule_counts[name]}")
+
+        # Record invalid rows (and the rules each one broke) for transparency before removal
+        self._record_exclusions('invalid_records', invalid_rows, **{REASON_COLUMN: reasons[invalid_rows]})
 
         self.df = self.df[~invalid_rows]
         rows_removed = initial_rows - len(self.df)
@@ -222,6 +512,41 @@ class TrainDataCleaner:
             
         return self
     
+    @profile_stage
+    def validate_trip_durations(self, tolerance=DURATION_TOLERANCE_SECONDS, action='flag'):
+        # Cross-check trip_duration against dropoff_datetime - pickup_datetime
+        # Rows that differ by more than tolerance seconds are logged in duration_mismatch_records.csv;
+        # action='flag' keeps them with duration_mismatch=True, action='remove' drops them.
+        # Runs before capping, which changes trip_duration on purpose.
+        print("\nTRIP DURATION CROSS-CHECK")
+
+        initial_rows = len(self.df)
+        # Trips missing either timestamp (NaT) can't be checked and are not flagged
+        checked = (self.df['pickup_datetime'].notna() & self.df['dropoff_datetime'].notna()).to_numpy()
+        timestamp_duration = np.where(checked, datetime_seconds(self.df['dropoff_datetime'])
+                                      - datetime_seconds(self.df['pickup_datetime']), 0)
+        difference = np.where(checked, self.df['trip_duration'].to_numpy(dtype=np.int64) - timestamp_duration, 0)
+        mismatch = np.abs(difference) > tolerance
+
+        mismatches = int(np.count_nonzero(mismatch))
+        print(f"Trips whose duration differs from the timestamps by more than {tolerance}s: {mismatches}")
+        if not checked.all():
+            print(f"Trips missing a timestamp (not checked): {int(np.count_nonzero(~checked))}")
+        if mismatches:
+            print(f"  Largest difference: {np.abs(difference).max()}s")
+        self._record_exclusions('duration_mismatch_records', mismatch,
+                                timestamp_duration=timestamp_duration[mismatch],
+                                duration_difference=difference[mismatch])
+
+        if action == 'remove':
+            self.df = self.df[~mismatch]
+            self.log_step(f"Removed {initial_rows - len(self.df)} trips with mismatched durations")
+        else:
+            self.df['duration_mismatch'] = mismatch
+            self.log_step(f"Flagged {mismatches} trips with mismatched durations")
+        return self
+
+    @profile_stage
     def detect_outliers(self):
         # Detect outliers using IQR method
         """
@@ -236,8 +561,8 @@ class TrainDataCleaner:
         outlier_info = {}
         
         for col in numerical_cols:
-            Q1 = self.df[col].quantile(0.25)
-            Q3 = self.df[col].quantile(0.75)
+            sketch = self.get_quantile_sketch(col)
+            Q1, Q3 = sketch.quantiles([0.25, 0.75])
             IQR = Q3 - Q1
             
             lower_bound = Q1 - 1.5 * IQR
@@ -257,22 +582,37 @@ class TrainDataCleaner:
             print(f"\n{col}:")
             print(f"  Outliers: {outlier_count} ({outlier_pct:.2f}%)")
             print(f"  Bounds: [{lower_bound:.2f}, {upper_bound:.2f}]")
-            print(f"  Range: [{self.df[col].min():.2f}, {self.df[col].max():.2f}]")
+            print(f"  Range: [{sketch.min:.2f}, {sketch.max:.2f}]")
         
         self.outlier_info = outlier_info
         self.log_step("Outlier detection completed")
         return self
     
-    def handle_outliers(self, method='cap'):
+    def get_quantile_sketch(self, col):
+        # One pass over a column answers every quantile detect_outliers/handle_outliers need;
+        # the sketch is reused until rows are filtered (self.df replaced) or the column changes
+        key = (id(self.df), len(self.df))
+        cached = self.quantile_sketches.get(col)
+        if cached is None or cached[0] != key:
+            sketch = QuantileSketch.from_values(self.df[col], self.quantile_accuracy)
+            self.quantile_sketches[col] = (key, sketch)
+            return sketch
+        return cached[1]
+
+    @profile_stage
+    def handle_outliers(self, method='cap', bounds=None):
         # Handle outliers using specified method
+        # bounds: precomputed (1%, 99%) trip_duration quantiles, e.g. from a first pass over all chunks
         print(f"\nHANDLING OUTLIERS (Method: {method.upper()})")
     
         initial_rows = len(self.df)
         
         if method == 'remove':
             # Remove extreme outliers for trip_duration only
-            Q1 = self.df['trip_duration'].quantile(0.01)  # More conservative
-            Q3 = self.df['trip_duration'].quantile(0.99)
+            if bounds is not None:
+                Q1, Q3 = bounds
+            else:
+                Q1, Q3 = self.get_quantile_sketch('trip_duration').quantiles([0.01, 0.99])  # More conservative
             
             self.df = self.df[(self.df['trip_duration'] >= Q1) & 
                              (self.df['trip_duration'] <= Q3)]
@@ -282,41 +622,43 @@ class TrainDataCleaner:
             
         elif method == 'cap':
             # Cap extreme values for trip_duration
-            Q1 = self.df['trip_duration'].quantile(0.01)
-            Q99 = self.df['trip_duration'].quantile(0.99)
+            if bounds is not None:
+                Q1, Q99 = bounds
+            else:
+                Q1, Q99 = self.get_quantile_sketch('trip_duration').quantiles([0.01, 0.99])
             
             original_min = self.df['trip_duration'].min()
             original_max = self.df['trip_duration'].max()
             
             # Record rows that will be capped for transparency
             try:
-                original_td = self.df['trip_duration'].copy()
-                capped_low_mask = original_td < Q1
-                capped_high_mask = original_td > Q99
-                capped_mask = capped_low_mask | capped_high_mask
+                original_td = self.df['trip_duration'].to_numpy()
+                capped_mask = (original_td < Q1) | (original_td > Q99)
                 if capped_mask.any():
-                    capped_df = self.df.loc[capped_mask, :].copy()
-                    capped_df['trip_duration_original'] = original_td.loc[capped_mask]
-                    capped_df['trip_duration_capped'] = np.clip(original_td.loc[capped_mask], Q1, Q99)
-                    self.capped_records = capped_df
-                else:
-                    self.capped_records = None
-            except Exception:
-                self.capped_records = None
+                    self._record_exclusions('capped_records', capped_mask,
+                                            trip_duration_original=original_td[capped_mask],
+                                            trip_duration_capped=np.clip(original_td[capped_mask], Q1, Q99))
+            except Exception as e:
+                print(f"Failed to record capped rows: {e}")
 
             self.df['trip_duration'] = np.clip(self.df['trip_duration'], Q1, Q99)
+            # Capping changed the column, so its sketch no longer describes it
+            self.quantile_sketches.pop('trip_duration', None)
             
             self.log_step(f"Capped trip_duration values to range [{Q1:.0f}, {Q99:.0f}] seconds")
             
         return self
     
-    def normalize_data(self):
+    @profile_stage
+    def normalize_data(self, parse_datetimes=True):
         # Normalize and format timestamps, coordinates, and numeric fields
+        # parse_datetimes=False skips re-parsing timestamps that are already datetime64
         print("\nDATA NORMALIZATION")
         
         # Normalize timestamps to consistent format
-        self.df['pickup_datetime'] = pd.to_datetime(self.df['pickup_datetime'])
-        self.df['dropoff_datetime'] = pd.to_datetime(self.df['dropoff_datetime'])
+        if parse_datetimes:
+            self.df['pickup_datetime'] = parse_timestamps(self.df['pickup_datetime'])
+            self.df['dropoff_datetime'] = parse_timestamps(self.df['dropoff_datetime'])
         
         # Round coordinates to reasonable precision (6 decimal places)
         coord_cols = ['pickup_longitude', 'pickup_latitude', 'dropoff_longitude', 'dropoff_latitude']
@@ -352,18 +694,32 @@ class TrainDataCleaner:
         # Radius of earth in kilometers
         r = 6371
         return c * r
-    
-    def create_derived_features(self):
+
+    def calculate_distance_vectorized(self, lat1, lon1, lat2, lon2, dtype=np.float64):
+        # Haversine distance on whole coordinate arrays/columns (same formula as calculate_distance)
+        # dtype=np.float32 halves the memory of the temporaries at ~1e-3 km precision loss
+        lat1, lon1, lat2, lon2 = (np.radians(np.asarray(col, dtype=dtype)) for col in (lat1, lon1, lat2, lon2))
+
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        # Clip guards against a drifting slightly above 1 from rounding
+        c = 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+        r = np.dtype(dtype).type(6371)
+        return c * r
+
+    @profile_stage
+    def create_derived_features(self, distance_dtype=np.float64):
         # Create derived features as required by assignment
         print("\nCREATING DERIVED FEATURES")
         
         # 1. Trip Distance (in kilometers)
         print("Creating trip distance feature...")
-        self.df['trip_distance_km'] = self.df.apply(
-            lambda row: self.calculate_distance(
-                row['pickup_latitude'], row['pickup_longitude'],
-                row['dropoff_latitude'], row['dropoff_longitude']
-            ), axis=1
+        self.df['trip_distance_km'] = self.calculate_distance_vectorized(
+            self.df['pickup_latitude'], self.df['pickup_longitude'],
+            self.df['dropoff_latitude'], self.df['dropoff_longitude'],
+            dtype=distance_dtype
         )
         
         # 2. Trip Speed (km/h)
@@ -387,9 +743,11 @@ class TrainDataCleaner:
         
         # 4. Day of Week
         print("Creating temporal features...")
-        self.df['pickup_day_of_week'] = self.df['pickup_datetime'].dt.day_name()
-        self.df['pickup_hour'] = self.df['pickup_datetime'].dt.hour
-        self.df['pickup_month'] = self.df['pickup_datetime'].dt.month
+        # Hour from integer seconds, day name and month from the cached per-day table (see timestamps)
+        calendar = calendar_features(self.df['pickup_datetime'])
+        self.df['pickup_day_of_week'] = calendar['day_name']
+        self.df['pickup_hour'] = calendar['hour']
+        self.df['pickup_month'] = calendar['month']
         
         # 5. Trip Duration Categories
         print("Creating trip duration categories...")
@@ -404,9 +762,8 @@ class TrainDataCleaner:
         print("Creating distance categories...")
         self.df['distance_category'] = pd.cut(
             self.df['trip_distance_km'],
-            bins=[0, 1, 3, 5, 10, float('inf')],
-            labels=['Very Short (0-1km)', 'Short (1-3km)', 'Medium (3-5km)', 
-                   'Long (5-10km)', 'Very Long (10km+)']
+            bins=DISTANCE_CATEGORY_BINS,
+            labels=DISTANCE_CATEGORY_LABELS
         )
         
         # 7. Speed Categories
@@ -418,7 +775,12 @@ class TrainDataCleaner:
                    'Fast (30-50km/h)', 'Very Fast (50km/h+)']
         )
 
-        # 8. Fare-based features (if fare data is available)
+        # 8. Spatial grid cells (see spatial_index) for heatmaps and area queries
+        print("Creating spatial grid cells...")
+        self.df['pickup_cell'] = cell_codes(self.df['pickup_latitude'], self.df['pickup_longitude'])
+        self.df['dropoff_cell'] = cell_codes(self.df['dropoff_latitude'], self.df['dropoff_longitude'])
+
+        # 9. Fare-based features (if fare data is available)
         if 'fare_amount' in self.df.columns:
             print("Creating fare-based features...")
             # Avoid division by zero when distance or duration is zero
@@ -449,6 +811,7 @@ class TrainDataCleaner:
         self.log_step("  - trip_duration_category: Categorical trip duration")
         self.log_step("  - distance_category: Categorical trip distance")
         self.log_step("  - speed_category: Categorical trip speed")
+        self.log_step("  - pickup_cell/dropoff_cell: Spatial grid cell codes")
         if 'fare_amount' in self.df.columns:
             self.log_step("  - fare_per_km: Fare normalized by distance")
             self.log_step("  - fare_per_min: Fare normalized by minutes")
@@ -457,6 +820,92 @@ class TrainDataCleaner:
         
         return self
     
+    @profile_stage
+    def create_idle_features(self):
+        # Per-vendor gaps between consecutive trips (vendor_id is the finest fleet grouping in the data)
+        # - pickup_gap_sec: seconds since the vendor's previous pickup
+        # - idle_time_sec: seconds from the previous trip's dropoff to this pickup; negative when the
+        #   vendor's trips overlap (several cabs on the road at once)
+        # Both are NaN for each vendor's first trip. Needs every trip at once, so the chunked and
+        # parallel modes leave it out.
+        print("\nCREATING IDLE TIME FEATURES")
+
+        # Trips without a pickup time stay out of the sequence (NaN features); a missing dropoff
+        # leaves the next trip's idle time NaN
+        pickup_times = self.df['pickup_datetime'].to_numpy()
+        dropoff_times = self.df['dropoff_datetime'].to_numpy()
+        rows = np.flatnonzero(~pd.isna(pickup_times))
+        vendors = pd.factorize(self.df['vendor_id'])[0][rows]
+        pickup = datetime_seconds(pickup_times[rows])
+        dropoff = np.where(pd.isna(dropoff_times[rows]), np.nan, datetime_seconds(dropoff_times[rows]))
+
+        # Sort by vendor, then pickup time; consecutive rows of one vendor give the gaps
+        order = np.lexsort((pickup, vendors))
+        sorted_vendors = vendors[order]
+        sorted_pickup = pickup[order]
+        same_vendor = sorted_vendors[1:] == sorted_vendors[:-1]
+
+        gap = np.full(len(order), np.nan)
+        idle = np.full(len(order), np.nan)
+        gap[1:] = np.where(same_vendor, sorted_pickup[1:] - sorted_pickup[:-1], np.nan)
+        idle[1:] = np.where(same_vendor, sorted_pickup[1:] - dropoff[order][:-1], np.nan)
+
+        # Scatter back to the frame's row order
+        for column, values in (('pickup_gap_sec', gap), ('idle_time_sec', idle)):
+            unsorted = np.full(len(self.df), np.nan)
+            unsorted[rows[order]] = values
+            self.df[column] = unsorted
+
+        print(f"Trips starting before the vendor's previous trip ended: {int(np.count_nonzero(idle < 0))}")
+        self.log_step("Created idle features: pickup_gap_sec, idle_time_sec (per vendor)")
+        return self
+
+    @profile_stage
+    def score_anomalies(self, threshold=ANOMALY_Z_THRESHOLD, baseline=None):
+        # Flag suspicious trips by robust z-scores (median/MAD, log scale) of duration, distance and
+        # speed within their pickup_hour x distance_category group (see anomaly_scores)
+        # Adds anomaly_score (largest |z|) and anomaly_reason (set when the score exceeds threshold);
+        # flagged trips are logged in suspicious_trips.csv and kept.
+        # baseline: group medians/MADs gathered beforehand (streamed runs use all chunks);
+        # by default they come from self.df
+        print("\nSCORING SUSPICIOUS TRIPS")
+        groups, values = self._anomaly_inputs(self.df)
+        if baseline is None:
+            baseline = AnomalyStats(ANOMALY_GROUPS).update(groups, values).baseline()
+        self.anomaly_baseline = baseline
+
+        score, reason, flagged = baseline.score(groups, values, threshold)
+        self.df['anomaly_score'] = score
+        self.df['anomaly_reason'] = pd.Categorical.from_codes(reason, categories=list(ANOMALY_REASONS))
+        suspicious = int(np.count_nonzero(flagged))
+        print(f"Trips scored: {np.count_nonzero(~np.isnan(score))} of {len(self.df)}")
+        print(f"Suspicious trips (score > {threshold}): {suspicious}")
+        if suspicious:
+            for code, count in zip(ANOMALY_REASONS, np.bincount(reason[flagged], minlength=len(ANOMALY_REASONS))):
+                print(f"  {code}: {count}")
+        self._record_exclusions('suspicious_trips', flagged, anomaly_score=score[flagged],
+                                anomaly_reason=np.asarray(ANOMALY_REASONS)[reason[flagged]])
+        self.log_step(f"Flagged {suspicious} suspicious trips (robust z-score > {threshold})")
+        return self
+
+    def _anomaly_inputs(self, df):
+        # Scoring group codes and feature values; from the derived columns when present, else from the
+        # raw ones (pass 1 of a streamed run, before durations are capped)
+        if 'trip_speed_kmh' in df.columns:
+            hour = df['pickup_hour'].to_numpy(dtype=np.int64)
+            values = {feature: df[feature].to_numpy(dtype=np.float64) for feature in ANOMALY_FEATURES}
+        else:
+            hour = datetime_seconds(df['pickup_datetime']) // 3600 % 24
+            duration = df['trip_duration'].to_numpy(dtype=np.float64)
+            distance = np.asarray(self.calculate_distance_vectorized(
+                df['pickup_latitude'], df['pickup_longitude'], df['dropoff_latitude'], df['dropoff_longitude']),
+                dtype=np.float64)
+            speed = np.divide(distance * 3600, duration, out=np.zeros_like(distance), where=duration > 0)
+            values = dict(zip(ANOMALY_FEATURES, (duration, distance, speed)))
+        category = np.searchsorted(DISTANCE_CATEGORY_BINS[1:-1], values['trip_distance_km'], side='left')
+        return hour * len(DISTANCE_CATEGORY_LABELS) + category, values
+
+    @profile_stage
     def validate_derived_features(self):
         # Validate the derived features for reasonableness
         print("\nVALIDATING DERIVED FEATURES")
@@ -487,47 +936,93 @@ class TrainDataCleaner:
             print("All derived features validated successfully!")
         
         # Summary statistics
+        summary = self._current_summary()
+        distance, speed, efficiency = (summary.column(col) for col in
+                                       ('trip_distance_km', 'trip_speed_kmh', 'trip_efficiency'))
         print(f"\nDerived features summary:")
-        print(f"Distance range: {self.df['trip_distance_km'].min():.3f} - {self.df['trip_distance_km'].max():.3f} km")
-        print(f"Speed range: {self.df['trip_speed_kmh'].min():.2f} - {self.df['trip_speed_kmh'].max():.2f} km/h")
-        print(f"Efficiency range: {self.df['trip_efficiency'].min():.3f} - {self.df['trip_efficiency'].max():.3f} km/min")
+        print(f"Distance range: {distance.min:.3f} - {distance.max:.3f} km")
+        print(f"Speed range: {speed.min:.2f} - {speed.max:.2f} km/h")
+        print(f"Efficiency range: {efficiency.min:.3f} - {efficiency.max:.3f} km/min")
         
         self.log_step("Derived features validation completed")
         return self
     
+    @profile_stage
+    def build_rollups(self):
+        # Pre-aggregate the cleaned trips for the dashboard (see rollup_cube)
+        # Cells are keyed by pickup date, hour, duration category and distance category;
+        # save_cleaned_data writes them next to the cleaned data
+        print("\nBUILDING ROLLUPS")
+        self.rollups = RollupCube.from_frame(self.df)
+        print(f"{len(self.df)} trips rolled up into {len(self.rollups)} cells")
+        self.log_step(f"Rollups built: {len(self.rollups)} cells")
+        return self
+
+    @profile_stage
+    def build_od_matrix(self, zoom=None):
+        # Zone-to-zone trip flows for capacity planning (see od_matrix); save_cleaned_data writes them
+        # Pickups and dropoffs are snapped to the spatial grid at zoom (default: the cleaner's od_zoom)
+        print("\nBUILDING OD MATRIX")
+        zoom = zoom if zoom is not None else self.od_zoom
+        self.od_matrix = ODMatrix.from_frame(self.df, zoom)
+        flows = self.od_matrix.flows()
+        zones = len(np.union1d(flows['origin_zone'], flows['destination_zone']))
+        print(f"{len(self.df)} trips between {zones} zones (zoom {zoom}) in {len(flows)} zone pairs")
+
+        print("Busiest zone pairs:")
+        for flow in flows.nlargest(5, 'trip_count').itertuples():
+            print(f"  ({flow.origin_lat:.4f}, {flow.origin_lon:.4f}) -> ({flow.destination_lat:.4f}, "
+                  f"{flow.destination_lon:.4f}): {flow.trip_count} trips, {flow.mean_duration_sec:.0f}s, "
+                  f"{flow.mean_speed_kmh:.1f} km/h, {flow.centroid_distance_km:.2f} km apart")
+        self.log_step(f"OD matrix built: {len(flows)} zone pairs over {zones} zones")
+        return self
+
+    @profile_stage
     def create_summary_statistics(self):
         # Create summary statistics
+        # From the single-pass SummaryStats (quartiles are sketch estimates, see summary_stats);
+        # after clean_in_chunks/clean_in_parallel this is the summary gathered while cleaning
         print("\nSUMMARY STATISTICS")
+        summary = self._current_summary()
         
         numerical_cols = ['trip_duration', 'passenger_count', 'pickup_longitude', 
                          'pickup_latitude', 'dropoff_longitude', 'dropoff_latitude']
         
         print("\nNumerical columns summary:")
-        print(self.df[numerical_cols].describe())
+        print(summary.describe(numerical_cols))
         
         print("\nCategorical columns summary:")
         print(f"Vendor ID distribution:")
-        print(self.df['vendor_id'].value_counts())
+        print(summary.frequencies('vendor_id'))
         
         print(f"\nStore and forward flag distribution:")
-        print(self.df['store_and_fwd_flag'].value_counts())
+        print(summary.frequencies('store_and_fwd_flag'))
         
         # Date range
+        first_pickup, last_pickup = summary.datetime_range('pickup_datetime')
         print(f"\nDate range:")
-        print(f"From: {self.df['pickup_datetime'].min()}")
-        print(f"To: {self.df['pickup_datetime'].max()}")
+        print(f"From: {first_pickup}")
+        print(f"To: {last_pickup}")
         
         return self
     
-    def save_cleaned_data(self, output_path='train_cleaned.csv'):
+    @profile_stage
+    def save_cleaned_data(self, output_path='train_cleaned.csv', output_format='csv', compression=None,
+                          row_group_size=None, partition_cols=None):
         # Save cleaned dataset
+        # output_format: 'csv', 'parquet', 'feather' or 'columnar' (a memory-mappable store, see columnar_store);
+        # all but CSV keep categorical/datetime dtypes
+        # partition_cols: e.g. ['pickup_month', 'pickup_day_of_week'] for a Hive-partitioned parquet dataset
         print("\nSAVING CLEANED DATA")
         
         # Ensure output directory exists
         output_dir = os.path.dirname(output_path) if os.path.dirname(output_path) else '.'
         os.makedirs(output_dir, exist_ok=True)
 
-        self.df.to_csv(output_path, index=False)
+        writer = TableWriter(output_format, compression=compression, row_group_size=row_group_size,
+                             partition_cols=partition_cols)
+        output_path = writer.write(self.df, output_path)
+        self.written_path = output_path
         
         print(f"Cleaned dataset saved to: {output_path}")
         print(f"Original shape: {self.original_shape}")
@@ -537,61 +1032,431 @@ class TrainDataCleaner:
         
         self.log_step(f"Cleaned data saved: {self.df.shape[0]} rows remaining")
         
-        # Save transparency logs alongside cleaned data
-        self.save_transparency_logs(output_dir)
+        # Save transparency logs alongside cleaned data, in the same format
+        self.save_transparency_logs(output_dir, writer=TableWriter(output_format, compression=compression))
+
+        if self.rollups is not None:
+            rollup_path = self.rollups.save(os.path.join(output_dir, ROLLUP_FILE))
+            print(f"Rollups saved to: {rollup_path}")
+        if self.od_matrix is not None:
+            od_path = self.od_matrix.save(os.path.join(output_dir, OD_MATRIX_FILE))
+            print(f"OD matrix saved to: {od_path}")
+
+        # Bump the output version last, once everything a reader needs is on disk
+        version = write_output_version(output_path, len(self.df))
+        print(f"Output version: {version['version']}")
         return self
 
-    def save_transparency_logs(self, output_dir):
-        # Save logs for excluded or suspicious records
-        try:
-            if self.invalid_records is not None and len(self.invalid_records) > 0:
-                invalid_path = os.path.join(output_dir, 'excluded_invalid_records.csv')
-                self.invalid_records.to_csv(invalid_path, index=False)
-                self.log_step(f"Saved invalid/excluded records to: {invalid_path}")
-        except Exception as e:
-            print(f"Failed to save invalid records log: {e}")
+    @profile_stage
+    def build_sort_index(self):
+        # Presorted permutations of the trip table's sortable columns for the trip API (see sort_index)
+        # Runs after save_cleaned_data (or a streamed clean) on the output it wrote, and saves
+        # <output root>.sort_index.npz tagged with that output's version
+        print("\nBUILDING SORT INDEX")
+        if self.written_path is None:
+            print("Nothing saved yet: run save_cleaned_data first")
+            return self
 
-        try:
-            if self.capped_records is not None and len(self.capped_records) > 0:
-                capped_path = os.path.join(output_dir, 'capped_trip_durations.csv')
-                self.capped_records.to_csv(capped_path, index=False)
-                self.log_step(f"Saved capped outlier records to: {capped_path}")
-        except Exception as e:
-            print(f"Failed to save capped records log: {e}")
+        if self.df is not None and not os.path.isdir(self.written_path):
+            # Single-file outputs keep the frame's row order
+            df = self.df
+        else:
+            # Streamed runs and directory outputs (partitioned parquet, columnar stores) are read back
+            # in the order readers see them
+            df = read_cleaned_data(self.written_path, SORT_INDEX_SOURCE_COLUMNS)
+        version = read_output_version(self.written_path)
 
         try:
-            if self.removed_missing_records is not None and len(self.removed_missing_records) > 0:
-                missing_path = os.path.join(output_dir, 'removed_missing_rows.csv')
-                self.removed_missing_records.to_csv(missing_path, index=False)
-                self.log_step(f"Saved removed rows with missing values to: {missing_path}")
+            index = build_sort_index(df, version['version'] if version else None)
+            index_path = index.save(sort_index_path_for(self.written_path))
+            print(f"Sort index saved to: {index_path}")
+            self.log_step(f"Sort index built: {', '.join(index.permutations)} over {index.rows} rows")
         except Exception as e:
-            print(f"Failed to save missing rows log: {e}")
+            print(f"Error building sort index: {e}")
+        return self
 
-        try:
-            if self.removed_exact_duplicates is not None and len(self.removed_exact_duplicates) > 0:
-                exact_dups_path = os.path.join(output_dir, 'removed_exact_duplicates.csv')
-                self.removed_exact_duplicates.to_csv(exact_dups_path, index=False)
-                self.log_step(f"Saved removed exact duplicates to: {exact_dups_path}")
-        except Exception as e:
-            print(f"Failed to save exact duplicates log: {e}")
+    @profile_stage
+    def save_transparency_logs(self, output_dir, writer=None):
+        # Save logs for excluded or suspicious records
+        # The recorded rows are read back from the source in one streaming pass (see exclusion_log)
+        # and written piece by piece, so a large log never sits in memory whole;
+        # writer selects the file format (CSV by default)
+        writer = writer if writer is not None else TableWriter()
+        messages = {
+            'invalid_records': "Saved invalid/excluded records to",
+            'capped_records': "Saved capped outlier records to",
+            'removed_missing_records': "Saved removed rows with missing values to",
+            'removed_exact_duplicates': "Saved removed exact duplicates to",
+            'removed_id_duplicates': "Saved removed duplicate IDs to",
+            'duration_mismatch_records': "Saved trips with mismatched durations to",
+            'suspicious_trips': "Saved suspicious trips (anomaly scores) to",
+        }
 
+        written = {}
         try:
-            if self.removed_id_duplicates is not None and len(self.removed_id_duplicates) > 0:
-                id_dups_path = os.path.join(output_dir, 'removed_id_duplicates.csv')
-                self.removed_id_duplicates.to_csv(id_dups_path, index=False)
-                self.log_step(f"Saved removed duplicate IDs to: {id_dups_path}")
+            pieces = self.exclusions.read_rows(self.filepath, list(TRANSPARENCY_LOG_FILES),
+                                               parse_dates=self._source_datetime_columns())
+            for log_name, records in pieces:
+                log_path = os.path.join(output_dir, TRANSPARENCY_LOG_FILES[log_name])
+                written[log_name] = writer.write(records, log_path, append=True)
+            writer.close()
         except Exception as e:
-            print(f"Failed to save id duplicates log: {e}")
+            print(f"Failed to save transparency logs: {e}")
+
+        for log_name, log_path in written.items():
+            self.log_step(f"{messages[log_name]}: {log_path} ({self.exclusions.count(log_name)} rows)")
+
+        self._save_outlier_bounds(output_dir, writer)
+        return self
 
+    def _save_outlier_bounds(self, output_dir, writer):
         try:
             if hasattr(self, 'outlier_info') and isinstance(self.outlier_info, dict) and len(self.outlier_info) > 0:
                 bounds_df = pd.DataFrame.from_dict(self.outlier_info, orient='index')
                 bounds_df_path = os.path.join(output_dir, 'outlier_bounds.csv')
-                bounds_df.to_csv(bounds_df_path)
+                if writer.output_format == 'csv':
+                    bounds_df.to_csv(bounds_df_path)
+                else:
+                    bounds_df_path = writer.write(bounds_df.reset_index(names='column'), bounds_df_path)
                 self.log_step(f"Saved outlier bounds to: {bounds_df_path}")
         except Exception as e:
             print(f"Failed to save outlier bounds log: {e}")
     
+    def _clean_chunk_rows(self, chunk, seen_ids):
+        # Row-local steps for one chunk: missing values, datetimes, duplicates, integrity checks
+        self.df = chunk
+        self.handle_missing_values().parse_datetime_columns().remove_duplicates()
+
+        # IDs already kept in an earlier chunk or file (seen_ids is a DedupIndex);
+        # this also catches exact duplicates split across chunks
+        repeated = seen_ids.contains_ids(self.trip_id_keys)
+        if repeated.any():
+            self._record_exclusions('removed_id_duplicates', repeated)
+            self.df = self.df[~repeated]
+        self.chunk_ids = self.trip_id_keys[~repeated]
+        seen_ids.add(self.chunk_ids)
+
+        self.validate_data_integrity()
+        self.validate_trip_durations()
+        return self.df
+
+    def _finish_chunk_rows(self, bounds, outlier_method, anomaly_baseline):
+        # Steps after the global outlier bounds and anomaly baseline are known: capping, normalization,
+        # derived features, anomaly scores
+        self.handle_outliers(method=outlier_method, bounds=bounds)
+        self.normalize_data()
+        self.create_derived_features()
+        self.score_anomalies(baseline=anomaly_baseline)
+        return self.df
+
+    def _reset_records(self):
+        self.exclusions = self._new_exclusion_log()
+
+    def _global_outlier_bounds(self, sketches):
+        # Outlier summary and (1%, 99%) trip_duration capping bounds from merged sketches
+        self.outlier_info = self._outlier_info_from_sketches(sketches)
+        for col, info in self.outlier_info.items():
+            print(f"  {col}: {info['count']} outliers ({info['percentage']:.2f}%), "
+                  f"bounds [{info['lower_bound']:.2f}, {info['upper_bound']:.2f}]")
+        bounds = tuple(sketches['trip_duration'].quantiles([0.01, 0.99]))
+        self.log_step(f"Global trip_duration bounds: [{bounds[0]:.0f}, {bounds[1]:.0f}] seconds")
+        return bounds
+
+    def _prepare_streamed_output(self, output_path, output_format, log_dir=None):
+        # Create the output/log directories and drop log files left over from an earlier run
+        output_dir = os.path.dirname(output_path) if os.path.dirname(output_path) else '.'
+        os.makedirs(output_dir, exist_ok=True)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        for file_name in TRANSPARENCY_LOG_FILES.values():
+            stale_path = output_path_for(os.path.join(log_dir or output_dir, file_name), output_format)
+            if os.path.isdir(stale_path):
+                shutil.rmtree(stale_path)
+            elif os.path.exists(stale_path):
+                os.remove(stale_path)
+        return output_dir
+
+    def _outlier_info_from_sketches(self, sketches):
+        # IQR outlier summary (same fields as detect_outliers) from merged per-column sketches
+        outlier_info = {}
+        for col, sketch in sketches.items():
+            Q1, Q3 = sketch.quantiles([0.25, 0.75])
+            IQR = Q3 - Q1
+            lower_bound = Q1 - 1.5 * IQR
+            upper_bound = Q3 + 1.5 * IQR
+
+            outlier_count = sketch.count_outside(lower_bound, upper_bound)
+            outlier_info[col] = {
+                'count': outlier_count,
+                'percentage': (outlier_count / sketch.count) * 100,
+                'lower_bound': lower_bound,
+                'upper_bound': upper_bound
+            }
+        return outlier_info
+
+    @profile_stage
+    def clean_in_chunks(self, output_path='train_cleaned.csv', chunksize=500_000, outlier_method='cap', verbose=False,
+                        typed=False, output_format='csv', compression=None, row_group_size=None, partition_cols=None,
+                        seen_ids=None, sketches=None, log_dir=None, resume_output=False, rollup_dir=None):
+        # Streaming version of the main pipeline for files larger than memory
+        # Pass 1 runs the row-local steps and keeps only one quantile sketch per chunk for
+        # trip_duration/passenger_count, merged into a global sketch (see quantile_accuracy).
+        # Pass 2 repeats the row-local steps, applies the global outlier bounds, normalizes,
+        # derives features and appends each chunk to the output; excluded rows are only recorded
+        # by row number and the transparency logs are written from the source at the end.
+        # Peak memory is one chunk plus the set of kept trip IDs.
+        # typed=True reads each chunk with the TRAIN_SCHEMA dtypes; output options as in save_cleaned_data.
+        # seen_ids/sketches/log_dir/resume_output carry history in from clean_incremental;
+        # Keys of the trip IDs kept by this run are left in self.new_ids.
+        # Rollups and the OD matrix are updated chunk by chunk and saved to <rollup_dir or output dir>/
+        # trip_rollups.csv and od_matrix.npz (with resume_output existing files there are extended).
+        # Summary statistics of the written rows are accumulated in the same pass (self.summary).
+        # Anomaly scores use group medians/MADs gathered in pass 1, i.e. before durations are capped
+        # (capping only moves the 1%/99% tails, so the medians and MADs barely change).
+        print(f"\nCLEANING IN CHUNKS (chunksize={chunksize})")
+
+        def quiet():
+            # Per-chunk stage output is suppressed unless verbose
+            return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+        def read_chunks():
+            if typed:
+                return read_train_csv(self.filepath, chunksize=chunksize)
+            return pd.read_csv(self.filepath, chunksize=chunksize)
+
+        outlier_cols = ['trip_duration', 'passenger_count']
+        if sketches is None:
+            sketches = {col: QuantileSketch(self.quantile_accuracy) for col in outlier_cols}
+        history_ids = seen_ids if seen_ids is not None else DedupIndex()
+        total_rows = 0
+        n_columns = 0
+
+        # Pass 1: global statistics
+        seen_ids = history_ids.copy()
+        new_ids = []
+        anomaly_stats = AnomalyStats(ANOMALY_GROUPS)
+        for chunk in read_chunks():
+            total_rows += len(chunk)
+            n_columns = chunk.shape[1]
+            self._reset_records()
+            log_mark = len(self.cleaning_log)
+            with quiet():
+                cleaned = self._clean_chunk_rows(chunk, seen_ids)
+            del self.cleaning_log[log_mark:]
+            new_ids.append(self.chunk_ids)
+            for col in outlier_cols:
+                sketches[col].merge(QuantileSketch.from_values(cleaned[col], self.quantile_accuracy))
+            anomaly_stats.update(*self._anomaly_inputs(cleaned))
+
+        self.original_shape = (total_rows, n_columns)
+        self.stream_sketches = sketches
+        self.new_ids = np.concatenate(new_ids) if new_ids else np.empty(0, dtype=np.int64)
+        self.log_step(f"Pass 1 complete: {total_rows} rows scanned in chunks of {chunksize}")
+
+        if sketches['trip_duration'].count == 0:
+            self.log_step("No valid rows left after row-level cleaning")
+            self.rows_written = 0
+            self.written_path = None
+            return self
+        bounds = self._global_outlier_bounds(sketches)
+        anomaly_baseline = anomaly_stats.baseline()
+
+        # Pass 2: clean and stream out
+        output_dir = self._prepare_streamed_output(output_path, output_format, log_dir)
+        writer = TableWriter(output_format, compression=compression, row_group_size=row_group_size,
+                             partition_cols=partition_cols, resume=resume_output)
+        log_writer = TableWriter(output_format, compression=compression)
+
+        rollup_path = os.path.join(rollup_dir or output_dir, ROLLUP_FILE)
+        rollups = RollupCube.load(rollup_path) if resume_output and os.path.exists(rollup_path) else RollupCube()
+        od_path = os.path.join(rollup_dir or output_dir, OD_MATRIX_FILE)
+        od_matrix = ODMatrix.load(od_path) if resume_output and os.path.exists(od_path) else ODMatrix(self.od_zoom)
+
+        seen_ids = history_ids
+        rows_written = 0
+        summary = self._new_summary()
+        self._reset_records()
+        for chunk_number, chunk in enumerate(read_chunks()):
+            log_mark = len(self.cleaning_log)
+            with quiet():
+                self._clean_chunk_rows(chunk, seen_ids)
+                self._finish_chunk_rows(bounds, outlier_method, anomaly_baseline)
+                written_path = writer.write(self.df, output_path, append=True)
+                rollups.update(self.df)
+                od_matrix.update(self.df)
+                summary.update(self.df)
+            del self.cleaning_log[log_mark:]
+            rows_written += len(self.df)
+            print(f"  Chunk {chunk_number + 1}: {len(chunk)} rows in, {len(self.df)} rows written")
+
+        writer.close()
+        self.rows_written = rows_written
+        self.df = None
+        self.summary, self.summary_source = summary, None
+        self.written_path = written_path
+        self.log_step(f"Cleaned data saved in chunks to {written_path}: {rows_written} rows remaining")
+        self.save_transparency_logs(log_dir or output_dir, writer=log_writer)
+        self.rollups = rollups
+        rollups.save(rollup_path)
+        self.log_step(f"Rollups saved to {rollup_path}: {len(rollups)} cells")
+        self.od_matrix = od_matrix
+        od_matrix.save(od_path)
+        self.log_step(f"OD matrix saved to {od_path}: {len(od_matrix)} zone pairs")
+        if not resume_output:
+            # clean_incremental versions the whole dataset itself
+            write_output_version(written_path, rows_written)
+        return self
+
+    @profile_stage
+    def clean_incremental(self, output_path='train_cleaned.csv', state_dir=None, chunksize=500_000,
+                          outlier_method='cap', typed=False, output_format='csv', compression=None,
+                          row_group_size=None, partition_cols=None):
+        # Clean self.filepath as a new batch and append it to earlier output (see incremental_state).
+        # Trip IDs from earlier batches count as duplicates, and the running quantile sketches
+        # are merged with this batch before the capping bounds are taken. Earlier batches are not
+        # re-capped. Files already processed (same content hash) are skipped.
+        # CSV, columnar stores and partitioned parquet are appended in place; single-file parquet/feather
+        # batches go to <output root>/batch-<n> files. Each batch's transparency logs go to
+        # <output dir>/batches/batch-<n>/.
+        # The rollups in <output dir>/trip_rollups.csv and the OD matrix in <output dir>/od_matrix.npz
+        # are extended with the batch.
+        print("\nINCREMENTAL CLEANING")
+        output_dir = os.path.dirname(output_path) if os.path.dirname(output_path) else '.'
+        state_dir = state_dir or os.path.join(output_dir, '.cleaner_state')
+        state = IncrementalState.load(state_dir)
+
+        content_hash = file_content_hash(self.filepath)
+        if state.is_processed(content_hash):
+            previous = state.processed_files[content_hash]
+            self.log_step(f"Skipping {self.filepath}: already processed as batch {previous['batch']}")
+            self.rows_written = 0
+            return self
+
+        batch_name = f"batch-{state.batch_count + 1:05d}"
+        batch_output_path = output_path
+        if output_format not in ('csv', 'columnar') and not partition_cols:
+            root, extension = os.path.splitext(output_path)
+            batch_output_path = os.path.join(root, batch_name + extension)
+            os.makedirs(root, exist_ok=True)
+        log_dir = os.path.join(output_dir, 'batches', batch_name)
+
+        self.clean_in_chunks(batch_output_path, chunksize=chunksize, outlier_method=outlier_method, typed=typed,
+                             output_format=output_format, compression=compression, row_group_size=row_group_size,
+                             partition_cols=partition_cols, seen_ids=state.load_seen_ids(),
+                             sketches=state.sketches or None, log_dir=log_dir, resume_output=True,
+                             rollup_dir=output_dir)
+        state.record_batch(content_hash, self.filepath, self.new_ids, self.stream_sketches,
+                           self.original_shape[0], self.rows_written, self.written_path)
+        self.log_step(f"Recorded {batch_name} in {state_dir}: {len(self.new_ids)} new trip IDs")
+        if self.rows_written:
+            dataset_path = self.written_path if batch_output_path == output_path else os.path.dirname(batch_output_path)
+            write_output_version(dataset_path, sum(output['rows'] for output in state.outputs))
+        return self
+
+    @profile_stage
+    def clean_in_parallel(self, output_path='train_cleaned.csv', workers=None, partition_bytes=64 * 1024**2,
+                          outlier_method='cap', typed=False, output_format='csv', compression=None,
+                          row_group_size=None, partition_cols=None):
+        # Multi-core version of clean_in_chunks: the file is split into line-aligned byte ranges
+        # and each worker process reads its own range, so no DataFrames are pickled.
+        # Phase 1 (parallel): row-local steps; workers return their trip IDs and the columns
+        #   needed for outlier bounds and anomaly statistics as Arrow IPC buffers.
+        # Between phases the parent finds IDs already kept by an earlier partition (same
+        #   keep-first rule as remove_duplicates) and builds the global quantile sketches and
+        #   the anomaly baseline (as in clean_in_chunks' pass 1).
+        # Phase 2 (parallel): row-local steps again, cross-partition duplicates dropped, capping,
+        #   normalization and derived features; results come back as encoded CSV or Arrow
+        #   buffers and are written in partition order, together with each partition's rollup cells,
+        #   OD matrix, excluded row numbers (partition rows are numbered from the phase 1 row counts)
+        #   and summary statistics (merged into self.summary).
+        workers = workers or os.cpu_count() or 1
+        file_size = os.path.getsize(self.filepath)
+        n_partitions = max(workers, math.ceil(file_size / partition_bytes))
+        header, byte_ranges = _partition_byte_ranges(self.filepath, n_partitions)
+        print(f"\nCLEANING IN PARALLEL ({workers} workers, {len(byte_ranges)} partitions)")
+
+        outlier_cols = ['trip_duration', 'passenger_count']
+        sketches = {col: QuantileSketch(self.quantile_accuracy) for col in outlier_cols}
+        anomaly_stats = AnomalyStats(ANOMALY_GROUPS)
+        tasks = [(self.filepath, header, start, end, typed, self.bounding_box) for start, end in byte_ranges]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            total_rows = 0
+            n_columns = 0
+            seen_ids = DedupIndex()
+            drop_ids = []
+            row_offsets = []
+            for rows_read, columns_read, ids_buffer, values_buffer in executor.map(_scan_partition, tasks):
+                row_offsets.append(total_rows)
+                total_rows += rows_read
+                n_columns = columns_read
+                ids = _frame_from_arrow(ids_buffer)['id_key'].to_numpy()
+                repeated = ids[seen_ids.contains_ids(ids)]
+                drop_ids.append(repeated)
+                seen_ids.add(ids)
+
+                values = _frame_from_arrow(values_buffer)
+                values = values[~np.isin(values['id_key'].to_numpy(), repeated)]
+                for col in outlier_cols:
+                    sketches[col].merge(QuantileSketch.from_values(values[col], self.quantile_accuracy))
+                anomaly_stats.update(values['anomaly_group'].to_numpy(),
+                                     {feature: values[feature].to_numpy() for feature in ANOMALY_FEATURES})
+            del seen_ids
+
+            self.original_shape = (total_rows, n_columns)
+            self.log_step(f"Phase 1 complete: {total_rows} rows scanned in {len(byte_ranges)} partitions")
+            if sketches['trip_duration'].count == 0:
+                self.log_step("No valid rows left after row-level cleaning")
+                self.rows_written = 0
+                return self
+            bounds = self._global_outlier_bounds(sketches)
+            anomaly_baseline = anomaly_stats.baseline()
+
+            output_dir = self._prepare_streamed_output(output_path, output_format)
+            csv_output = output_format == 'csv'
+            writer = TableWriter(output_format, compression=compression, row_group_size=row_group_size,
+                                 partition_cols=partition_cols)
+            log_writer = TableWriter(output_format, compression=compression)
+            written_path = output_path_for(output_path, 'csv') if csv_output else None
+
+            clean_tasks = [task + (ids, row_offset, bounds, outlier_method, csv_output, self.od_zoom, anomaly_baseline)
+                           for task, ids, row_offset in zip(tasks, drop_ids, row_offsets)]
+            rows_written = 0
+            rollups = RollupCube()
+            od_matrix = ODMatrix(self.od_zoom)
+            summary = self._new_summary()
+            self._reset_records()
+            for partition_number, (rows_kept, payload, exclusions, rollup_cells, partition_od,
+                                   partition_summary) in enumerate(executor.map(_clean_partition, clean_tasks)):
+                if csv_output:
+                    csv_header, csv_body = payload
+                    with open(written_path, 'wb' if partition_number == 0 else 'ab') as output_file:
+                        if partition_number == 0:
+                            output_file.write(csv_header)
+                        output_file.write(csv_body)
+                else:
+                    written_path = writer.write(_frame_from_arrow(payload), output_path, append=True)
+
+                self.exclusions.merge(exclusions)
+                rows_written += rows_kept
+                rollups.merge(RollupCube(rollup_cells))
+                od_matrix.merge(partition_od)
+                summary.merge(partition_summary)
+
+        writer.close()
+        self.rows_written = rows_written
+        self.written_path = written_path
+        self.df = None
+        self.summary, self.summary_source = summary, None
+        self.log_step(f"Cleaned data saved in parallel to {written_path}: {rows_written} rows remaining")
+        self.save_transparency_logs(output_dir, writer=log_writer)
+        self.rollups = rollups
+        rollups.save(os.path.join(output_dir, ROLLUP_FILE))
+        self.od_matrix = od_matrix
+        od_matrix.save(os.path.join(output_dir, OD_MATRIX_FILE))
+        write_output_version(written_path, rows_written)
+        return self
+
     def print_cleaning_summary(self):
         # Print summary of all cleaning steps
         print("\nCLEANING PROCESS SUMMARY")
@@ -602,7 +1467,8 @@ class TrainDataCleaner:
         print(f"\nFinal Results:")
         print(f"Original dataset: {self.original_shape[0]} rows, {self.original_shape[1]} columns")
         print(f"Cleaned dataset: {self.original_shape[0]} rows, {self.original_shape[1]} columns")
-        print(f"Data retention: {(self.df.shape[0] / self.original_shape[0] * 100):.2f}%")
+        cleaned_rows = self.rows_written if self.rows_written is not None else self.df.shape[0]
+        print(f"Data retention: {(cleaned_rows / self.original_shape[0] * 100):.2f}%")
 
     
     
@@ -610,32 +1476,89 @@ class TrainDataCleaner:
                 
 
 
-def main():
-        base_dir = os.path.dirname(__file__)
-        input_csv = os.path.join(base_dir, 'train.csv')
-        output_csv = os.path.join(base_dir, '..', 'processed', 'train_cleaned.csv')
-        cleaner = TrainDataCleaner(input_csv)
-        (cleaner
-         .load_data()
-         .basic_info()
-         .check_missing_values()
-         .handle_missing_values()
-         .parse_datetime_columns()
-         .check_duplicates()
-         .remove_duplicates()
-         .validate_data_integrity()
-         .detect_outliers()         .handle_outliers(method='cap')
-         .normalize_data()
-         .create_derived_features()
-         .validate_derived_features()
-         .create_summary_statistics()
-         .save_cleaned_data(output_csv)
-         .print_cleaning_summary()
-        #  .log_step("Train dataset loaded successfully!")
-         
-         
+def _partition_byte_ranges(filepath, n_partitions):
+    # Split the CSV body into up to n_partitions byte ranges that start and end on line boundaries
+    file_size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        boundaries = [f.tell()]
+        for i in range(1, n_partitions):
+            f.seek(boundaries[0] + (file_size - boundaries[0]) * i // n_partitions)
+            f.readline()  # skip to the start of the next full line
+            position = f.tell()
+            if boundaries[-1] < position < file_size:
+                boundaries.append(position)
+        boundaries.append(file_size)
+    return header, list(zip(boundaries[:-1], boundaries[1:]))
 
-        )
+
+def _read_partition(filepath, header, start, end, typed):
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        buffer = io.BytesIO(header + f.read(end - start))
+    return read_train_csv(buffer) if typed else pd.read_csv(buffer)
+
+
+def _frame_to_arrow(df):
+    # Arrow IPC stream bytes: cheap to move between processes, keeps categorical/datetime dtypes
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as stream:
+        stream.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _frame_from_arrow(buffer):
+    import pyarrow as pa
+    return pa.ipc.open_stream(buffer).read_pandas()
+
+
+def _scan_partition(task):
+    # Worker for phase 1 of clean_in_parallel
+    filepath, header, start, end, typed, bounding_box = task
+    cleaner = TrainDataCleaner(filepath, bounding_box=bounding_box)
+    partition_ids = DedupIndex()
+    with contextlib.redirect_stdout(io.StringIO()):
+        partition = _read_partition(filepath, header, start, end, typed)
+        cleaned = cleaner._clean_chunk_rows(partition, partition_ids)
+    ids = pd.DataFrame({'id_key': cleaner.chunk_ids})
+    anomaly_groups, anomaly_values = cleaner._anomaly_inputs(cleaned)
+    values = pd.DataFrame({'id_key': trip_id_keys(cleaned['id']),
+                           'trip_duration': cleaned['trip_duration'].to_numpy(),
+                           'passenger_count': cleaned['passenger_count'].to_numpy(),
+                           'anomaly_group': anomaly_groups,
+                           'trip_distance_km': anomaly_values['trip_distance_km'],
+                           'trip_speed_kmh': anomaly_values['trip_speed_kmh']})
+    return len(partition), partition.shape[1], _frame_to_arrow(ids), _frame_to_arrow(values)
+
+
+def _clean_partition(task):
+    # Worker for phase 2 of clean_in_parallel
+    (filepath, header, start, end, typed, bounding_box, drop_ids, row_offset, bounds, outlier_method, csv_output,
+     od_zoom, anomaly_baseline) = task
+    cleaner = TrainDataCleaner(filepath, bounding_box=bounding_box, od_zoom=od_zoom)
+    with contextlib.redirect_stdout(io.StringIO()):
+        partition = _read_partition(filepath, header, start, end, typed)
+        # Number rows as in a read of the whole file, so exclusions refer to source rows
+        partition.index = pd.RangeIndex(row_offset, row_offset + len(partition))
+        cleaner._clean_chunk_rows(partition, DedupIndex().add(drop_ids))
+        cleaned = cleaner._finish_chunk_rows(bounds, outlier_method, anomaly_baseline)
+
+    if csv_output:
+        payload = (cleaned.head(0).to_csv(index=False).encode(), cleaned.to_csv(index=False, header=False).encode())
+    else:
+        payload = _frame_to_arrow(cleaned)
+    summary = cleaner._new_summary().update(cleaned)
+    od_matrix = ODMatrix.from_frame(cleaned, od_zoom)
+    return len(cleaned), payload, cleaner.exclusions, RollupCube.from_frame(cleaned).cells, od_matrix, summary
+
+
+def main():
+        # Same as `python cli.py`: the standard stages on train.csv -> ../processed/train_cleaned.csv,
+        # with command-line options to change the input, output, mode and stages (see cli.py)
+        from cli import main as cli_main
+        return cli_main()
     
 if __name__ == "__main__":
-        main()
+        sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Command-line entry point for the cleaning pipeline.
+
+Usage:
+    python cli.py                                   # train.csv -> ../processed/train_cleaned.csv, the standard stages
+    python cli.py --input data/train.csv --output out/train_cleaned.parquet --format parquet --no-diagnostics --quiet
+    python cli.py --with score_anomalies,build_rollups --skip basic_info
+    python cli.py --mode chunks --chunksize 1000000 --with build_sort_index
+    python cli.py --mode parallel --workers 8 --dry-run
+
+Only the standard library is imported until the options are checked, so --help,
+--dry-run and bad options return at once; pandas, NumPy and the cleaner are imported
+when the pipeline actually runs.
+
+Diagnostic stages (DIAGNOSTIC_STAGES) only print: overviews, checks and summaries that
+each take a full pass over the data without changing it. --no-diagnostics skips them
+all (detect_outliers included, so no outlier_bounds log is written); --skip drops
+individual ones.
+
+Extra stages (EXTRA_STAGES) add output columns (duration_mismatch, idle features,
+anomaly scores) or side files next to the output (trip_rollups.csv, od_matrix.npz, the
+sort index), so they only run when asked for with --with. Without them the output
+has the same columns as before they existed. Streamed modes (chunks, parallel) clean in
+one stage of their own, which keeps its rollups, OD matrix and anomaly scores as it
+streams; only the stages that follow it can be added or skipped there.
+--quiet hides stage output and prints one result line; errors still go to stderr.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from table_writer import OUTPUT_FORMATS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.join(BASE_DIR, 'train.csv')
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, '..', 'processed', 'train_cleaned.csv')
+
+MODES = ['eager', 'lazy', 'chunks', 'parallel']
+OUTLIER_METHODS = ['cap', 'remove']
+DIAGNOSTIC_STAGES = ('basic_info', 'check_missing_values', 'check_duplicates', 'detect_outliers',
+                     'validate_derived_features', 'create_summary_statistics', 'print_cleaning_summary')
+# Stages that add columns or side files; they only run when named with --with
+EXTRA_STAGES = ('validate_trip_durations', 'create_idle_features', 'score_anomalies', 'build_rollups',
+                'build_od_matrix', 'build_sort_index')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Clean the NYC taxi trip data")
+    parser.add_argument('--input', default=DEFAULT_INPUT, help="source CSV (default: train.csv next to this script)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help="cleaned output path; the extension follows --format (default: ../processed/train_cleaned.csv)")
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='csv', help="output format")
+    parser.add_argument('--mode', choices=MODES, default='eager',
+                        help="eager (in memory), lazy (planned, see pipeline_plan), chunks (streamed) "
+                             "or parallel (streamed, multi-process)")
+    parser.add_argument('--chunksize', type=int, default=None, help="rows per chunk (--mode chunks, default 500000)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (--mode parallel, default: all cores)")
+    parser.add_argument('--typed', action='store_true', help="read the source with the TRAIN_SCHEMA dtypes")
+    parser.add_argument('--outlier-method', choices=OUTLIER_METHODS, default='cap')
+    parser.add_argument('--no-diagnostics', action='store_true', help="skip every diagnostic-only stage")
+    parser.add_argument('--skip', action='append', default=[], metavar='STAGE[,STAGE...]',
+                        help=f"skip diagnostic stages (repeatable): {', '.join(DIAGNOSTIC_STAGES)}")
+    parser.add_argument('--with', action='append', default=[], dest='extras', metavar='STAGE[,STAGE...]',
+                        help=f"also run extra stages (repeatable): {', '.join(EXTRA_STAGES)}")
+    parser.add_argument('--quiet', action='store_true', help="only print the final result line")
+    parser.add_argument('--profile', default=None, metavar='REPORT', help="write a per-stage profile (JSON) here")
+    parser.add_argument('--dry-run', action='store_true', help="check the options, print the stages and exit")
+    return parser
+
+
+def check_options(parser, args):
+    # Everything that can be checked without loading the data; errors exit through the parser
+    skipped = stage_names(args.skip)
+    unknown = sorted(skipped - set(DIAGNOSTIC_STAGES))
+    if unknown:
+        parser.error(f"cannot skip {', '.join(unknown)}: diagnostic stages are {', '.join(DIAGNOSTIC_STAGES)}")
+    if args.no_diagnostics:
+        skipped.update(DIAGNOSTIC_STAGES)
+    args.skip = skipped
+    args.extras = stage_names(args.extras)
+    unknown = sorted(args.extras - set(EXTRA_STAGES))
+    if unknown:
+        parser.error(f"cannot add {', '.join(unknown)}: extra stages are {', '.join(EXTRA_STAGES)}")
+
+    if args.chunksize is not None and args.mode != 'chunks':
+        parser.error("--chunksize only applies to --mode chunks")
+    if args.workers is not None and args.mode != 'parallel':
+        parser.error("--workers only applies to --mode parallel")
+    if args.chunksize is not None and args.chunksize <= 0:
+        parser.error("--chunksize must be positive")
+    if args.workers is not None and args.workers <= 0:
+        parser.error("--workers must be positive")
+    if not os.path.isfile(args.input):
+        parser.error(f"input file not found: {args.input}")
+    return args
+
+
+def stage_names(values):
+    return {name.strip() for value in values for name in value.split(',') if name.strip()}
+
+
+def pipeline_stages(args):
+    # (stage name, keyword arguments) in run order, without the skipped stages and extras not asked for
+    output = {'output_format': args.format}
+    if args.mode in ('chunks', 'parallel'):
+        if args.mode == 'chunks':
+            clean = ('clean_in_chunks', dict(output_path=args.output, chunksize=args.chunksize or 500_000,
+                                             outlier_method=args.outlier_method, typed=args.typed, **output))
+        else:
+            clean = ('clean_in_parallel', dict(output_path=args.output, workers=args.workers,
+                                               outlier_method=args.outlier_method, typed=args.typed, **output))
+        stages = [clean, ('create_summary_statistics', {}), ('build_sort_index', {}),
+                  ('print_cleaning_summary', {})]
+    else:
+        stages = [
+            ('load_data', {'typed': args.typed}),
+            ('basic_info', {}),
+            ('check_missing_values', {}),
+            ('handle_missing_values', {}),
+            ('parse_datetime_columns', {}),
+            ('check_duplicates', {}),
+            ('remove_duplicates', {}),
+            ('validate_data_integrity', {}),
+            ('validate_trip_durations', {}),
+            ('detect_outliers', {}),
+            ('handle_outliers', {'method': args.outlier_method}),
+            ('normalize_data', {}),
+            ('create_derived_features', {}),
+            ('create_idle_features', {}),
+            ('score_anomalies', {}),
+            ('validate_derived_features', {}),
+            ('build_rollups', {}),
+            ('build_od_matrix', {}),
+            ('create_summary_statistics', {}),
+            ('save_cleaned_data', dict(output_path=args.output, **output)),
+            ('build_sort_index', {}),
+            ('print_cleaning_summary', {}),
+        ]
+    return [(name, kwargs) for name, kwargs in stages
+            if name not in args.skip and (name not in EXTRA_STAGES or name in args.extras)]
+
+
+def run_pipeline(args, stages):
+    # Imported here so that --help and option errors don't wait for pandas
+    from cleaning_script import TrainDataCleaner
+    from pipeline_profiler import StageProfiler
+
+    cleaner = TrainDataCleaner(args.input, profiler=StageProfiler() if args.profile else None)
+    pipeline = cleaner.lazy() if args.mode == 'lazy' else cleaner
+    for name, kwargs in stages:
+        getattr(pipeline, name)(**kwargs)
+    if args.mode == 'lazy':
+        pipeline.collect()
+    return cleaner
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = check_options(parser, parser.parse_args(argv))
+    stages = pipeline_stages(args)
+
+    if args.dry_run:
+        print(f"{args.mode} pipeline: {args.input} -> {args.output} ({args.format})")
+        for number, (name, kwargs) in enumerate(stages, 1):
+            options = ', '.join(f"{key}={value!r}" for key, value in kwargs.items())
+            print(f"{number:3d}. {name}({options})")
+        if args.skip:
+            print(f"Skipped: {', '.join(sorted(args.skip))}")
+        left_out = [name for name in EXTRA_STAGES if name not in args.extras]
+        if left_out:
+            print(f"Not run (add with --with): {', '.join(left_out)}")
+        return 0
+
+    start = time.perf_counter()
+    try:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()) if args.quiet else contextlib.nullcontext():
+            cleaner = run_pipeline(args, stages)
+    except Exception as e:
+        print(f"Cleaning failed: {e}", file=sys.stderr)
+        return 1
+
+    if cleaner.profiler is not None:
+        if not args.quiet:
+            cleaner.profiler.print_summary()
+        cleaner.profiler.save(args.profile)
+    rows = cleaner.rows_written if cleaner.rows_written is not None else len(cleaner.df)
+    print(f"Cleaned {cleaner.original_shape[0]} rows to {rows} in {time.perf_counter() - start:.1f}s: "
+          f"{cleaner.written_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Memory-mappable columnar store for the cleaned dataset (output_format='columnar').
+
+A store is a directory:
+- metadata.json: format version, row count and one entry per column (kind, dtype,
+  dictionary for categorical columns)
+- <column>.bin: fixed-width values (numbers, datetime64, bool) or int32 dictionary codes
+- <column>.offsets.bin + <column>.data.bin: high-cardinality strings such as the trip id
+  (int64 end offsets into UTF-8 bytes, the layout Arrow uses)
+
+String columns start out dictionary-encoded when the first chunk has few distinct
+values. The dictionary only grows on append, so a column whose categories pass
+DICTIONARY_MAX_CATEGORIES (the trip id after a small first chunk) is rewritten as
+plain strings at that point.
+
+Readers np.memmap the column files, so opening a store costs nothing, there is no parse
+step, and every process reading the same store shares one page-cached copy instead of
+holding its own DataFrame. Columns are decoded (categoricals, strings) only when asked.
+
+Appends write to the end of the column files and then rewrite metadata.json; the row
+count in the metadata is the commit point, so readers never see a half-written chunk.
+A fresh store is built in a temporary directory and swapped in when it is closed.
+"""
+
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+STORE_FORMAT = 'trip-columnar'
+STORE_VERSION = 1
+METADATA_FILE = 'metadata.json'
+DICTIONARY_MAX_CATEGORIES = 4096    # object/string columns with more distinct values are stored as strings
+MISSING_CODE = -1
+
+
+def is_columnar_store(path):
+    return os.path.isfile(os.path.join(path, METADATA_FILE))
+
+
+def _column_spec(series):
+    # Storage layout for a column, decided from its first chunk (dictionaries that outgrow
+    # DICTIONARY_MAX_CATEGORIES later are rewritten as strings, see ColumnarStoreWriter)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        spec = {'kind': 'categorical', 'dtype': 'int32', 'categories': [str(c) for c in categories],
+                'ordered': bool(series.cat.ordered)}
+        if pd.api.types.is_numeric_dtype(categories.dtype):
+            spec['categories_dtype'] = str(categories.dtype)
+        return spec
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        return {'kind': 'datetime', 'dtype': str(series.to_numpy().dtype)}
+    if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+        return {'kind': 'numeric', 'dtype': str(series.to_numpy().dtype)}
+    if series.nunique(dropna=True) <= DICTIONARY_MAX_CATEGORIES:
+        return {'kind': 'categorical', 'dtype': 'int32', 'categories': []}
+    return {'kind': 'string', 'dtype': 'int64'}
+
+
+def _encode_strings(values):
+    # (int64 end offsets, uint8 UTF-8 bytes) for an object array of str
+    encoded = [value.encode('utf-8') for value in values]
+    lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+    return np.cumsum(lengths), np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+class ColumnarStoreWriter:
+    def __init__(self, path, resume=False):
+        # resume=True appends to an existing store at path; otherwise a new store replaces it on close()
+        self.path = path
+        self.resume = resume and is_columnar_store(path)
+        self.directory = path if self.resume else f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+        if self.resume:
+            with open(os.path.join(path, METADATA_FILE)) as f:
+                self.metadata = json.load(f)
+            self._truncate_to_metadata()
+        else:
+            os.makedirs(self.directory)
+            self.metadata = {'format': STORE_FORMAT, 'version': STORE_VERSION, 'rows': 0, 'columns': []}
+
+    def append(self, df):
+        if len(df) == 0 and self.metadata['columns']:
+            return
+        if not self.metadata['columns']:
+            self.metadata['columns'] = [dict(name=str(col), **_column_spec(df[col])) for col in df.columns]
+        names = [spec['name'] for spec in self.metadata['columns']]
+        if [str(col) for col in df.columns] != names:
+            raise ValueError(f"Columns {list(df.columns)} don't match the store's columns {names}")
+
+        for spec in self.metadata['columns']:
+            self._append_column(spec, df[spec['name']])
+        self.metadata['rows'] += len(df)
+        self._write_metadata()
+
+    def close(self):
+        self._write_metadata()
+        if not self.resume:
+            # Swap the finished store in; readers with the old files mapped keep their copy
+            old_path = None
+            if os.path.exists(self.path):
+                old_path = f"{self.path}.old-{uuid.uuid4().hex[:8]}"
+                os.replace(self.path, old_path)
+            os.replace(self.directory, self.path)
+            if old_path is not None:
+                shutil.rmtree(old_path) if os.path.isdir(old_path) else os.remove(old_path)
+            self.directory = self.path
+            self.resume = True
+
+    def _append_column(self, spec, series):
+        name = spec['name']
+        if spec['kind'] == 'categorical':
+            values = series.astype('string')
+            categories = spec['categories']
+            new = pd.Index(values.dropna().unique()).difference(pd.Index(categories))
+            # Only dictionaries the store chose itself; pandas categoricals keep their categories
+            inferred = 'ordered' not in spec and not isinstance(series.dtype, pd.CategoricalDtype)
+            if inferred and len(categories) + len(new) > DICTIONARY_MAX_CATEGORIES:
+                self._dictionary_to_strings(spec)
+        if spec['kind'] == 'categorical':
+            # New categories are appended to the dictionary so existing codes stay valid
+            categories.extend(str(value) for value in new)
+            codes = pd.Index(categories).get_indexer(values.fillna('').to_numpy(dtype=object))
+            codes[values.isna().to_numpy()] = MISSING_CODE
+            self._append_bytes(f'{name}.bin', codes.astype(np.int32))
+        elif spec['kind'] == 'string':
+            values = series.astype('string').fillna('').to_numpy(dtype=object)
+            offsets, data = _encode_strings(values)
+            self._append_bytes(f'{name}.offsets.bin', self._string_bytes(name) + offsets)
+            self._append_bytes(f'{name}.data.bin', data)
+        else:
+            values = series.to_numpy()
+            dtype = np.dtype(spec['dtype'])
+            if values.dtype != dtype and not np.can_cast(values.dtype, dtype, 'same_kind'):
+                raise ValueError(f"Column {name}: can't store {values.dtype} values in a {dtype} column")
+            self._append_bytes(f'{name}.bin', values.astype(dtype, copy=False))
+
+    def _dictionary_to_strings(self, spec):
+        # Rewrite a dictionary-encoded column's committed rows as plain strings (missing values become '',
+        # as in string columns). The new files are complete before metadata.json names them.
+        name = spec['name']
+        rows = self.metadata['rows']
+        codes_path = os.path.join(self.directory, f'{name}.bin')
+        codes = np.fromfile(codes_path, dtype=np.int32, count=rows) if rows else np.empty(0, dtype=np.int32)
+        categories = np.array(spec['categories'] + [''], dtype=object)
+        offsets, data = _encode_strings(categories[codes])     # MISSING_CODE picks the trailing ''
+        for file_name, values in [(f'{name}.offsets.bin', offsets), (f'{name}.data.bin', data)]:
+            with open(os.path.join(self.directory, file_name), 'wb') as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+        spec.pop('categories')
+        spec.update(kind='string', dtype='int64')
+        self._write_metadata()
+        if os.path.exists(codes_path):
+            os.remove(codes_path)
+
+    def _string_bytes(self, name):
+        offsets_path = os.path.join(self.directory, f'{name}.offsets.bin')
+        if self.metadata['rows'] == 0 or not os.path.exists(offsets_path):
+            return 0
+        offsets = np.memmap(offsets_path, dtype=np.int64, mode='r', shape=(self.metadata['rows'],))
+        return int(offsets[-1])
+
+    def _append_bytes(self, file_name, values):
+        with open(os.path.join(self.directory, file_name), 'ab') as f:
+            f.write(np.ascontiguousarray(values).tobytes())
+
+    def _truncate_to_metadata(self):
+        # Drop anything an interrupted append wrote past the committed row count
+        rows = self.metadata['rows']
+        for spec in self.metadata['columns']:
+            name = spec['name']
+            if spec['kind'] == 'string':
+                end = self._string_bytes(name)
+                self._truncate(f'{name}.offsets.bin', rows * 8)
+                self._truncate(f'{name}.data.bin', end)
+            else:
+                self._truncate(f'{name}.bin', rows * np.dtype(spec['dtype']).itemsize)
+
+    def _truncate(self, file_name, size):
+        path = os.path.join(self.directory, file_name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+
+    def _write_metadata(self):
+        temp_path = os.path.join(self.directory, METADATA_FILE + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+        os.replace(temp_path, os.path.join(self.directory, METADATA_FILE))
+
+
+class ColumnarStore:
+    def __init__(self, path):
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        if metadata.get('format') != STORE_FORMAT or metadata.get('version') != STORE_VERSION:
+            raise ValueError(f"{path} is not a version {STORE_VERSION} {STORE_FORMAT} store")
+        self.path = path
+        self.rows = metadata['rows']
+        self.specs = {spec['name']: spec for spec in metadata['columns']}
+        self._maps = {}
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def columns(self):
+        return list(self.specs)
+
+    def raw(self, name):
+        # Memory-mapped column values (dictionary codes for categorical columns), no copy
+        if name not in self._maps:
+            spec = self.specs[name]
+            if spec['kind'] == 'string':
+                self._maps[name] = (self._map(f'{name}.offsets.bin', np.int64, self.rows),
+                                    self._map(f'{name}.data.bin', np.uint8, None))
+            else:
+                self._maps[name] = self._map(f'{name}.bin', np.dtype(spec['dtype']), self.rows)
+        return self._maps[name]
+
+    def column(self, name):
+        # Decoded column: memmap-backed for numeric/datetime, Categorical or object strings otherwise
+        spec = self.specs[name]
+        if spec['kind'] == 'categorical':
+            categories = pd.Index(spec['categories'])
+            if 'categories_dtype' in spec:
+                categories = categories.astype(spec['categories_dtype'])
+            return pd.Categorical.from_codes(self.raw(name), categories=categories,
+                                             ordered=spec.get('ordered', False))
+        if spec['kind'] == 'string':
+            offsets, data = self.raw(name)
+            starts = np.concatenate([[0], offsets[:-1]]) if self.rows else offsets
+            buffer = data.tobytes()
+            return np.array([buffer[start:end].decode('utf-8') for start, end in zip(starts, offsets)], dtype=object)
+        return self.raw(name)
+
+    def to_frame(self, columns=None):
+        names = columns if columns is not None else self.columns
+        return pd.DataFrame({name: self.column(name) for name in names}, copy=False)
+
+    def _map(self, file_name, dtype, rows):
+        path = os.path.join(self.path, file_name)
+        if rows == 0 or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        shape = (rows,) if rows is not None else None
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
@@ -0,0 +1,153 @@
+"""
+Compact hashed index for trip-ID and trip-signature deduplication.
+
+fingerprint() makes one pass over the columns and produces three 8-byte keys per row:
+- id key: 'id2875421' parsed to an integer (digit count kept in the high bits so
+  'id042' and 'id42' stay distinct); IDs that don't follow the pattern are hashed
+- signature: uint64 hash of the pickup/dropoff times and coordinates
+- row: the id key, signature and a hash of the remaining columns hashed together
+  (order-dependent, as pandas combines columns, so equal parts can't cancel out)
+
+All three duplicate questions (exact rows, repeated IDs, repeated trips) are answered
+from these keys. A DedupIndex also remembers keys across chunks and files in sorted
+NumPy segments (8 bytes per ID, plus 8 per signature when tracked) and can be saved
+to / loaded from a .npz file.
+
+Signatures, row keys and non-standard IDs are 64-bit hashes. Two different values
+share a key with probability about n**2 / 2**65 among n keys: about 6e-8 for the
+1.5 million rows of train.csv, 3e-4 for 100 million rows. Exact-duplicate removal
+doesn't rely on that: duplicated_rows() confirms every repeated row key against
+the columns themselves. Repeated IDs and repeated trips are taken from the keys.
+"""
+
+import numpy as np
+import pandas as pd
+
+SIGNATURE_COLUMNS = ['pickup_datetime', 'dropoff_datetime',
+                     'pickup_longitude', 'pickup_latitude',
+                     'dropoff_longitude', 'dropoff_latitude']
+
+_MAX_ID_DIGITS = 17                       # 10**17 < 2**57
+_HASHED_ID_FLAG = np.uint64(1 << 63)      # marks IDs that had to be hashed
+_MAX_SEGMENTS = 16
+
+
+def trip_id_keys(ids):
+    # Vectorized 'id<digits>' -> int64 key; anything else is hashed (high bit set)
+    ids = pd.Series(ids).astype('string')
+    digits = ids.str.slice(2)
+    n_digits = digits.str.len()
+    parseable = (ids.str.startswith('id') & digits.str.isdigit() & (n_digits <= _MAX_ID_DIGITS)).fillna(False)
+    parseable = parseable.to_numpy(dtype=bool)
+
+    keys = np.empty(len(ids), dtype=np.uint64)
+    numbers = digits[parseable].astype('int64').to_numpy()
+    keys[parseable] = (n_digits[parseable].to_numpy(dtype=np.uint64) << np.uint64(57)) | numbers.astype(np.uint64)
+    if not parseable.all():
+        hashed = pd.util.hash_array(ids[~parseable].to_numpy(dtype=object))
+        keys[~parseable] = hashed | _HASHED_ID_FLAG
+    return keys.view(np.int64)
+
+
+def fingerprint(df):
+    # One pass over the columns: id keys, trip signature hashes and whole-row hashes
+    # The parsed id key stands in for the id strings, which are by far the slowest column to hash
+    id_keys = trip_id_keys(df['id'])
+    signature_cols = [col for col in SIGNATURE_COLUMNS if col in df.columns]
+    other_cols = [col for col in df.columns if col not in signature_cols and col != 'id']
+    signature = pd.util.hash_pandas_object(df[signature_cols], index=False).to_numpy()
+    parts = {'id': id_keys, 'signature': signature}
+    if other_cols:
+        parts['other'] = pd.util.hash_pandas_object(df[other_cols], index=False).to_numpy()
+    row = pd.util.hash_pandas_object(pd.DataFrame(parts, copy=False), index=False).to_numpy()
+    return {
+        'id': id_keys,
+        'signature': signature,
+        'row': row,
+    }
+
+
+def duplicated(keys):
+    # keep='first' duplicate mask over an array of integer keys
+    return pd.Series(keys, copy=False).duplicated(keep='first').to_numpy()
+
+
+def duplicated_rows(df, row_keys):
+    # Exact df.duplicated(): rows whose key repeats are compared on their columns, so a
+    # hash collision between different rows never drops one
+    candidates = pd.Series(row_keys, copy=False).duplicated(keep=False).to_numpy()
+    mask = np.zeros(len(df), dtype=bool)
+    if candidates.any():
+        mask[candidates] = df[candidates].duplicated(keep='first').to_numpy()
+    return mask
+
+
+class DedupIndex:
+    def __init__(self):
+        self._id_segments = []
+        self._signature_segments = []
+
+    def __len__(self):
+        return sum(len(segment) for segment in self._id_segments)
+
+    def add(self, id_keys, signatures=None):
+        self._id_segments = self._append_segment(self._id_segments, id_keys)
+        if signatures is not None:
+            self._signature_segments = self._append_segment(self._signature_segments, signatures)
+        return self
+
+    def contains_ids(self, id_keys):
+        return self._contains(self._id_segments, id_keys)
+
+    def contains_signatures(self, signatures):
+        return self._contains(self._signature_segments, signatures)
+
+    def copy(self):
+        # Segments are never modified in place, so copies can share them
+        index = DedupIndex()
+        index._id_segments = list(self._id_segments)
+        index._signature_segments = list(self._signature_segments)
+        return index
+
+    def ids(self):
+        return np.concatenate(self._id_segments) if self._id_segments else np.empty(0, dtype=np.int64)
+
+    def save(self, path):
+        signatures = (np.concatenate(self._signature_segments) if self._signature_segments
+                      else np.empty(0, dtype=np.uint64))
+        np.savez(path, ids=self.ids(), signatures=signatures)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with np.load(path) as data:
+            index.add(data['ids'], data['signatures'] if len(data['signatures']) else None)
+        return index
+
+    def merge(self, other):
+        for segment in other._id_segments:
+            self._id_segments = self._append_segment(self._id_segments, segment)
+        for segment in other._signature_segments:
+            self._signature_segments = self._append_segment(self._signature_segments, segment)
+        return self
+
+    @staticmethod
+    def _append_segment(segments, keys):
+        keys = np.unique(np.asarray(keys))
+        if len(keys) == 0:
+            return segments
+        segments = segments + [keys]
+        # Keep lookups cheap by compacting small segments once there are too many
+        if len(segments) > _MAX_SEGMENTS:
+            segments = [np.unique(np.concatenate(segments))]
+        return segments
+
+    @staticmethod
+    def _contains(segments, keys):
+        keys = np.asarray(keys)
+        found = np.zeros(len(keys), dtype=bool)
+        for segment in segments:
+            positions = np.searchsorted(segment, keys)
+            positions[positions == len(segment)] = 0
+            found |= segment[positions] == keys
+        return found
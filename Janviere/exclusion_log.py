@@ -0,0 +1,153 @@
+"""
+Row-number exclusion logs behind the transparency outputs.
+
+Cleaning stages record which rows they removed or capped. Each record is the row's
+number in the source file (the index a fresh pandas read gives, chunked reads
+included) plus a few small per-row columns, such as the capped value or a bitmask of
+the validation rules the row broke. No copy of the row itself is kept. That costs a
+few bytes per excluded row instead of a full copy, so dirty inputs don't double peak
+memory.
+
+Full rows are materialized only when the logs are written. read_rows streams the
+source file once in blocks, picks the recorded lines and parses just those. Like
+clean_in_parallel's byte-range partitioning, this assumes one record per line.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+REASON_COLUMN = 'exclusion_reason'
+BLOCK_BYTES = 64 * 1024**2
+FLUSH_BYTES = 16 * 1024**2       # raw bytes of picked lines parsed and handed out at a time
+
+
+def _source_blocks(f, block_bytes):
+    # (first row number, block, line starts, line ends) for blocks of whole lines after the header
+    row = 0
+    carry = b''
+    while True:
+        data = f.read(block_bytes)
+        block = carry + data
+        if data:
+            cut = block.rfind(b'\n') + 1
+            block, carry = block[:cut], block[cut:]
+            if not block:
+                continue    # a line longer than the block: keep reading
+        elif not block:
+            return
+        elif not block.endswith(b'\n'):
+            block += b'\n'  # last line without a newline
+
+        values = np.frombuffer(block, dtype=np.uint8)
+        ends = np.flatnonzero(values == 10)
+        starts = np.concatenate([[0], ends[:-1] + 1])
+        lengths = ends - starts
+        # pandas skips blank lines, so they get no row number
+        blank = (lengths == 0) | ((lengths == 1) & (values[starts] == 13))
+        starts, ends = starts[~blank], ends[~blank]
+        yield row, block, starts, ends
+        row += len(starts)
+        if not data:
+            return
+
+
+class ExclusionLog:
+    def __init__(self, reason_labels=None):
+        # reason_labels: log name -> labels of the bits recorded in that log's REASON_COLUMN
+        self.reason_labels = reason_labels or {}
+        self._parts = {}    # log name -> list of (row numbers, {column: values})
+
+    def __len__(self):
+        return sum(self.count(log_name) for log_name in self._parts)
+
+    def add(self, log_name, rows, **columns):
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) > 0:
+            columns = {name: np.asarray(values) for name, values in columns.items()}
+            self._parts.setdefault(log_name, []).append((rows, columns))
+        return self
+
+    def merge(self, other):
+        for log_name, parts in other._parts.items():
+            self._parts.setdefault(log_name, []).extend(parts)
+        return self
+
+    def count(self, log_name):
+        return sum(len(rows) for rows, _ in self._parts.get(log_name, []))
+
+    @property
+    def nbytes(self):
+        return sum(rows.nbytes + sum(values.nbytes for values in columns.values())
+                   for parts in self._parts.values() for rows, columns in parts)
+
+    def entries(self, log_name):
+        # (row numbers ascending, {column: values in the same order}) for one log
+        parts = self._parts.get(log_name, [])
+        if not parts:
+            return np.empty(0, dtype=np.int64), {}
+        rows = np.concatenate([part_rows for part_rows, _ in parts])
+        order = np.argsort(rows, kind='stable')
+        columns = {name: np.concatenate([part_columns[name] for _, part_columns in parts])[order]
+                   for name in parts[0][1]}
+        return rows[order], columns
+
+    def read_rows(self, filepath, log_names=None, block_bytes=BLOCK_BYTES, flush_bytes=FLUSH_BYTES, **read_kwargs):
+        # One streaming pass over the source; yields (log name, DataFrame) pieces in row order,
+        # indexed by row number, with the recorded columns appended. read_kwargs go to pd.read_csv.
+        log_names = [name for name in (log_names or list(self._parts)) if self.count(name) > 0]
+        wanted = {name: self.entries(name) for name in log_names}
+        done = {name: 0 for name in wanted}         # entries already handed out
+        picked = {name: 0 for name in wanted}       # entries picked so far
+        pending = {name: [] for name in wanted}     # raw lines not yet handed out
+
+        with open(filepath, 'rb') as f:
+            header = f.readline()
+            for first_row, block, starts, ends in _source_blocks(f, block_bytes):
+                last_row = first_row + len(starts)
+                for name, (rows, _) in wanted.items():
+                    stop = int(np.searchsorted(rows, last_row, side='left'))
+                    if stop == picked[name]:
+                        continue
+                    lines = rows[picked[name]:stop] - first_row
+                    pending[name].append(b''.join(block[start:end + 1]
+                                                  for start, end in zip(starts[lines], ends[lines])))
+                    picked[name] = stop
+                    if sum(len(chunk) for chunk in pending[name]) >= flush_bytes:
+                        yield name, self._frame(name, wanted[name], header, pending, done, picked, read_kwargs)
+
+        for name in wanted:
+            if picked[name] < len(wanted[name][0]):
+                raise ValueError(f"{filepath} has fewer rows than the {name} log refers to; was it changed?")
+            if pending[name]:
+                yield name, self._frame(name, wanted[name], header, pending, done, picked, read_kwargs)
+
+    def records(self, filepath, log_name, **read_kwargs):
+        # All rows of one log as a single DataFrame
+        pieces = [frame for _, frame in self.read_rows(filepath, [log_name], **read_kwargs)]
+        return pd.concat(pieces) if pieces else None
+
+    def _frame(self, name, entries, header, pending, done, picked, read_kwargs):
+        rows, columns = entries
+        start, stop = done[name], picked[name]
+        frame = pd.read_csv(io.BytesIO(header + b''.join(pending[name])), **read_kwargs)
+        if len(frame) != stop - start:
+            raise ValueError(f"Picked {stop - start} lines for the {name} log but parsed {len(frame)} rows")
+        frame.index = rows[start:stop]
+        for column, values in columns.items():
+            values = values[start:stop]
+            if column == REASON_COLUMN and name in self.reason_labels:
+                values = self._reason_names(values, self.reason_labels[name])
+            frame[column] = values
+        pending[name] = []
+        done[name] = stop
+        return frame
+
+    @staticmethod
+    def _reason_names(bits, labels):
+        # Reason bitmasks -> ';'-joined labels (decoded once per distinct mask)
+        masks, inverse = np.unique(bits, return_inverse=True)
+        names = np.array([';'.join(label for i, label in enumerate(labels) if int(mask) >> i & 1)
+                          for mask in masks], dtype=object)
+        return names[inverse]
@@ -0,0 +1,98 @@
+"""
+Persisted state for incremental (append-only) cleaning of daily trip drops.
+
+A state directory holds:
+- state.json: content hashes of processed input files, the running quantile sketches
+  behind handle_outliers, and the manifest of output files written per batch
+- ids-<batch>.npz: integer keys of the trip IDs kept by each batch (see dedup_index)
+
+With this a new batch is cleaned and appended in time proportional to the batch,
+and files that were already processed (same content hash) are skipped.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from dedup_index import DedupIndex
+from quantile_sketch import QuantileSketch
+
+STATE_VERSION = 1
+
+
+def file_content_hash(path, block_size=1024 * 1024):
+    # sha256 of the file contents, read in blocks
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IncrementalState:
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, 'state.json')
+        self.processed_files = {}
+        self.sketches = {}
+        self.outputs = []
+
+    @classmethod
+    def load(cls, state_dir):
+        state = cls(state_dir)
+        if os.path.exists(state.state_path):
+            with open(state.state_path) as f:
+                data = json.load(f)
+            if data.get('version') != STATE_VERSION:
+                raise ValueError(f"Unsupported incremental state version in {state.state_path}")
+            state.processed_files = data['processed_files']
+            state.sketches = {col: QuantileSketch.from_dict(sketch) for col, sketch in data['sketches'].items()}
+            state.outputs = data['outputs']
+        return state
+
+    @property
+    def batch_count(self):
+        return len(self.processed_files)
+
+    def is_processed(self, content_hash):
+        return content_hash in self.processed_files
+
+    def ids_path(self, batch):
+        return os.path.join(self.state_dir, f'ids-{batch:05d}.npz')
+
+    def load_seen_ids(self):
+        # Only batches recorded in state.json count, so a batch that crashed midway is ignored
+        seen_ids = DedupIndex()
+        for info in self.processed_files.values():
+            seen_ids.merge(DedupIndex.load(self.ids_path(info['batch'])))
+        return seen_ids
+
+    def record_batch(self, content_hash, input_path, new_ids, sketches, rows_in, rows_written, output_path):
+        # Persist a finished batch: IDs first, then state.json, so a crash never marks a batch done early
+        os.makedirs(self.state_dir, exist_ok=True)
+        batch = self.batch_count + 1
+        DedupIndex().add(new_ids).save(self.ids_path(batch))
+        self.processed_files[content_hash] = {
+            'path': os.path.abspath(input_path),
+            'batch': batch,
+            'rows_in': rows_in,
+            'rows_written': rows_written,
+            'processed_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.sketches = sketches
+        self.outputs.append({'batch': batch, 'path': output_path, 'rows': rows_written})
+        self.save()
+        return batch
+
+    def save(self):
+        data = {
+            'version': STATE_VERSION,
+            'processed_files': self.processed_files,
+            'sketches': {col: sketch.to_dict() for col, sketch in self.sketches.items()},
+            'outputs': self.outputs,
+        }
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.state_path)
@@ -0,0 +1,166 @@
+"""
+Origin-destination (OD) matrix of trip flows between zones, for capacity planning.
+
+Zones are cells of the spatial_index quadtree grid at OD_ZONE_ZOOM (zoom 14 is about
+1.2 km north-south), so snapping a trip is a bit shift of its pickup_cell/dropoff_cell
+code (or cell_codes at that zoom when the columns are missing). Only zone pairs that
+have trips are stored, as a sparse COO list sorted by pair key (origin << 2*zoom | destination):
+trip count, duration sum and speed sum per pair. Mean duration and speed come from
+the sums, so matrices built per chunk, per worker or per run combine with merge().
+
+Every pair also carries the great-circle distance between its zone centroids. Those
+come from a ZoneDistanceCache shared across matrices: a sorted table of pair keys, so
+a pair seen in an earlier chunk is a binary search instead of a new haversine. Loading
+a saved matrix seeds the cache with its stored distances, so earlier runs count too.
+
+save()/load() use a compressed .npz of the COO arrays (OD_MATRIX_FILE).
+"""
+
+import numpy as np
+import pandas as pd
+
+from spatial_index import MAX_ZOOM, cell_centers, cell_codes, coarsen, haversine_km
+
+OD_MATRIX_FILE = 'od_matrix.npz'
+OD_ZONE_ZOOM = 14
+MAX_OD_ZOOM = 15       # pair keys hold two 2*zoom-bit zone codes in an int64
+
+
+def pair_keys(origin, destination, zoom):
+    return (np.asarray(origin, dtype=np.int64) << (2 * zoom)) | np.asarray(destination, dtype=np.int64)
+
+
+def split_pair_keys(keys, zoom):
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> (2 * zoom), keys & ((1 << (2 * zoom)) - 1)
+
+
+class ZoneDistanceCache:
+    # Centroid distances (km) of zone pairs, computed once per pair and zoom
+    def __init__(self):
+        self._tables = {}    # zoom -> (sorted pair keys, distances)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self._tables.values())
+
+    def distances(self, keys, zoom):
+        # Distances for an array of pair keys at zoom
+        keys = np.asarray(keys, dtype=np.int64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        cached_keys, cached = self._tables.get(zoom, (np.empty(0, dtype=np.int64), np.empty(0)))
+        positions = np.searchsorted(cached_keys, unique_keys)
+        found = positions < len(cached_keys)
+        found[found] = cached_keys[positions[found]] == unique_keys[found]
+
+        new_keys = unique_keys[~found]
+        self.hits += int(found.sum())
+        self.misses += len(new_keys)
+        if len(new_keys):
+            origin, destination = split_pair_keys(new_keys, zoom)
+            self.add(new_keys, haversine_km(*cell_centers(origin, zoom), *cell_centers(destination, zoom)), zoom)
+            cached_keys, cached = self._tables[zoom]
+        return cached[np.searchsorted(cached_keys, unique_keys)][inverse]
+
+    def add(self, keys, distances, zoom):
+        # Store known distances (pairs already cached keep their value)
+        cached_keys, cached = self._tables.get(zoom, (np.empty(0, dtype=np.int64), np.empty(0)))
+        merged_keys, first = np.unique(np.concatenate([cached_keys, np.asarray(keys, dtype=np.int64)]),
+                                       return_index=True)
+        self._tables[zoom] = (merged_keys, np.concatenate([cached, np.asarray(distances, dtype=np.float64)])[first])
+
+
+ZONE_DISTANCES = ZoneDistanceCache()
+
+
+class ODMatrix:
+    def __init__(self, zoom=OD_ZONE_ZOOM, keys=None, trip_count=None, duration_sum=None, speed_sum=None,
+                 distances=None):
+        if not 0 <= zoom <= MAX_OD_ZOOM:
+            raise ValueError(f"OD zone zoom must be between 0 and {MAX_OD_ZOOM}")
+        self.zoom = zoom
+        self.distances = distances if distances is not None else ZONE_DISTANCES
+        empty = keys is None
+        self.keys = np.empty(0, dtype=np.int64) if empty else np.asarray(keys, dtype=np.int64)
+        self.trip_count = np.empty(0, dtype=np.int64) if empty else np.asarray(trip_count, dtype=np.int64)
+        self.duration_sum = np.empty(0) if empty else np.asarray(duration_sum, dtype=np.float64)
+        self.speed_sum = np.empty(0) if empty else np.asarray(speed_sum, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def trips(self):
+        return int(self.trip_count.sum())
+
+    @classmethod
+    def from_frame(cls, df, zoom=OD_ZONE_ZOOM, distances=None):
+        # One sparse matrix from cleaned trips (needs trip_speed_kmh from create_derived_features)
+        origin = cls._zones(df, 'pickup', zoom)
+        destination = cls._zones(df, 'dropoff', zoom)
+        matrix = cls(zoom, distances=distances)
+        return matrix._add(pair_keys(origin, destination, zoom), np.ones(len(df), dtype=np.int64),
+                           df['trip_duration'].to_numpy(dtype=np.float64),
+                           df['trip_speed_kmh'].to_numpy(dtype=np.float64))
+
+    def update(self, df):
+        # Fold newly cleaned rows into the matrix
+        return self.merge(ODMatrix.from_frame(df, self.zoom, self.distances))
+
+    def merge(self, other):
+        if other.zoom != self.zoom:
+            raise ValueError(f"Cannot merge OD matrices with zone zoom {self.zoom} and {other.zoom}")
+        return self._add(other.keys, other.trip_count, other.duration_sum, other.speed_sum)
+
+    def centroid_distances(self):
+        # Centroid distance (km) of every stored pair, from the shared cache
+        return self.distances.distances(self.keys, self.zoom)
+
+    def flows(self):
+        # One row per zone pair with trips: zone codes and centroids, trip count, mean duration/speed
+        origin, destination = split_pair_keys(self.keys, self.zoom)
+        origin_lat, origin_lon = cell_centers(origin, self.zoom)
+        destination_lat, destination_lon = cell_centers(destination, self.zoom)
+        return pd.DataFrame({
+            'origin_zone': origin, 'destination_zone': destination,
+            'origin_lat': origin_lat, 'origin_lon': origin_lon,
+            'destination_lat': destination_lat, 'destination_lon': destination_lon,
+            'trip_count': self.trip_count,
+            'mean_duration_sec': self.duration_sum / self.trip_count,
+            'mean_speed_kmh': self.speed_sum / self.trip_count,
+            'centroid_distance_km': self.centroid_distances(),
+        })
+
+    def save(self, path):
+        np.savez_compressed(path, zoom=np.int64(self.zoom), keys=self.keys, trip_count=self.trip_count,
+                            duration_sum=self.duration_sum, speed_sum=self.speed_sum,
+                            centroid_distance_km=self.centroid_distances())
+        return path
+
+    @classmethod
+    def load(cls, path, distances=None):
+        with np.load(path) as data:
+            matrix = cls(int(data['zoom']), data['keys'], data['trip_count'], data['duration_sum'],
+                         data['speed_sum'], distances)
+            matrix.distances.add(data['keys'], data['centroid_distance_km'], matrix.zoom)
+        return matrix
+
+    @staticmethod
+    def _zones(df, side, zoom):
+        if f'{side}_cell' in df.columns:
+            return coarsen(df[f'{side}_cell'].to_numpy(dtype=np.int64), zoom, MAX_ZOOM)
+        return cell_codes(df[f'{side}_latitude'], df[f'{side}_longitude'], zoom)
+
+    def _add(self, keys, trip_count, duration_sum, speed_sum):
+        # Sum entries with equal pair keys into the sorted sparse arrays
+        keys = np.concatenate([self.keys, keys])
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        self.keys = unique_keys
+        self.trip_count = np.bincount(inverse, weights=np.concatenate([self.trip_count, trip_count]),
+                                      minlength=len(unique_keys)).astype(np.int64)
+        self.duration_sum = np.bincount(inverse, weights=np.concatenate([self.duration_sum, duration_sum]),
+                                        minlength=len(unique_keys))
+        self.speed_sum = np.bincount(inverse, weights=np.concatenate([self.speed_sum, speed_sum]),
+                                     minlength=len(unique_keys))
+        return self
@@ -0,0 +1,212 @@
+"""
+Lazy execution of TrainDataCleaner stages.
+
+cleaner.lazy() returns a LazyPipeline. It records chained stage calls instead of
+running them, and collect() plans the recorded chain and runs it on the cleaner.
+The planner reads a declarative stage table (PIPELINE_STAGES in cleaning_script).
+Each stage is a source, report, filter, transform or sink, declared with the columns
+it reads and writes and whether it is row-local (each output row depends only on
+the same input row).
+
+Planning rules:
+- redundant conversions: once the datetime columns are parsed (by a typed load or
+  parse_datetime_columns), later re-parses are dropped or switched off
+  (normalize_data(parse_datetimes=False))
+- filter pushdown: a filter moves ahead of row-local transforms that write none of
+  the columns it reads, so those transforms skip the rows it drops (its transparency
+  log then holds the columns present at its new position)
+- fusion: adjacent stages that repeat a computation share it (the fusion table,
+  e.g. check_duplicates + remove_duplicates hash the rows once), and a run of
+  consecutive row-local stages becomes one pass (TrainDataCleaner.run_row_local):
+  each stage sees only the columns it reads, and the other columns are gathered
+  once for the rows the whole run keeps instead of being copied by every filter
+- transparency logs: excluded rows are not copied when no stage in the chain saves them
+Each rule leaves the cleaned data identical to running the same chain eagerly.
+explain() prints the plan.
+"""
+
+import inspect
+from collections import namedtuple
+
+ALL_COLUMNS = '*'
+
+# kind: 'source', 'report' (reads the frame, leaves it unchanged), 'filter' (drops rows),
+#       'transform' (changes or adds columns) or 'sink' (writes the data and transparency logs)
+# reads/writes: column names, or ALL_COLUMNS
+# row_local: each output row depends only on the same input row, and the stage changes no columns
+#            besides writes (fused row-local stages only get their reads and keep only their writes)
+# parses: datetime columns the stage converts, whenever its parse_option argument is true
+#         (always when parse_option is None)
+StageSpec = namedtuple('StageSpec', ['kind', 'reads', 'writes', 'row_local', 'parses', 'parse_option'],
+                       defaults=((), (), False, (), None))
+
+Plan = namedtuple('Plan', ['steps', 'keep_logs', 'notes'])
+
+# Shared computation of a step that runs consecutive row-local stages as one pass
+ROW_LOCAL_PASS = 'row-local pass'
+
+
+class PlanNode:
+    def __init__(self, name, args=(), kwargs=None):
+        self.name = name
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+
+    def describe(self):
+        arguments = [repr(arg) for arg in self.args] + [f"{key}={value!r}" for key, value in self.kwargs.items()]
+        return f"{self.name}({', '.join(arguments)})"
+
+
+class LazyPipeline:
+    def __init__(self, cleaner, stages, fusions=()):
+        # fusions: (first stage, second stage, keyword, function of the frame) - the function's
+        # result is passed to both stages as keyword
+        self.cleaner = cleaner
+        self.stages = stages
+        self.fusions = fusions
+        self.nodes = []
+
+    def __getattr__(self, name):
+        # Every stage in the table chains like the eager method but is only recorded
+        if name not in self.__dict__.get('stages', {}):
+            raise AttributeError(f"{name!r} is not a pipeline stage")
+
+        def record(*args, **kwargs):
+            self.nodes.append(PlanNode(name, args, kwargs))
+            return self
+        return record
+
+    def plan(self):
+        notes = []
+        nodes = [PlanNode(node.name, node.args, node.kwargs) for node in self.nodes]
+        nodes = self._drop_redundant_parses(nodes, notes)
+        nodes = self._push_down_filters(nodes, notes)
+        steps = self._fuse(nodes, notes)
+        keep_logs = any(self.stages[node.name].kind == 'sink' for node in nodes)
+        if not keep_logs:
+            notes.append("transparency logs skipped: no stage saves them")
+        return Plan(steps, keep_logs, notes)
+
+    def explain(self):
+        plan = self.plan()
+        print("\nPIPELINE PLAN")
+        for number, (nodes, _) in enumerate(plan.steps, 1):
+            print(f"{number:3d}. {' + '.join(node.describe() for node in nodes)}")
+        for note in plan.notes:
+            print(f"  - {note}")
+        return self
+
+    def collect(self):
+        # Run the planned stages on the cleaner and return it
+        plan = self.plan()
+        cleaner = self.cleaner
+        keep_logs = cleaner.keep_logs
+        if not plan.keep_logs:
+            cleaner.keep_logs = set()
+        try:
+            for nodes, shared in plan.steps:
+                if shared == ROW_LOCAL_PASS:
+                    cleaner.run_row_local([(node.name, node.args, node.kwargs) for node in nodes])
+                    continue
+                extra = {}
+                if shared is not None:
+                    keyword, compute = shared
+                    extra[keyword] = compute(cleaner.df)
+                for node in nodes:
+                    getattr(cleaner, node.name)(*node.args, **node.kwargs, **extra)
+        finally:
+            cleaner.keep_logs = keep_logs
+        return cleaner
+
+    def _bind(self, node):
+        # Arguments of a recorded call with defaults filled in (also rejects bad arguments before anything runs)
+        bound = inspect.signature(getattr(self.cleaner, node.name)).bind(*node.args, **node.kwargs)
+        bound.apply_defaults()
+        return bound
+
+    def _drop_redundant_parses(self, nodes, notes):
+        parsed = set()
+        kept = []
+        for node in nodes:
+            spec = self.stages[node.name]
+            parses = set(spec.parses)
+            if parses and spec.parse_option is not None:
+                bound = self._bind(node)
+                if not bound.arguments[spec.parse_option]:
+                    parses = set()
+                elif parses <= parsed and spec.kind != 'source':
+                    # Switch the re-parse off; the stage's other work still runs
+                    if list(bound.signature.parameters).index(spec.parse_option) < len(node.args):
+                        bound.arguments[spec.parse_option] = False
+                        node.args, node.kwargs = bound.args, bound.kwargs
+                    else:
+                        node.kwargs[spec.parse_option] = False
+                    notes.append(f"{node.name}: datetime re-parse switched off ({spec.parse_option}=False)")
+                    parses = set()
+            elif parses and parses <= parsed and spec.writes != ALL_COLUMNS and set(spec.writes) <= parses:
+                notes.append(f"{node.name} dropped: datetime columns are already parsed")
+                continue
+
+            if spec.writes == ALL_COLUMNS:
+                parsed = set(parses)
+            else:
+                parsed = (parsed - set(spec.writes)) | parses
+            kept.append(node)
+        return kept
+
+    def _push_down_filters(self, nodes, notes):
+        nodes = list(nodes)
+        for i in range(len(nodes)):
+            if self.stages[nodes[i].name].kind != 'filter':
+                continue
+            position = i
+            while position > 0 and self._can_pass(nodes[position - 1], nodes[position]):
+                nodes[position - 1], nodes[position] = nodes[position], nodes[position - 1]
+                position -= 1
+            if position < i:
+                passed = ', '.join(node.name for node in nodes[position + 1:i + 1])
+                notes.append(f"{nodes[position].name} moved ahead of {passed}")
+        return nodes
+
+    def _can_pass(self, earlier, node):
+        # Whether a filter can run before an earlier stage without changing any row's result
+        before = self.stages[earlier.name]
+        spec = self.stages[node.name]
+        if before.kind != 'transform' or not before.row_local:
+            return False
+        if spec.reads == ALL_COLUMNS or before.writes == ALL_COLUMNS:
+            return False
+        # A filter that adds columns (validate_trip_durations flagging) would change the column order
+        if spec.writes:
+            return False
+        return not set(before.writes) & set(spec.reads)
+
+    def _fuse(self, nodes, notes):
+        # Pairs from the fusion table, then runs of row-local stages; other stages stay separate steps
+        fusions = {(first, second): (keyword, compute) for first, second, keyword, compute in self.fusions}
+        steps = []
+        i = 0
+        while i < len(nodes):
+            pair = tuple(node.name for node in nodes[i:i + 2])
+            run = 0
+            while i + run < len(nodes) and self._row_local(nodes[i + run]):
+                run += 1
+            if pair in fusions:
+                steps.append((nodes[i:i + 2], fusions[pair]))
+                notes.append(f"{pair[0]} + {pair[1]} fused: {fusions[pair][0]} computed once")
+                i += 2
+            elif run > 1:
+                steps.append((nodes[i:i + run], ROW_LOCAL_PASS))
+                notes.append(f"{' + '.join(node.name for node in nodes[i:i + run])} fused: "
+                             "kept rows gathered once")
+                i += run
+            else:
+                steps.append((nodes[i:i + 1], None))
+                i += 1
+        return steps
+
+    def _row_local(self, node):
+        spec = self.stages[node.name]
+        if ALL_COLUMNS in (spec.reads, spec.writes):
+            return False
+        return spec.row_local and spec.kind in ('filter', 'transform')
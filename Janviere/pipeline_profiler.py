@@ -0,0 +1,135 @@
+"""
+Per-stage profiling for TrainDataCleaner.
+
+Stage methods are wrapped with @profile_stage. When a cleaner is created with a
+StageProfiler, every stage call records wall time, CPU time, RSS, peak RSS and
+rows in/out (plus a tracemalloc delta/peak when trace_memory=True, which is
+slower). report() returns a machine-readable dict and save() writes it as JSON.
+Without a profiler the wrapper is a plain pass-through.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+
+def current_rss_mb():
+    # Resident set size of this process (Linux /proc, falling back to the peak RSS)
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _row_count(cleaner):
+    df = getattr(cleaner, 'df', None)
+    return None if df is None else len(df)
+
+
+class StageProfiler:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def measure(self, stage, cleaner):
+        record = {
+            'stage': stage,
+            'depth': self._depth,
+            'rows_in': _row_count(cleaner),
+            'rss_before_mb': current_rss_mb(),
+        }
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            traced_before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        self._depth += 1
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            self._depth -= 1
+            record['rows_out'] = _row_count(cleaner)
+            record['rss_after_mb'] = current_rss_mb()
+            record['peak_rss_mb'] = peak_rss_mb()
+            if self.trace_memory:
+                traced_after, traced_peak = tracemalloc.get_traced_memory()
+                record['traced_delta_mb'] = (traced_after - traced_before) / 1024**2
+                record['traced_peak_mb'] = (traced_peak - traced_before) / 1024**2
+            self.records.append(record)
+
+    def summary(self):
+        # Totals per stage name (a stage called once per chunk shows up once, with its call count)
+        stages = {}
+        for record in self.records:
+            stage = stages.setdefault(record['stage'], {
+                'stage': record['stage'], 'depth': record['depth'], 'calls': 0,
+                'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+                'peak_rss_mb': 0.0,
+            })
+            stage['calls'] += 1
+            stage['wall_seconds'] += record['wall_seconds']
+            stage['cpu_seconds'] += record['cpu_seconds']
+            stage['rows_in'] += record['rows_in'] or 0
+            stage['rows_out'] += record['rows_out'] or 0
+            stage['peak_rss_mb'] = max(stage['peak_rss_mb'], record['peak_rss_mb'])
+            if 'traced_peak_mb' in record:
+                stage['traced_peak_mb'] = max(stage.get('traced_peak_mb', 0.0), record['traced_peak_mb'])
+        return list(stages.values())
+
+    def report(self):
+        top_level = [record for record in self.records if record['depth'] == 0]
+        return {
+            'total_wall_seconds': sum(record['wall_seconds'] for record in top_level),
+            'total_cpu_seconds': sum(record['cpu_seconds'] for record in top_level),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': self.summary(),
+            'calls': self.records,
+        }
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def print_summary(self):
+        print("\nSTAGE PROFILE")
+        print(f"{'stage':<28}{'calls':>6}{'wall s':>10}{'cpu s':>10}{'rows in':>12}{'rows out':>12}{'peak MB':>10}")
+        for stage in self.summary():
+            name = '  ' * stage['depth'] + stage['stage']
+            print(f"{name:<28}{stage['calls']:>6}{stage['wall_seconds']:>10.3f}{stage['cpu_seconds']:>10.3f}"
+                  f"{stage['rows_in']:>12}{stage['rows_out']:>12}{stage['peak_rss_mb']:>10.1f}")
+
+
+def profile_stage(method):
+    # Record a TrainDataCleaner stage in self.profiler (if any)
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = getattr(self, 'profiler', None)
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        with profiler.measure(method.__name__, self):
+            return method(self, *args, **kwargs)
+    return wrapper
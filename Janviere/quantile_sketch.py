@@ -0,0 +1,193 @@
+"""
+Mergeable streaming quantile sketch used by TrainDataCleaner for outlier bounds.
+
+relative_accuracy=None keeps an exact value -> frequency table (fine for integer
+columns such as trip_duration or passenger_count). A float such as 0.01 switches to
+log-spaced buckets (DDSketch style): every returned quantile is within 1% of the
+true value and memory is a few hundred buckets regardless of row count.
+An exact table that grows past MAX_EXACT_VALUES distinct values (a float column, say)
+turns into buckets at EXACT_FALLBACK_ACCURACY, so memory stays bounded in either mode.
+The tables are sorted key and count arrays, updated with np.unique and np.bincount.
+Sketches built on separate chunks or workers can be merged.
+"""
+
+import numpy as np
+
+MAX_EXACT_VALUES = 100_000
+EXACT_FALLBACK_ACCURACY = 1e-4
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=None, max_exact_values=MAX_EXACT_VALUES):
+        if relative_accuracy is not None and not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_exact_values = max_exact_values
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.zero_count = 0
+        # Sorted (keys, counts): bucket keys, or exact values while the sketch is exact
+        self.positive = _empty_store(np.float64 if relative_accuracy is None else np.int64)
+        self.negative = _empty_store(np.int64)   # bucket keys of -value (buckets only)
+        self._use_buckets(relative_accuracy)
+
+    @property
+    def exact(self):
+        return self.bucket_accuracy is None
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy=None):
+        return cls(relative_accuracy).update(values)
+
+    def update(self, values):
+        # Add a batch of values (array, Series or list); NaNs are ignored
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        if self.exact:
+            self.positive = _add_to_store(self.positive, *np.unique(values, return_counts=True))
+            self._check_exact_size()
+        else:
+            self._add_buckets(values, np.ones(len(values), dtype=np.int64))
+        return self
+
+    def merge(self, other):
+        # Fold another sketch (from another chunk/worker) into this one
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative_accuracy")
+        if self.exact and not other.exact:
+            self._to_buckets(other.bucket_accuracy)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.exact:
+            self.positive = _add_to_store(self.positive, *other.positive)
+            self._check_exact_size()
+        elif other.exact:
+            # An exact table that has not fallen back yet is bucketed like raw values
+            self._add_buckets(*other.positive)
+        else:
+            self.zero_count += other.zero_count
+            self.positive = _add_to_store(self.positive, *other.positive)
+            self.negative = _add_to_store(self.negative, *other.negative)
+        return self
+
+    def quantile(self, q):
+        # Quantile with pandas' 'linear' interpolation between neighbouring ranks
+        if self.count == 0:
+            return np.nan
+        if q <= 0:
+            return float(self.min)
+        if q >= 1:
+            return float(self.max)
+        values, counts = self._sorted_values_and_counts()
+        cumulative = np.cumsum(counts)
+        position = q * (self.count - 1)
+        lower = int(np.floor(position))
+        upper = int(np.ceil(position))
+        lower_value = values[np.searchsorted(cumulative, lower, side='right')]
+        upper_value = values[np.searchsorted(cumulative, upper, side='right')]
+        return float(lower_value + (upper_value - lower_value) * (position - lower))
+
+    def quantiles(self, qs):
+        return [self.quantile(q) for q in qs]
+
+    def count_outside(self, lower_bound, upper_bound):
+        # Number of values below lower_bound or above upper_bound (bucket-accurate when approximate)
+        if self.count == 0:
+            return 0
+        values, counts = self._sorted_values_and_counts()
+        return int(counts[(values < lower_bound) | (values > upper_bound)].sum())
+
+    def to_dict(self):
+        # Plain-JSON representation so sketches can be persisted between runs
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'bucket_accuracy': self.bucket_accuracy,
+            'count': self.count,
+            'min': None if self.count == 0 else float(self.min),
+            'max': None if self.count == 0 else float(self.max),
+            'zero_count': self.zero_count,
+            'positive': [[k, c] for k, c in zip(self.positive[0].tolist(), self.positive[1].tolist())],
+            'negative': [[k, c] for k, c in zip(self.negative[0].tolist(), self.negative[1].tolist())],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        # Sketches saved before the exact fallback existed have no bucket_accuracy
+        sketch._use_buckets(data.get('bucket_accuracy', data['relative_accuracy']))
+        sketch.count = data['count']
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        sketch.zero_count = data['zero_count']
+        for name in ('positive', 'negative'):
+            key_type = np.float64 if name == 'positive' and sketch.exact else np.int64
+            pairs = sorted((key_type(k), int(c)) for k, c in data[name])
+            setattr(sketch, name, (np.array([k for k, _ in pairs], dtype=key_type),
+                                   np.array([c for _, c in pairs], dtype=np.int64)))
+        return sketch
+
+    def _use_buckets(self, accuracy):
+        self.bucket_accuracy = accuracy
+        if accuracy is not None:
+            self.gamma = (1 + accuracy) / (1 - accuracy)
+            self.log_gamma = np.log(self.gamma)
+
+    def _check_exact_size(self):
+        if len(self.positive[0]) > self.max_exact_values:
+            self._to_buckets(EXACT_FALLBACK_ACCURACY)
+
+    def _to_buckets(self, accuracy):
+        # Re-file the exact table into log buckets (the same buckets its values would have got)
+        values, counts = self.positive
+        self.positive = _empty_store(np.int64)
+        self._use_buckets(accuracy)
+        self._add_buckets(values, counts)
+
+    def _add_buckets(self, values, counts):
+        # Add values, each counts times, to the zero count and bucket tables
+        self.zero_count += int(counts[values == 0].sum())
+        for name, picked in (('positive', values > 0), ('negative', values < 0)):
+            if picked.any():
+                keys = self._bucket_keys(np.abs(values[picked]))
+                setattr(self, name, _add_to_store(getattr(self, name), keys, counts[picked]))
+
+    def _bucket_keys(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64)
+
+    def _bucket_values(self, keys):
+        # Representative value of each bucket, within relative_accuracy of everything in it
+        return 2 * np.power(self.gamma, keys) / (self.gamma + 1)
+
+    def _sorted_values_and_counts(self):
+        if self.exact:
+            return self.positive
+
+        negative_keys, negative_counts = self.negative
+        positive_keys, positive_counts = self.positive
+        values = np.concatenate([-self._bucket_values(negative_keys), [0.0], self._bucket_values(positive_keys)])
+        counts = np.concatenate([negative_counts, [self.zero_count], positive_counts])
+        order = np.argsort(values)
+        # Exact extremes keep the outermost buckets honest
+        return np.clip(values[order], self.min, self.max), counts[order]
+
+
+def _empty_store(key_dtype):
+    return np.empty(0, dtype=key_dtype), np.empty(0, dtype=np.int64)
+
+
+def _add_to_store(store, keys, counts):
+    # Sorted (keys, counts) of store plus the given keys and counts
+    keys = np.concatenate([store[0], keys])
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return unique_keys, np.bincount(inverse, weights=np.concatenate([store[1], counts]),
+                                    minlength=len(unique_keys)).astype(np.int64)
@@ -0,0 +1,81 @@
+"""
+Memory-bounded LRU cache for trip-query results.
+
+Entries are the serialized responses (bytes), keyed by the normalized request, and
+tagged with the version of the cleaned data they were computed from (see
+table_writer.write_output_version). When the data version changes every entry is
+dropped, so a new save_cleaned_data run never serves stale results. When the total
+size passes max_bytes the least recently used entries are evicted.
+Safe to share between the server's worker threads.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_bytes=64 * 1024**2):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()   # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set_version(self, version):
+        # Drop everything computed from another version of the data
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.size_bytes = 0
+                self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key) if version == self.version else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size, version):
+        with self._lock:
+            if version != self.version or size > self.max_bytes:
+                return False
+            if key in self._entries:
+                self.size_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def clear(self):
+        self.set_version(None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,170 @@
+"""
+Pre-aggregated rollups of the cleaned trips for dashboard summaries and histograms.
+
+A RollupCube holds one cell per (pickup_date, pickup_hour, trip_duration_category,
+distance_category) combination (pickup_day_of_week and pickup_month follow from the
+date) with the trip count, duration/distance/speed/fare sums and min/max (fares only
+when the data has a fare_amount column), and
+per-cell counts for the 5-minute duration histogram bins. A few months of trips
+come down to tens of thousands of cells, so filtered summaries add up a handful
+of small rows instead of scanning millions of trips.
+
+Cells combine by addition (min/max for the extremes), so cubes built per chunk,
+per worker or per daily batch are merged with merge(), and an existing cube is
+updated with update(new_rows) when data is appended.
+
+cells_for(filters) answers the trip API filters (date, hour, max distance, max fare).
+A numeric filter is only exact when no cell straddles the cutoff, so when one
+does it returns None and the caller falls back to scanning the trips.
+"""
+
+import numpy as np
+import pandas as pd
+
+ROLLUP_FILE = 'trip_rollups.csv'
+KEY_COLUMNS = ['pickup_date', 'pickup_hour', 'trip_duration_category', 'distance_category']
+
+DURATION_BIN_SECONDS = 300
+DURATION_BIN_COUNT = 12            # 0-60 min in 5-minute bins, plus one overflow bin
+CUBE_FILTERS = ['date', 'hour', 'distance', 'fare']    # anything else (zone, areas) needs a scan
+HISTOGRAM_COLUMNS = [f'duration_bin_{i:02d}' for i in range(DURATION_BIN_COUNT + 1)]
+
+# measure column -> how cells combine
+MEASURES = {
+    'trip_count': 'sum',
+    'duration_sum': 'sum', 'duration_min': 'min', 'duration_max': 'max',
+    'distance_sum': 'sum', 'distance_min': 'min', 'distance_max': 'max',
+    'speed_sum': 'sum',
+    'fare_sum': 'sum', 'fare_min': 'min', 'fare_max': 'max',
+    **{col: 'sum' for col in HISTOGRAM_COLUMNS},
+}
+
+
+def duration_bins(duration_sec):
+    return np.minimum(duration_sec // DURATION_BIN_SECONDS, DURATION_BIN_COUNT).astype(np.int8)
+
+
+def duration_bin_labels():
+    step = DURATION_BIN_SECONDS // 60
+    labels = [f"{i * step}-{(i + 1) * step} min" for i in range(DURATION_BIN_COUNT)]
+    return labels + [f"{DURATION_BIN_COUNT * step}+ min"]
+
+
+class RollupCube:
+    def __init__(self, cells=None):
+        self.cells = cells if cells is not None else pd.DataFrame(columns=KEY_COLUMNS + list(MEASURES))
+
+    def __len__(self):
+        return len(self.cells)
+
+    @property
+    def trip_count(self):
+        return int(self.cells['trip_count'].sum())
+
+    @classmethod
+    def from_frame(cls, df):
+        # One groupby over the cleaned trips (needs the create_derived_features columns)
+        duration = df['trip_duration'].to_numpy(dtype=np.float64)
+        distance = df['trip_distance_km'].to_numpy(dtype=np.float64)
+        trips = pd.DataFrame({
+            'pickup_date': pd.to_datetime(df['pickup_datetime']).dt.normalize().to_numpy(),
+            'pickup_hour': df['pickup_hour'].to_numpy(),
+            'trip_duration_category': df['trip_duration_category'].astype('string').to_numpy(),
+            'distance_category': df['distance_category'].astype('string').to_numpy(),
+            'duration': duration,
+            'distance': distance,
+            'speed': df['trip_speed_kmh'].to_numpy(dtype=np.float64),
+            'duration_bin': duration_bins(duration),
+        })
+        fares = {}
+        if 'fare_amount' in df.columns:
+            trips['fare'] = df['fare_amount'].to_numpy(dtype=np.float64)
+            fares = dict(fare_sum=('fare', 'sum'), fare_min=('fare', 'min'), fare_max=('fare', 'max'))
+        groups = trips.groupby(KEY_COLUMNS, sort=True, dropna=False)
+        cells = groups.agg(
+            trip_count=('duration', 'size'),
+            duration_sum=('duration', 'sum'), duration_min=('duration', 'min'), duration_max=('duration', 'max'),
+            distance_sum=('distance', 'sum'), distance_min=('distance', 'min'), distance_max=('distance', 'max'),
+            speed_sum=('speed', 'sum'),
+            **fares,
+        )
+        histogram = (trips.groupby(KEY_COLUMNS + ['duration_bin'], sort=False, dropna=False).size()
+                     .unstack('duration_bin', fill_value=0)
+                     .reindex(columns=range(DURATION_BIN_COUNT + 1), fill_value=0))
+        histogram.columns = HISTOGRAM_COLUMNS
+        cells = cells.join(histogram).reset_index()
+        return cls(cells)
+
+    def merge(self, other):
+        if len(other.cells) == 0:
+            return self
+        if len(self.cells) == 0:
+            self.cells = other.cells.copy()
+            return self
+        combined = pd.concat([self.cells, other.cells], ignore_index=True)
+        # A cube without fares has no fare columns; merged with one that has them, the sum would read
+        # the missing fares as 0, so the fare columns are only kept when both cubes have them
+        measures = {col: how for col, how in MEASURES.items()
+                    if col in self.cells.columns and col in other.cells.columns}
+        self.cells = combined.groupby(KEY_COLUMNS, sort=True, dropna=False).agg(measures).reset_index()
+        return self
+
+    def update(self, df):
+        # Fold newly cleaned rows into the cube
+        return self.merge(RollupCube.from_frame(df))
+
+    def save(self, path):
+        cells = self.cells.copy()
+        cells['pickup_date'] = pd.to_datetime(cells['pickup_date']).dt.strftime('%Y-%m-%d')
+        cells.to_csv(path, index=False)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        cells = pd.read_csv(path, parse_dates=['pickup_date'], date_format='%Y-%m-%d',
+                            dtype={'trip_duration_category': 'string', 'distance_category': 'string'})
+        return cls(cells)
+
+    def cells_for(self, filters):
+        # Cells matching the trip API filters, or None if the cube can't answer them exactly
+        if any(value is not None for name, value in filters.items() if name not in CUBE_FILTERS):
+            return None
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+        if filters.get('date') is not None:
+            mask &= (cells['pickup_date'] == pd.Timestamp(filters['date'])).to_numpy()
+        if filters.get('hour') is not None:
+            mask &= (cells['pickup_hour'] == filters['hour']).to_numpy()
+        for name in ['distance', 'fare']:
+            cutoff = filters.get(name)
+            if cutoff is None:
+                continue
+            if f'{name}_min' not in cells.columns:
+                return None
+            # Exact only when every selected cell lies wholly on one side of the cutoff
+            lower = cells[f'{name}_min'].to_numpy()
+            upper = cells[f'{name}_max'].to_numpy()
+            if (mask & (lower <= cutoff) & (upper > cutoff)).any():
+                return None
+            mask &= upper <= cutoff
+        return cells[mask]
+
+    @staticmethod
+    def summarize(cells):
+        total = int(cells['trip_count'].sum())
+        if total == 0:
+            return {'total_trips': 0, 'avg_duration_sec': None, 'busiest_hour': None}
+        return {
+            'total_trips': total,
+            'avg_duration_sec': round(float(cells['duration_sum'].sum()) / total, 1),
+            'busiest_hour': int(RollupCube.hourly_counts(cells).argmax()),
+        }
+
+    @staticmethod
+    def hourly_counts(cells):
+        return np.bincount(cells['pickup_hour'].to_numpy(dtype=np.int64),
+                           weights=cells['trip_count'].to_numpy(dtype=np.float64), minlength=24).astype(np.int64)
+
+    @staticmethod
+    def duration_histogram(cells):
+        return cells[HISTOGRAM_COLUMNS].to_numpy(dtype=np.int64).sum(axis=0)
@@ -0,0 +1,90 @@
+"""
+Presorted permutation indexes for the trip API's sortable table.
+
+The dashboard sorts the trip table by duration, distance, fare (when the data has
+fares) or pickup time. The API keeps the trips in pickup order, so without an index
+each sorted page sorts (or partitions) every matching trip. build_sort_index runs once per cleaned output and
+stores, for each sortable column, the argsort permutation of the output's rows. Ties
+are broken by pickup time (the API's row order). NaN keys go last.
+The index is saved next to the output as <output root>.sort_index.npz and tagged with
+the output's row count and version id. A reader only uses an index whose version
+matches the data it loaded.
+
+The API turns each permutation into store positions when it loads the data. A sorted
+page then walks the permutation from the front (ascending) or the back (descending,
+so equal keys come newest first), checks the filters on the rows it passes, and stops
+once the page is full. The work
+is proportional to the page end divided by the fraction of trips matching the filters,
+not to the number of trips.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Cleaned-data columns the keys are computed from (fare_amount is optional)
+SORT_INDEX_SOURCE_COLUMNS = ['pickup_datetime', 'trip_duration', 'trip_distance_km', 'fare_amount']
+
+
+def sort_index_path_for(path):
+    # train_cleaned.csv / train_cleaned.parquet / train_cleaned/ -> train_cleaned.sort_index.npz
+    root, _ = os.path.splitext(path.rstrip(os.sep))
+    return root + '.sort_index.npz'
+
+
+def trip_sort_keys(df):
+    # Sort keys as the API stores them (same dtypes, so ties and order agree);
+    # fare_amount only when the data has it
+    keys = {
+        'pickup_ts': pd.to_datetime(df['pickup_datetime']).to_numpy('datetime64[s]').astype(np.int64),
+        'trip_duration': df['trip_duration'].to_numpy(dtype=np.float64),
+        'trip_distance_km': df['trip_distance_km'].to_numpy(dtype=np.float64),
+    }
+    if 'fare_amount' in df.columns:
+        keys['fare_amount'] = df['fare_amount'].to_numpy(dtype=np.float32)
+    return keys
+
+
+def build_sort_index(df, version=None):
+    # SortIndex over df's row order (the order the output was written in)
+    keys = trip_sort_keys(df)
+    pickup_order = np.argsort(keys['pickup_ts'], kind='stable')
+    permutations = {'pickup_ts': pickup_order}
+    for column, values in keys.items():
+        if column != 'pickup_ts':
+            # Stable sort of the keys in pickup order: equal keys stay in pickup order
+            permutations[column] = pickup_order[np.argsort(values[pickup_order], kind='stable')]
+    valid = {column: int(np.count_nonzero(~np.isnan(values))) if values.dtype.kind == 'f' else len(values)
+             for column, values in keys.items()}
+    return SortIndex(permutations, valid, len(df), version)
+
+
+class SortIndex:
+    def __init__(self, permutations, valid, rows, version=None):
+        # permutations: column -> output row numbers in ascending key order (NaN keys after the first
+        # valid[column] entries)
+        index_dtype = np.int32 if rows < np.iinfo(np.int32).max else np.int64
+        self.permutations = {column: np.asarray(rows_in_order, dtype=index_dtype)
+                             for column, rows_in_order in permutations.items()}
+        self.valid = dict(valid)
+        self.rows = rows
+        self.version = version
+
+    def __contains__(self, column):
+        return column in self.permutations
+
+    def save(self, path):
+        metadata = {'rows': self.rows, 'version': self.version, 'valid': self.valid}
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, metadata=np.array(json.dumps(metadata)), **self.permutations)
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            permutations = {name: data[name] for name in data.files if name != 'metadata'}
+        return cls(permutations, metadata['valid'], metadata['rows'], metadata['version'])
@@ -0,0 +1,146 @@
+"""
+Spatial grid index over trip pickup/dropoff coordinates.
+
+Coordinates are snapped to a geohash-like quadtree grid over the whole globe: at
+zoom z, latitude and longitude are each split into 2**z steps and the two step
+numbers are bit-interleaved (Z-order / Morton code), so
+- a cell at zoom z is the code at MAX_ZOOM shifted right by 2 * (MAX_ZOOM - z)
+- every cell covers one contiguous range of MAX_ZOOM codes
+MAX_ZOOM = 26 is about 0.3 m of latitude; zoom 16 is about 300 m, zoom 12 about 5 km.
+Codes are computed with vectorized bit operations (cell_codes), once at cleaning time
+(create_derived_features adds pickup_cell/dropoff_cell).
+
+SpatialGridIndex keeps the row numbers sorted by cell code. A bounding-box or radius
+query covers the area with a few dozen cells, turns them into code ranges, binary-searches
+those ranges and checks the exact coordinates only on the candidates. heatmap() returns
+per-cell trip counts at a zoom level (precomputed for HEATMAP_ZOOMS), so clients get
+densities instead of millions of raw points.
+"""
+
+import numpy as np
+
+MAX_ZOOM = 26
+HEATMAP_ZOOMS = [10, 12, 14, 16]
+EARTH_RADIUS_KM = 6371.0
+_QUERY_CELLS_PER_AXIS = 32
+
+
+def _spread_bits(values):
+    # Insert a zero bit above every bit of a (<= 32-bit) integer: abcd -> 0a0b0c0d
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    values = (values | (values << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    values = (values | (values << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    values = (values | (values << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    values = (values | (values << np.uint64(2))) & np.uint64(0x3333333333333333)
+    values = (values | (values << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return values
+
+
+def _compact_bits(values):
+    # Inverse of _spread_bits: keep every other bit
+    values = values.astype(np.uint64) & np.uint64(0x5555555555555555)
+    values = (values | (values >> np.uint64(1))) & np.uint64(0x3333333333333333)
+    values = (values | (values >> np.uint64(2))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    values = (values | (values >> np.uint64(4))) & np.uint64(0x00FF00FF00FF00FF)
+    values = (values | (values >> np.uint64(8))) & np.uint64(0x0000FFFF0000FFFF)
+    values = (values | (values >> np.uint64(16))) & np.uint64(0x00000000FFFFFFFF)
+    return values
+
+
+def _grid_steps(lat, lon, zoom):
+    # Latitude/longitude -> integer grid steps at a zoom level (clipped to the globe)
+    size = 1 << zoom
+    lat_steps = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / 180.0 * size)
+    lon_steps = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * size)
+    return (np.clip(lat_steps, 0, size - 1).astype(np.int64),
+            np.clip(lon_steps, 0, size - 1).astype(np.int64))
+
+
+def _interleave(lat_steps, lon_steps):
+    return ((_spread_bits(lat_steps) << np.uint64(1)) | _spread_bits(lon_steps)).astype(np.int64)
+
+
+def cell_codes(lat, lon, zoom=MAX_ZOOM):
+    # Vectorized coordinates -> int64 grid cell codes
+    return _interleave(*_grid_steps(lat, lon, zoom))
+
+
+def coarsen(codes, zoom, from_zoom=MAX_ZOOM):
+    return np.asarray(codes, dtype=np.int64) >> (2 * (from_zoom - zoom))
+
+
+def cell_centers(codes, zoom):
+    # Cell codes at a zoom level -> (center latitude, center longitude)
+    codes = np.asarray(codes, dtype=np.uint64)
+    size = 1 << zoom
+    lat_steps = _compact_bits(codes >> np.uint64(1)).astype(np.float64)
+    lon_steps = _compact_bits(codes).astype(np.float64)
+    return (lat_steps + 0.5) / size * 180.0 - 90.0, (lon_steps + 0.5) / size * 360.0 - 180.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class SpatialGridIndex:
+    def __init__(self, lat, lon, codes=None):
+        # codes: precomputed MAX_ZOOM cell codes (e.g. the pickup_cell column); computed if missing
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        codes = cell_codes(self.lat, self.lon) if codes is None else np.asarray(codes, dtype=np.int64)
+        self.cell_codes = codes
+        self.order = np.argsort(codes, kind='stable')
+        self.sorted_codes = codes[self.order]
+        self.levels = {zoom: self._count_cells(self.sorted_codes, zoom) for zoom in HEATMAP_ZOOMS}
+
+    def __len__(self):
+        return len(self.sorted_codes)
+
+    def query_bbox(self, lat_min, lon_min, lat_max, lon_max):
+        # Row numbers (ascending) of points inside the box
+        candidates = self._candidates(lat_min, lon_min, lat_max, lon_max)
+        lat = self.lat[candidates]
+        lon = self.lon[candidates]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(candidates[inside])
+
+    def query_radius(self, lat, lon, radius_km):
+        # Row numbers (ascending) of points within radius_km (great-circle) of (lat, lon)
+        lat_delta = np.degrees(radius_km / EARTH_RADIUS_KM)
+        lon_delta = lat_delta / max(np.cos(np.radians(min(abs(lat) + lat_delta, 89.9))), 1e-6)
+        candidates = self._candidates(lat - lat_delta, lon - lon_delta, lat + lat_delta, lon + lon_delta)
+        near = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates]) <= radius_km
+        return np.sort(candidates[near])
+
+    def heatmap(self, zoom, rows=None):
+        # (cell center lat, cell center lon, trip count) per non-empty cell at zoom
+        if rows is None and zoom in self.levels:
+            cells, counts = self.levels[zoom]
+        else:
+            codes = self.sorted_codes if rows is None else self.cell_codes[rows]
+            cells, counts = self._count_cells(np.sort(codes), zoom)
+        lat, lon = cell_centers(cells, zoom)
+        return lat, lon, counts
+
+    def _candidates(self, lat_min, lon_min, lat_max, lon_max):
+        # Rows in the grid cells covering the box, at a zoom that needs at most ~32 cells per axis
+        span = max(lat_max - lat_min, (lon_max - lon_min) / 2, 1e-9)
+        zoom = int(np.clip(np.floor(np.log2(_QUERY_CELLS_PER_AXIS * 180.0 / span)), 0, MAX_ZOOM))
+        (lat_lo, lat_hi), (lon_lo, lon_hi) = _grid_steps([lat_min, lat_max], [lon_min, lon_max], zoom)
+        lat_steps, lon_steps = np.meshgrid(np.arange(lat_lo, lat_hi + 1), np.arange(lon_lo, lon_hi + 1))
+        cells = np.unique(_interleave(lat_steps.ravel(), lon_steps.ravel()))
+
+        shift = 2 * (MAX_ZOOM - zoom)
+        starts = np.searchsorted(self.sorted_codes, cells << shift, side='left')
+        ends = np.searchsorted(self.sorted_codes, (cells + 1) << shift, side='left')
+        lengths = ends - starts
+        # Concatenate the position ranges without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = offsets + np.arange(lengths.sum())
+        return self.order[positions]
+
+    @staticmethod
+    def _count_cells(sorted_codes, zoom):
+        return np.unique(coarsen(sorted_codes, zoom), return_counts=True)
@@ -0,0 +1,156 @@
+"""
+Single-pass, mergeable summary statistics for the cleaned trips.
+
+A SummaryStats accumulates, per column:
+- numeric columns: count, mean and variance (Welford's update, applied a chunk at a
+  time with Chan et al.'s pairwise combination), exact min/max and a QuantileSketch
+  for the quartiles (exact for integer columns, whose distinct values are few; past
+  MAX_EXACT_VALUES of them the sketch falls back to buckets, see quantile_sketch)
+- categorical columns: value frequencies
+- datetime columns: min/max
+update(df) folds one chunk in with a few vectorized reductions per column, so the
+summary of a streamed or partitioned run comes from the cleaning pass itself. Memory
+is bounded by the sketch buckets and the number of categories, not by row count.
+Summaries built on separate chunks or workers are combined with merge().
+
+describe() and frequencies() give the same layout as DataFrame.describe() and
+Series.value_counts(). Quartiles of float columns are within SUMMARY_QUANTILE_ACCURACY
+of the exact ones; everything else matches up to floating-point rounding.
+"""
+
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import QuantileSketch
+
+SUMMARY_QUANTILE_ACCURACY = 1e-4
+DESCRIBE_PERCENTILES = (0.25, 0.5, 0.75)
+
+
+class ColumnStats:
+    def __init__(self, quantile_accuracy=SUMMARY_QUANTILE_ACCURACY):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0          # sum of squared deviations from the mean
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(quantile_accuracy)
+
+    def update(self, values):
+        # Add a batch of values (array or Series); NaNs are ignored
+        if self.count == 0 and pd.api.types.is_integer_dtype(getattr(values, 'dtype', None)):
+            self.sketch = QuantileSketch(None)
+        if isinstance(values, pd.Series):
+            values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        batch = ColumnStats(self.sketch.relative_accuracy)
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(np.square(values - batch.mean).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        batch.sketch.update(values)
+        return self.merge(batch)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            # Take the other side's sketch mode (exact for integer columns)
+            self.sketch = QuantileSketch(other.sketch.relative_accuracy)
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self):
+        # Sample variance (ddof=1, as pandas)
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
+
+    def describe(self, percentiles=DESCRIBE_PERCENTILES):
+        if self.count == 0:
+            values = [0.0] + [np.nan] * (len(percentiles) + 4)
+        else:
+            values = [float(self.count), self.mean, self.std, self.min]
+            values += self.sketch.quantiles(percentiles) + [self.max]
+        labels = ['count', 'mean', 'std', 'min'] + [f"{p:.0%}" for p in percentiles] + ['max']
+        return pd.Series(values, index=labels)
+
+
+class SummaryStats:
+    def __init__(self, numeric_columns=(), category_columns=(), datetime_columns=(),
+                 quantile_accuracy=SUMMARY_QUANTILE_ACCURACY):
+        self.numeric = {col: ColumnStats(quantile_accuracy) for col in numeric_columns}
+        self.categories = {col: {} for col in category_columns}     # column -> value -> count
+        self.datetimes = {col: [None, None] for col in datetime_columns}  # column -> [min, max]
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def update(self, df):
+        # Fold one chunk in; columns missing from the chunk are skipped
+        self.rows += len(df)
+        for col, stats in self.numeric.items():
+            if col in df.columns:
+                stats.update(df[col])
+        for col, counts in self.categories.items():
+            if col in df.columns:
+                self._add_counts(counts, df[col].value_counts().items())
+        for col, extremes in self.datetimes.items():
+            if col in df.columns and df[col].notna().any():
+                self._extend(extremes, df[col].min(), df[col].max())
+        return self
+
+    def merge(self, other):
+        # Fold in a summary of other rows (another chunk or worker) with the same columns
+        self.rows += other.rows
+        for col, stats in other.numeric.items():
+            self.numeric.setdefault(col, ColumnStats(stats.sketch.relative_accuracy)).merge(stats)
+        for col, counts in other.categories.items():
+            self._add_counts(self.categories.setdefault(col, {}), counts.items())
+        for col, (low, high) in other.datetimes.items():
+            if low is not None:
+                self._extend(self.datetimes.setdefault(col, [None, None]), low, high)
+        return self
+
+    def column(self, col):
+        return self.numeric[col]
+
+    def describe(self, columns=None):
+        # DataFrame.describe() layout for the numeric columns
+        columns = columns if columns is not None else list(self.numeric)
+        return pd.DataFrame({col: self.numeric[col].describe() for col in columns})
+
+    def frequencies(self, col):
+        # Series.value_counts() layout: counts in descending order
+        counts = self.categories[col]
+        frequencies = pd.Series(list(counts.values()), index=pd.Index(list(counts.keys()), name=col),
+                                name='count', dtype=np.int64)
+        return frequencies.sort_values(ascending=False, kind='stable')
+
+    def datetime_range(self, col):
+        return tuple(self.datetimes[col])
+
+    @staticmethod
+    def _add_counts(counts, items):
+        for value, count in items:
+            counts[value] = counts.get(value, 0) + int(count)
+
+    @staticmethod
+    def _extend(extremes, low, high):
+        extremes[0] = low if extremes[0] is None else min(extremes[0], low)
+        extremes[1] = high if extremes[1] is None else max(extremes[1], high)
@@ -0,0 +1,252 @@
+"""
+Seeded synthetic NYC taxi trips in the train.csv schema, for scale and load testing.
+
+Usage:
+    python synthetic_trips.py --rows 1000000 --output train.csv
+    python synthetic_trips.py --rows 100000000 --output trips --format parquet --seed 7 --outlier-rate 0.01
+
+Trips are generated chunk by chunk (chunk_rows at a time) and appended to the output
+with TableWriter, so memory stays at one chunk whatever the row count. The output
+depends only on the seed, row count and chunk_rows.
+
+What the rows look like:
+- pickups come from a mixture of NYC hotspots (Midtown, the Upper East/West Side,
+  downtown, Brooklyn, Queens, JFK, LaGuardia); pickup hours follow a daily demand curve
+- dropoffs are either another hotspot or a short hop from the pickup
+- trip_duration follows the distance at an hour-dependent city speed, with noise, and
+  dropoff_datetime is pickup_datetime + trip_duration
+- id, vendor_id, passenger_count and store_and_fwd_flag follow the 2016 data's mix
+
+Dirty data is injected at controllable per-row rates:
+- missing_rate: one of MISSING_COLUMNS left empty
+- duplicate_rate: the row is an exact copy of another row in its chunk
+- out_of_box_rate: pickup or dropoff outside NYC_BOUNDING_BOX (often 0, 0 as in the real data)
+- outlier_rate: trip_duration of a few seconds or of many hours/days
+Row counts include the duplicates, so a file has exactly n_rows rows.
+
+CSV matches train.csv exactly. Parquet, Feather and columnar stores keep the same
+columns with datetime64 timestamps. The columnar store has no null markers, so there
+vendor_id and passenger_count are float64 with NaN for missing values.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from table_writer import OUTPUT_FORMATS, TableWriter
+
+TRIP_COLUMNS = ['id', 'vendor_id', 'pickup_datetime', 'dropoff_datetime', 'passenger_count',
+                'pickup_longitude', 'pickup_latitude', 'dropoff_longitude', 'dropoff_latitude',
+                'store_and_fwd_flag', 'trip_duration']
+MISSING_COLUMNS = ['vendor_id', 'passenger_count', 'pickup_longitude', 'pickup_latitude',
+                   'dropoff_longitude', 'dropoff_latitude', 'store_and_fwd_flag']
+
+DEFAULT_MISSING_RATE = 0.001
+DEFAULT_DUPLICATE_RATE = 0.005
+DEFAULT_OUT_OF_BOX_RATE = 0.001
+DEFAULT_OUTLIER_RATE = 0.002
+DEFAULT_CHUNK_ROWS = 1_000_000
+DEFAULT_START = '2016-01-01'
+DEFAULT_DAYS = 182
+
+# (latitude, longitude, latitude sd, longitude sd, share of pickups)
+HOTSPOTS = np.array([
+    (40.7550, -73.9840, 0.0120, 0.0100, 0.33),    # Midtown
+    (40.7730, -73.9570, 0.0100, 0.0080, 0.15),    # Upper East Side
+    (40.7850, -73.9750, 0.0100, 0.0080, 0.10),    # Upper West Side
+    (40.7200, -74.0000, 0.0120, 0.0090, 0.17),    # Downtown / FiDi
+    (40.8100, -73.9500, 0.0120, 0.0100, 0.05),    # Harlem
+    (40.6900, -73.9600, 0.0200, 0.0200, 0.08),    # Brooklyn
+    (40.7450, -73.9200, 0.0150, 0.0150, 0.05),    # Queens / Long Island City
+    (40.6450, -73.7850, 0.0040, 0.0040, 0.035),   # JFK
+    (40.7740, -73.8720, 0.0030, 0.0030, 0.035),   # LaGuardia
+])
+# Relative pickups per hour of day (2016 yellow-cab shape: night dip, evening peak)
+HOURLY_DEMAND = np.array([3.6, 2.7, 2.0, 1.5, 1.1, 1.0, 2.2, 3.8, 4.6, 4.6, 4.4, 4.5,
+                          4.8, 4.8, 5.0, 4.9, 4.4, 5.0, 6.0, 6.2, 5.8, 5.6, 5.3, 4.6])
+# Average door-to-door speed (km/h) per hour of day
+HOURLY_SPEED_KMH = np.array([24, 26, 27, 28, 30, 29, 24, 18, 15, 15, 16, 16,
+                             16, 16, 15, 15, 15, 15, 16, 18, 20, 21, 22, 23], dtype=np.float64)
+PASSENGER_COUNTS = np.arange(7)
+PASSENGER_SHARES = [0.002, 0.708, 0.144, 0.041, 0.019, 0.053, 0.033]
+LOCAL_TRIP_SHARE = 0.65        # dropoffs near the pickup rather than at another hotspot
+ROAD_FACTOR = 1.3               # road distance / straight-line distance
+EARTH_RADIUS_KM = 6371.0
+
+
+def synthetic_trip_chunks(n_rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS, missing_rate=DEFAULT_MISSING_RATE,
+                          duplicate_rate=DEFAULT_DUPLICATE_RATE, out_of_box_rate=DEFAULT_OUT_OF_BOX_RATE,
+                          outlier_rate=DEFAULT_OUTLIER_RATE, start=DEFAULT_START, days=DEFAULT_DAYS):
+    # Yields DataFrames of at most chunk_rows trips, n_rows in total
+    for name, rate in [('missing_rate', missing_rate), ('duplicate_rate', duplicate_rate),
+                       ('out_of_box_rate', out_of_box_rate), ('outlier_rate', outlier_rate)]:
+        if not 0 <= rate <= 1:
+            raise ValueError(f"{name} must be between 0 and 1")
+    # One independent stream per chunk, so a chunk doesn't depend on how the previous ones used theirs
+    chunk_seeds = np.random.SeedSequence(seed)
+    start_seconds = np.datetime64(start, 's').astype(np.int64)
+    first_row = 0
+    while first_row < n_rows:
+        rng = np.random.default_rng(chunk_seeds.spawn(1)[0])
+        n = min(chunk_rows, n_rows - first_row)
+        chunk = _clean_trips(rng, first_row, n, start_seconds, days)
+        _inject_outliers(rng, chunk, outlier_rate)
+        _inject_out_of_box(rng, chunk, out_of_box_rate)
+        _inject_missing(rng, chunk, missing_rate)
+        chunk = _inject_duplicates(rng, chunk, duplicate_rate)
+        yield _trip_frame(chunk)
+        first_row += n
+
+
+def write_synthetic_trips(path, n_rows, seed=0, output_format='csv', chunk_rows=DEFAULT_CHUNK_ROWS, **options):
+    # Stream n_rows synthetic trips to path in output_format; options as in synthetic_trip_chunks.
+    # Returns the path written (extension adjusted to the format).
+    writer = TableWriter(output_format)
+    written_path = path
+    for chunk in synthetic_trip_chunks(n_rows, seed=seed, chunk_rows=chunk_rows, **options):
+        if output_format == 'csv':
+            chunk = _csv_frame(chunk)
+        elif output_format == 'columnar':
+            chunk = chunk.astype({'vendor_id': np.float64, 'passenger_count': np.float64})
+        written_path = writer.write(chunk, path, append=True)
+    writer.close()
+    return written_path
+
+
+def _clean_trips(rng, first_row, n, start_seconds, days):
+    # Column arrays for n valid trips
+    hour = rng.choice(24, n, p=HOURLY_DEMAND / HOURLY_DEMAND.sum())
+    pickup = (start_seconds + rng.integers(0, days, n) * 86400 + hour * 3600 + rng.integers(0, 3600, n))
+
+    pickup_lat, pickup_lon = _hotspot_points(rng, n)
+    dropoff_lat, dropoff_lon = _hotspot_points(rng, n)
+    # Local trips: a lognormal hop (median ~1.5 km) in a random direction
+    local = rng.random(n) < LOCAL_TRIP_SHARE
+    hop_km = rng.lognormal(0.4, 0.6, n)
+    bearing = rng.uniform(0, 2 * np.pi, n)
+    hop_lat = pickup_lat + np.degrees(hop_km * np.cos(bearing) / EARTH_RADIUS_KM)
+    hop_lon = pickup_lon + np.degrees(hop_km * np.sin(bearing) / EARTH_RADIUS_KM) / np.cos(np.radians(pickup_lat))
+    dropoff_lat = np.where(local, hop_lat, dropoff_lat)
+    dropoff_lon = np.where(local, hop_lon, dropoff_lon)
+
+    distance_km = _haversine_km(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+    travel_seconds = distance_km * ROAD_FACTOR / HOURLY_SPEED_KMH[hour] * 3600
+    duration = np.rint(60 + travel_seconds * rng.lognormal(0, 0.3, n) + rng.exponential(90, n)).astype(np.int64)
+
+    return {
+        'row': np.arange(first_row, first_row + n),
+        'vendor_id': rng.choice([1, 2], n, p=[0.465, 0.535]).astype(np.float64),
+        'pickup': pickup,
+        'passenger_count': rng.choice(PASSENGER_COUNTS, n, p=PASSENGER_SHARES).astype(np.float64),
+        'pickup_longitude': pickup_lon, 'pickup_latitude': pickup_lat,
+        'dropoff_longitude': dropoff_lon, 'dropoff_latitude': dropoff_lat,
+        'store_and_fwd_flag': np.where(rng.random(n) < 0.0055, 'Y', 'N').astype(object),
+        'trip_duration': duration,
+    }
+
+
+def _hotspot_points(rng, n):
+    spots = HOTSPOTS[rng.choice(len(HOTSPOTS), n, p=HOTSPOTS[:, 4] / HOTSPOTS[:, 4].sum())]
+    return rng.normal(spots[:, 0], spots[:, 2]), rng.normal(spots[:, 1], spots[:, 3])
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _inject_outliers(rng, chunk, rate):
+    # Meter left running (hours to days) or cancelled at once (seconds); timestamps stay consistent
+    rows = np.flatnonzero(rng.random(len(chunk['row'])) < rate)
+    long_trip = rng.random(len(rows)) < 0.6
+    chunk['trip_duration'][rows] = np.where(long_trip, rng.integers(4 * 3600, 10 * 86400, len(rows)),
+                                            rng.integers(1, 30, len(rows)))
+
+
+def _inject_out_of_box(rng, chunk, rate):
+    rows = np.flatnonzero(rng.random(len(chunk['row'])) < rate)
+    side = np.where(rng.random(len(rows)) < 0.5, 'pickup', 'dropoff')
+    zero = rng.random(len(rows)) < 0.5
+    # GPS dropouts at (0, 0), otherwise somewhere else on the east coast
+    lat = np.where(zero, 0.0, rng.uniform(38.0, 43.0, len(rows)))
+    lon = np.where(zero, 0.0, rng.uniform(-78.0, -75.0, len(rows)))
+    for name in ['pickup', 'dropoff']:
+        picked = side == name
+        chunk[f'{name}_latitude'][rows[picked]] = lat[picked]
+        chunk[f'{name}_longitude'][rows[picked]] = lon[picked]
+
+
+def _inject_missing(rng, chunk, rate):
+    rows = np.flatnonzero(rng.random(len(chunk['row'])) < rate)
+    columns = rng.integers(0, len(MISSING_COLUMNS), len(rows))
+    for i, column in enumerate(MISSING_COLUMNS):
+        chunk[column][rows[columns == i]] = None if column == 'store_and_fwd_flag' else np.nan
+
+
+def _inject_duplicates(rng, chunk, rate):
+    # Overwrite rows with copies of other rows of the chunk (keeps the row count)
+    n = len(chunk['row'])
+    targets = np.flatnonzero(rng.random(n) < rate)
+    if len(targets) == 0:
+        return chunk
+    sources = rng.integers(0, n, len(targets))
+    for values in chunk.values():
+        values[targets] = values[sources]
+    return chunk
+
+
+def _trip_frame(chunk):
+    pickup = chunk['pickup'].astype('datetime64[s]')
+    return pd.DataFrame({
+        'id': [f'id{row:07d}' for row in chunk['row'].tolist()],
+        'vendor_id': pd.array(chunk['vendor_id'], dtype='Int8'),
+        'pickup_datetime': pickup,
+        'dropoff_datetime': pickup + chunk['trip_duration'].astype('timedelta64[s]'),
+        'passenger_count': pd.array(chunk['passenger_count'], dtype='Int8'),
+        'pickup_longitude': chunk['pickup_longitude'],
+        'pickup_latitude': chunk['pickup_latitude'],
+        'dropoff_longitude': chunk['dropoff_longitude'],
+        'dropoff_latitude': chunk['dropoff_latitude'],
+        'store_and_fwd_flag': chunk['store_and_fwd_flag'],
+        'trip_duration': chunk['trip_duration'],
+    }, columns=TRIP_COLUMNS)
+
+
+def _csv_frame(chunk):
+    # Timestamps as the 'YYYY-MM-DD HH:MM:SS' strings of train.csv (vectorized, no strftime per row)
+    chunk = chunk.copy()
+    for col in ['pickup_datetime', 'dropoff_datetime']:
+        chunk[col] = np.char.replace(np.datetime_as_string(chunk[col].to_numpy('datetime64[s]')), 'T', ' ')
+    return chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write seeded synthetic NYC trips in the train.csv schema")
+    parser.add_argument('--rows', type=int, required=True, help="number of rows to write (duplicates included)")
+    parser.add_argument('--output', default='train.csv', help="output path (extension follows --format)")
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--missing-rate', type=float, default=DEFAULT_MISSING_RATE)
+    parser.add_argument('--duplicate-rate', type=float, default=DEFAULT_DUPLICATE_RATE)
+    parser.add_argument('--out-of-box-rate', type=float, default=DEFAULT_OUT_OF_BOX_RATE)
+    parser.add_argument('--outlier-rate', type=float, default=DEFAULT_OUTLIER_RATE)
+    parser.add_argument('--start', default=DEFAULT_START, help="first pickup date (YYYY-MM-DD)")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="number of days of pickups")
+    args = parser.parse_args()
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    path = write_synthetic_trips(args.output, args.rows, seed=args.seed, output_format=args.format,
+                                 chunk_rows=args.chunk_rows, missing_rate=args.missing_rate,
+                                 duplicate_rate=args.duplicate_rate, out_of_box_rate=args.out_of_box_rate,
+                                 outlier_rate=args.outlier_rate, start=args.start, days=args.days)
+    print(f"Wrote {args.rows} synthetic trips to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Output writer for the cleaned dataset and transparency logs.
+
+Supports CSV (default), Parquet and Arrow IPC/Feather. Columnar formats keep the
+categorical and datetime dtypes set up by normalize_data, so consumers don't re-parse.
+Parquet can be written as a Hive-style partitioned dataset
+(e.g. pickup_month=3/pickup_day_of_week=Friday/part-0.parquet) so a reader can load
+one month without scanning everything. append=True appends rows (CSV) or row groups /
+record batches (columnar) to a file this writer has already started. The first
+append=True write to a path starts it fresh, unless the writer was created with
+resume=True, in which case existing CSV files and partitioned datasets on disk are
+extended (incremental cleaning across runs).
+'columnar' writes a memory-mappable store directory (see columnar_store).
+pyarrow is only needed for parquet and feather.
+Every finished output also gets a <output root>.version.json marker with a fresh version
+id, so long-running readers (the trip query API) can tell when the data changed.
+"""
+
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather', 'columnar': '.cols'}
+
+
+def output_path_for(path, output_format, partitioned=False):
+    # Swap the extension to match the format; partitioned datasets are directories
+    root, _ = os.path.splitext(path)
+    return root if partitioned else root + OUTPUT_FORMATS[output_format]
+
+
+def version_path_for(path):
+    # train_cleaned.csv / train_cleaned.parquet / train_cleaned/ -> train_cleaned.version.json
+    root, _ = os.path.splitext(path.rstrip(os.sep))
+    return root + '.version.json'
+
+
+def write_output_version(path, rows):
+    # Record a new version of a finished output (atomically, so readers never see half a file)
+    info = {
+        'version': uuid.uuid4().hex,
+        'path': os.path.abspath(path),
+        'rows': int(rows),
+        'written_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    version_path = version_path_for(path)
+    temp_path = version_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(info, f, indent=2)
+    os.replace(temp_path, version_path)
+    return info
+
+
+def read_output_version(path):
+    try:
+        with open(version_path_for(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class TableWriter:
+    def __init__(self, output_format='csv', compression=None, row_group_size=None, partition_cols=None,
+                 resume=False):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {list(OUTPUT_FORMATS)}")
+        if partition_cols and output_format != 'parquet':
+            raise ValueError("partition_cols is only supported for parquet output")
+        self.output_format = output_format
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.partition_cols = list(partition_cols) if partition_cols else None
+        self.resume = resume
+        self._open_writers = {}   # path -> (writer, schema) for appends within this writer
+        self._started_paths = set()
+
+    def write(self, df, path, append=False):
+        # Write df to path (extension adjusted to the format); returns the path written
+        partitioned = self.partition_cols is not None and all(col in df.columns for col in self.partition_cols)
+        path = output_path_for(path, self.output_format, partitioned)
+        continuing = append and (path in self._started_paths or (self.resume and os.path.exists(path)))
+        self._started_paths.add(path)
+
+        if self.output_format == 'csv':
+            if continuing:
+                df.to_csv(path, mode='a', header=False, index=False)
+            else:
+                df.to_csv(path, index=False)
+            return path
+
+        if self.output_format == 'columnar':
+            from columnar_store import ColumnarStoreWriter
+            writer, _ = self._open_writers.get(path, (None, None)) if continuing else (None, None)
+            if writer is None:
+                self._close_writer(path)
+                writer = ColumnarStoreWriter(path, resume=continuing)
+                self._open_writers[path] = (writer, None)
+            writer.append(df)
+            if not append:
+                self._close_writer(path)
+            return path
+
+        import pyarrow as pa
+
+        if partitioned:
+            import pyarrow.parquet as pq
+            if not continuing and os.path.isdir(path):
+                shutil.rmtree(path)
+            options = {}
+            if self.compression is not None:
+                options['compression'] = self.compression
+            if self.row_group_size is not None:
+                options['max_rows_per_group'] = self.row_group_size
+                options['min_rows_per_group'] = min(self.row_group_size, 1024 * 1024)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_to_dataset(table, path, partition_cols=self.partition_cols,
+                                basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+                                existing_data_behavior='overwrite_or_ignore', **options)
+            return path
+
+        # Single-file parquet/feather can't be reopened for appending, so resume starts a new file here
+        writer, schema = self._open_writers.get(path, (None, None)) if continuing else (None, None)
+        if writer is not None and len(df) == 0:
+            return path
+        if writer is None:
+            self._close_writer(path)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            writer = self._new_writer(path, table.schema)
+            self._open_writers[path] = (writer, table.schema)
+        else:
+            # Later chunks may infer slightly different dtypes (e.g. int vs float); use the file schema
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+        if self.output_format == 'parquet':
+            writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            writer.write_table(table, max_chunksize=self.row_group_size)
+        if not append:
+            self._close_writer(path)
+        return path
+
+    def close(self):
+        for path in list(self._open_writers):
+            self._close_writer(path)
+
+    def _new_writer(self, path, schema):
+        if self.output_format == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(path, schema, compression=self.compression or 'snappy')
+
+        import pyarrow as pa
+        options = pa.ipc.IpcWriteOptions(compression=self.compression or 'lz4')
+        return pa.ipc.new_file(path, schema, options=options)
+
+    def _close_writer(self, path):
+        writer, _ = self._open_writers.pop(path, (None, None))
+        if writer is not None:
+            writer.close()
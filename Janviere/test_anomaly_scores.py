@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from anomaly_scores import (ANOMALY_FEATURES, ANOMALY_MIN_GROUP_TRIPS, ANOMALY_REASONS, LOG_BUCKET_WIDTH,
+                            MAD_TO_Z, AnomalyStats, log_values)
+
+N_GROUPS = 12
+
+
+def trip_features(n=30000, seed=0):
+    rng = np.random.default_rng(seed)
+    groups = rng.integers(0, N_GROUPS, n)
+    distance = rng.lognormal(0.5 + 0.1 * groups, 0.5)
+    speed = rng.lognormal(2.8, 0.3, n)
+    values = {'trip_distance_km': distance, 'trip_speed_kmh': speed, 'trip_duration': distance / speed * 3600}
+    values['trip_distance_km'][rng.choice(n, 50, replace=False)] = np.nan
+    return groups, values
+
+
+def test_merged_chunks_give_the_single_pass_baseline():
+    groups, values = trip_features()
+    single = AnomalyStats(N_GROUPS).update(groups, values)
+    merged = AnomalyStats(N_GROUPS)
+    for rows in np.array_split(np.arange(len(groups)), 9):
+        merged.merge(AnomalyStats(N_GROUPS).update(groups[rows], {k: v[rows] for k, v in values.items()}))
+    for feature in ANOMALY_FEATURES:
+        np.testing.assert_array_equal(merged.counts[feature], single.counts[feature])
+    expected, baseline = single.baseline(), merged.baseline()
+    np.testing.assert_array_equal(baseline.medians, expected.medians)
+    np.testing.assert_array_equal(baseline.scales, expected.scales)
+
+
+def test_baseline_is_within_a_bucket_of_the_exact_statistics():
+    groups, values = trip_features()
+    baseline = AnomalyStats(N_GROUPS).update(groups, values).baseline()
+    for i, feature in enumerate(ANOMALY_FEATURES):
+        logs = log_values(values[feature])
+        for group in range(N_GROUPS):
+            group_logs = logs[(groups == group) & ~np.isnan(logs)]
+            median = np.median(group_logs)
+            mad = np.median(np.abs(group_logs - median))
+            assert abs(baseline.medians[i, group] - median) <= LOG_BUCKET_WIDTH
+            assert abs(baseline.scales[i, group] * MAD_TO_Z - mad) <= 2 * LOG_BUCKET_WIDTH
+
+
+def test_outliers_are_flagged_with_their_reason():
+    groups, values = trip_features()
+    baseline = AnomalyStats(N_GROUPS).update(groups, values).baseline()
+    # Ten times the usual duration and a tenth of the usual speed for the same distance
+    slow = {'trip_distance_km': np.array([2.0]), 'trip_speed_kmh': np.array([1.6]),
+            'trip_duration': np.array([2.0 / 1.6 * 3600])}
+    score, reason, flagged = baseline.score(np.array([3]), slow)
+    assert flagged[0] and ANOMALY_REASONS[reason[0]] in ('long_duration', 'low_speed')
+    typical = {feature: np.array([np.nanmedian(values[feature][groups == 3])]) for feature in ANOMALY_FEATURES}
+    score, reason, flagged = baseline.score(np.array([3]), typical)
+    assert not flagged[0] and reason[0] == -1 and score[0] < 1
+
+
+def test_small_and_unknown_groups_are_not_scored():
+    groups, values = trip_features(n=ANOMALY_MIN_GROUP_TRIPS * N_GROUPS // 2)
+    stats = AnomalyStats(N_GROUPS + 1).update(groups, values)
+    score, reason, flagged = stats.baseline().score(np.array([N_GROUPS, -1, N_GROUPS + 5]),
+                                                    {feature: np.ones(3) for feature in ANOMALY_FEATURES})
+    assert np.isnan(score).all() and (reason == -1).all() and not flagged.any()
+    with pytest.raises(ValueError):
+        stats.merge(AnomalyStats(N_GROUPS))
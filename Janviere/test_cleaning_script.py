@@ -0,0 +1,190 @@
+import contextlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning_script import NYC_BOUNDING_BOX, TRANSPARENCY_LOG_FILES, TrainDataCleaner
+from synthetic_trips import write_synthetic_trips
+
+# Columns that depend on the capping bounds or the anomaly baseline, which an incremental batch
+# takes from the data seen so far rather than from the whole file
+BATCH_DEPENDENT_COLUMNS = ['trip_duration', 'trip_duration_hours', 'trip_speed_kmh', 'trip_efficiency',
+                           'speed_category', 'anomaly_score', 'anomaly_reason']
+
+
+@pytest.fixture
+def cleaner():
+    return TrainDataCleaner('unused.csv')
+
+
+def scalar_distances(cleaner, lat1, lon1, lat2, lon2):
+    return np.array([cleaner.calculate_distance(*point) for point in zip(lat1, lon1, lat2, lon2)])
+
+
+def random_points(n, low_lat, high_lat, low_lon, high_lon, seed):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(low_lat, high_lat, n), rng.uniform(low_lon, high_lon, n),
+            rng.uniform(low_lat, high_lat, n), rng.uniform(low_lon, high_lon, n))
+
+
+def nyc_edge_points():
+    # Every pair of bounding-box corners, plus identical points (zero distance)
+    box = NYC_BOUNDING_BOX
+    corners = [(box['lat_min'], box['lon_min']), (box['lat_min'], box['lon_max']),
+               (box['lat_max'], box['lon_min']), (box['lat_max'], box['lon_max']), (40.75, -73.98)]
+    pairs = [(a, b) for a in corners for b in corners]
+    return tuple(np.array([pair[i][j] for pair in pairs]) for i in (0, 1) for j in (0, 1))
+
+
+def test_vectorized_distance_matches_scalar_float64(cleaner):
+    for lat1, lon1, lat2, lon2 in [random_points(2000, -89, 89, -180, 180, seed=1),
+                                   random_points(2000, 40.4, 41.0, -74.3, -73.7, seed=2),
+                                   nyc_edge_points()]:
+        expected = scalar_distances(cleaner, lat1, lon1, lat2, lon2)
+        np.testing.assert_allclose(cleaner.calculate_distance_vectorized(lat1, lon1, lat2, lon2),
+                                   expected, rtol=0, atol=1e-9)
+
+
+def test_vectorized_distance_edge_cases_float64(cleaner):
+    lat1 = np.array([40.75, 0.0, 45.0, 90.0])
+    lon1 = np.array([-73.98, 0.0, 10.0, 0.0])
+    lat2 = np.array([40.75, 0.0, -45.0, -90.0])
+    lon2 = np.array([-73.98, 180.0, -170.0, 0.0])
+    distances = cleaner.calculate_distance_vectorized(lat1, lon1, lat2, lon2)
+    half_circumference = np.pi * 6371
+    # Zero distance, then three antipodal pairs (where a rounds to ~1 and needs the clip)
+    np.testing.assert_allclose(distances, [0.0] + [half_circumference] * 3, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(distances[:1], scalar_distances(cleaner, lat1[:1], lon1[:1], lat2[:1], lon2[:1]),
+                               atol=1e-9)
+
+
+def test_vectorized_distance_matches_scalar_float32(cleaner):
+    # float32 is meant for trip-scale distances; near-antipodal pairs lose precision in arcsin
+    for lat1, lon1, lat2, lon2 in [random_points(2000, 40.4, 41.0, -74.3, -73.7, seed=3), nyc_edge_points()]:
+        expected = scalar_distances(cleaner, lat1, lon1, lat2, lon2)
+        distances = cleaner.calculate_distance_vectorized(lat1, lon1, lat2, lon2, dtype=np.float32)
+        assert distances.dtype == np.float32
+        np.testing.assert_allclose(distances, expected, rtol=0, atol=1e-2)
+
+
+def quietly(stage, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return stage(*args, **kwargs)
+
+
+def test_incremental_batches_match_a_full_run(tmp_path):
+    source = write_synthetic_trips(str(tmp_path / 'train.csv'), 10_000, seed=3, duplicate_rate=0.02)
+    with open(source) as f:
+        header, *lines = f.readlines()
+    # Duplicates are spread over the whole file, so some in the second batch repeat trips of the first
+    for number, batch in enumerate([lines[:6000], lines[6000:]], 1):
+        with open(tmp_path / f'batch{number}.csv', 'w') as f:
+            f.writelines([header] + batch)
+
+    full = quietly(TrainDataCleaner(source).clean_in_chunks, str(tmp_path / 'full' / 'out.csv'), chunksize=2000)
+    output_path = str(tmp_path / 'incremental' / 'out.csv')
+    runs = [quietly(TrainDataCleaner(str(tmp_path / f'batch{number}.csv')).clean_incremental, output_path,
+                    chunksize=2000) for number in (1, 2)]
+    # A file that was already processed is skipped
+    assert quietly(TrainDataCleaner(str(tmp_path / 'batch1.csv')).clean_incremental, output_path).rows_written == 0
+
+    assert sum(run.rows_written for run in runs) == full.rows_written
+    expected = pd.read_csv(full.written_path)
+    written = pd.read_csv(output_path)
+    pd.testing.assert_frame_equal(written.drop(columns=BATCH_DEPENDENT_COLUMNS),
+                                  expected.drop(columns=BATCH_DEPENDENT_COLUMNS))
+
+    # The removal logs of the two batches hold the same trips as the full run's
+    for log_name in ['invalid_records', 'removed_missing_records', 'removed_exact_duplicates',
+                     'removed_id_duplicates', 'duration_mismatch_records']:
+        full_log = os.path.join(tmp_path, 'full', TRANSPARENCY_LOG_FILES[log_name])
+        batch_logs = [os.path.join(tmp_path, 'incremental', 'batches', f'batch-{number:05d}',
+                                   TRANSPARENCY_LOG_FILES[log_name]) for number in (1, 2)]
+        expected_ids = pd.read_csv(full_log)['id'].tolist() if os.path.exists(full_log) else []
+        batch_ids = [trip_id for path in batch_logs if os.path.exists(path) for trip_id in pd.read_csv(path)['id']]
+        assert batch_ids == expected_ids, log_name
+
+
+def timed_trips(pickups, dropoffs, durations, vendors=None, index=None):
+    return pd.DataFrame({
+        'vendor_id': vendors if vendors is not None else [1] * len(pickups),
+        'pickup_datetime': pd.to_datetime(pickups),
+        'dropoff_datetime': pd.to_datetime(dropoffs),
+        'trip_duration': durations,
+    }, index=index)
+
+
+@pytest.mark.parametrize('action', ['flag', 'remove'])
+def test_mismatched_durations_are_caught(cleaner, action):
+    # Timestamps 600s apart; durations off by 0, 60 (the tolerance), 61 and -500 seconds
+    cleaner.df = timed_trips(['2016-01-01 10:00:00'] * 4, ['2016-01-01 10:10:00'] * 4, [600, 660, 661, 100],
+                             index=[10, 11, 12, 13])
+    quietly(cleaner.validate_trip_durations, tolerance=60, action=action)
+    rows, columns = cleaner.exclusions.entries('duration_mismatch_records')
+    np.testing.assert_array_equal(rows, [12, 13])
+    np.testing.assert_array_equal(columns['duration_difference'], [61, -500])
+    if action == 'flag':
+        assert cleaner.df['duration_mismatch'].tolist() == [False, False, True, True]
+    else:
+        assert cleaner.df.index.tolist() == [10, 11]
+
+
+def test_idle_gaps_follow_each_vendor_across_chunks(cleaner):
+    # Trips reach the stage as concatenated chunks, so a vendor's consecutive trips sit in different
+    # chunks and out of time order; the gaps still follow each vendor's pickups
+    rng = np.random.default_rng(4)
+    n = 3000
+    pickup = pd.Timestamp('2016-01-01') + pd.to_timedelta(np.sort(rng.choice(30 * 86400, n, replace=False)), unit='s')
+    duration = rng.integers(60, 3600, n)
+    trips = timed_trips(pickup, pickup + pd.to_timedelta(duration, unit='s'), duration,
+                        vendors=rng.choice([1, 2, 3], n)).sample(frac=1, random_state=5)
+    chunks = [trips.iloc[rows] for rows in np.array_split(np.arange(n), 4)]
+    cleaner.df = pd.concat(chunks)
+    quietly(cleaner.create_idle_features)
+
+    expected = trips.sort_values('pickup_datetime').groupby('vendor_id')
+    previous_dropoff = expected['dropoff_datetime'].shift()
+    pd.testing.assert_series_equal(cleaner.df['pickup_gap_sec'],
+                                   expected['pickup_datetime'].diff().dt.total_seconds().reindex(cleaner.df.index),
+                                   check_names=False)
+    idle = (trips['pickup_datetime'] - previous_dropoff.reindex(trips.index)).dt.total_seconds()
+    pd.testing.assert_series_equal(cleaner.df['idle_time_sec'], idle.reindex(cleaner.df.index), check_names=False)
+    assert cleaner.df.groupby('vendor_id')['pickup_gap_sec'].apply(lambda gaps: gaps.isna().sum()).eq(1).all()
+
+
+def test_missing_timestamps_are_left_out(cleaner):
+    cleaner.df = timed_trips(['2016-01-01 00:00:00', None, '2016-01-01 00:10:00', '2016-01-01 01:00:00'],
+                             ['2016-01-01 00:05:00', '2016-01-01 00:30:00', None, '2016-01-01 01:10:00'],
+                             [300, 100, 100, 600], vendors=[1, 1, 1, 1])
+    quietly(cleaner.validate_trip_durations)
+    # The two wrong durations belong to trips missing a timestamp, so nothing can be checked against them
+    assert not cleaner.df['duration_mismatch'].any()
+    quietly(cleaner.create_idle_features)
+    # The trip without a pickup is skipped; the one without a dropoff leaves the next idle time unknown
+    np.testing.assert_array_equal(cleaner.df['pickup_gap_sec'], [np.nan, np.nan, 600, 3000])
+    np.testing.assert_array_equal(cleaner.df['idle_time_sec'], [np.nan, np.nan, 300, np.nan])
+
+
+# Anomaly scores of streamed runs are taken against a baseline gathered before capping
+STREAMED_BASELINE_COLUMNS = ['anomaly_score', 'anomaly_reason']
+
+
+def test_parallel_run_matches_eager_and_chunked_runs(tmp_path):
+    source = write_synthetic_trips(str(tmp_path / 'train.csv'), 20_000, seed=7, missing_rate=0.01,
+                                   duplicate_rate=0.02, out_of_box_rate=0.01, outlier_rate=0.01)
+    # Small partitions, so duplicates and outliers land in different workers
+    parallel = quietly(TrainDataCleaner(source).clean_in_parallel, str(tmp_path / 'parallel' / 'out.csv'),
+                       workers=2, partition_bytes=300_000)
+    written = pd.read_csv(parallel.written_path)
+    chunked = quietly(TrainDataCleaner(source).clean_in_chunks, str(tmp_path / 'chunks' / 'out.csv'), chunksize=3000)
+    pd.testing.assert_frame_equal(written, pd.read_csv(chunked.written_path))
+
+    eager = TrainDataCleaner(source)
+    quietly(lambda: eager.load_data().handle_missing_values().parse_datetime_columns().remove_duplicates()
+            .validate_data_integrity().validate_trip_durations().handle_outliers(method='cap').normalize_data()
+            .create_derived_features())
+    eager.df.to_csv(tmp_path / 'eager.csv', index=False)
+    pd.testing.assert_frame_equal(written.drop(columns=STREAMED_BASELINE_COLUMNS), pd.read_csv(tmp_path / 'eager.csv'))
@@ -0,0 +1,81 @@
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from cli import DIAGNOSTIC_STAGES, EXTRA_STAGES, build_parser, check_options, main, pipeline_stages
+from od_matrix import OD_MATRIX_FILE
+from rollup_cube import ROLLUP_FILE
+from sort_index import sort_index_path_for
+from synthetic_trips import TRIP_COLUMNS, write_synthetic_trips
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    return write_synthetic_trips(str(tmp_path_factory.mktemp('data') / 'train.csv'), 3000, seed=8, days=10)
+
+
+def stage_names(source, *argv):
+    parser = build_parser()
+    args = check_options(parser, parser.parse_args(['--input', source, *argv]))
+    return [name for name, _ in pipeline_stages(args)]
+
+
+def run(*argv):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+        try:
+            code = main(list(argv))
+        except SystemExit as exit:
+            code = exit.code
+    return code, out.getvalue()
+
+
+@pytest.mark.parametrize('mode', ['eager', 'lazy', 'chunks', 'parallel'])
+def test_extra_stages_only_run_when_asked_for(source, mode):
+    default = stage_names(source, '--mode', mode)
+    assert not set(default) & set(EXTRA_STAGES)
+    extended = stage_names(source, '--mode', mode, '--with', ','.join(EXTRA_STAGES))
+    assert [name for name in extended if name not in EXTRA_STAGES] == default
+    assert 'build_sort_index' in extended
+
+
+def test_skip_and_no_diagnostics(source):
+    names = stage_names(source, '--skip', 'basic_info,check_duplicates', '--skip', 'detect_outliers')
+    assert not {'basic_info', 'check_duplicates', 'detect_outliers'} & set(names)
+    assert 'check_missing_values' in names and 'handle_outliers' in names
+    assert not set(DIAGNOSTIC_STAGES) & set(stage_names(source, '--no-diagnostics'))
+
+
+@pytest.mark.parametrize('argv', [['--skip', 'remove_duplicates'], ['--skip', 'score_anomalies'],
+                                  ['--with', 'basic_info'], ['--chunksize', '10'], ['--mode', 'parallel', '--workers', '0'],
+                                  ['--input', 'missing.csv']])
+def test_bad_options_exit_before_loading(source, argv):
+    code, _ = run('--input', source, *argv, '--dry-run')
+    assert code == 2
+
+
+def test_dry_run_lists_the_stages_and_writes_nothing(source, tmp_path):
+    output = str(tmp_path / 'out' / 'train_cleaned.csv')
+    code, printed = run('--input', source, '--output', output, '--dry-run', '--skip', 'basic_info',
+                        '--with', 'score_anomalies')
+    assert code == 0
+    listed = [line.split('. ', 1)[1].split('(')[0] for line in printed.splitlines() if '. ' in line]
+    assert listed == stage_names(source, '--skip', 'basic_info', '--with', 'score_anomalies')
+    assert 'Skipped: basic_info' in printed
+    assert 'Not run (add with --with): validate_trip_durations' in printed
+    assert not os.path.exists(os.path.dirname(output))
+
+
+@pytest.mark.parametrize('extras', [[], ['--with', 'build_rollups,build_od_matrix,build_sort_index']])
+def test_side_files_are_only_written_with_their_stages(source, tmp_path, extras):
+    output = str(tmp_path / 'train_cleaned.csv')
+    code, printed = run('--input', source, '--output', output, '--quiet', *extras)
+    assert code == 0 and printed.startswith('Cleaned 3000 rows')
+    side_files = [ROLLUP_FILE, OD_MATRIX_FILE, os.path.basename(sort_index_path_for(output))]
+    assert [os.path.exists(tmp_path / name) for name in side_files] == [bool(extras)] * 3
+    columns = pd.read_csv(output, nrows=1).columns
+    assert set(TRIP_COLUMNS) <= set(columns)
+    assert not {'duration_mismatch', 'anomaly_score', 'anomaly_reason'} & set(columns)
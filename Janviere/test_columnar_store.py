@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import DICTIONARY_MAX_CATEGORIES, METADATA_FILE, ColumnarStore, ColumnarStoreWriter
+
+
+def trip_chunk(first, n, seed=0):
+    rng = np.random.default_rng(seed + first)
+    return pd.DataFrame({
+        'id': [f'id{i:07d}' for i in range(first, first + n)],
+        'store_and_fwd_flag': pd.Series(rng.choice(['N', 'Y', None], n), dtype=object),
+        'trip_duration_category': pd.Categorical(rng.choice(['Short', 'Long'], n), categories=['Short', 'Long'],
+                                                 ordered=True),
+        'trip_duration': rng.integers(60, 5000, n),
+    })
+
+
+def column_kinds(path):
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        return {spec['name']: spec['kind'] for spec in json.load(f)['columns']}
+
+
+def assert_store_holds(path, chunks):
+    expected = pd.concat(chunks, ignore_index=True)
+    store = ColumnarStore(path)
+    assert len(store) == len(expected)
+    assert store.column('id').tolist() == expected['id'].tolist()
+    assert list(store.column('store_and_fwd_flag').astype(object)) == [
+        value if value is not None else np.nan for value in expected['store_and_fwd_flag']]
+    np.testing.assert_array_equal(store.column('trip_duration'), expected['trip_duration'])
+    assert store.column('trip_duration_category').tolist() == expected['trip_duration_category'].tolist()
+
+
+@pytest.mark.parametrize('reopen', [False, True])
+def test_small_first_chunk_does_not_pin_ids_to_a_dictionary(tmp_path, reopen):
+    # The first chunk makes every string column a dictionary; id is rewritten as plain strings
+    # once its dictionary passes the limit, the low-cardinality flag stays a dictionary
+    path = str(tmp_path / 'trips.columnar')
+    writer = ColumnarStoreWriter(path)
+    chunks = [trip_chunk(0, 10)]
+    writer.append(chunks[0])
+    if reopen:
+        writer.close()
+        assert column_kinds(path)['id'] == 'categorical'
+        writer = ColumnarStoreWriter(path, resume=True)
+    first = 10
+    for n in [1000, DICTIONARY_MAX_CATEGORIES, 2500]:
+        chunks.append(trip_chunk(first, n))
+        writer.append(chunks[-1])
+        first += n
+    writer.close()
+    kinds = column_kinds(path)
+    assert kinds['id'] == 'string'
+    assert kinds['store_and_fwd_flag'] == kinds['trip_duration_category'] == 'categorical'
+    assert not os.path.exists(os.path.join(path, 'id.bin'))
+    assert_store_holds(path, chunks)
+
+
+def test_dictionary_within_the_limit_is_kept(tmp_path):
+    path = str(tmp_path / 'trips.columnar')
+    writer = ColumnarStoreWriter(path)
+    chunks = [trip_chunk(0, 100), trip_chunk(100, DICTIONARY_MAX_CATEGORIES - 100)]
+    for chunk in chunks:
+        writer.append(chunk)
+    writer.close()
+    assert column_kinds(path)['id'] == 'categorical'
+    assert_store_holds(path, chunks)
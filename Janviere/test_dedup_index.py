@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dedup_index import SIGNATURE_COLUMNS, DedupIndex, duplicated, duplicated_rows, fingerprint, trip_id_keys
+
+ODD_IDS = ['id2875421', 'id42', 'id042', 'id0042', 'trip-7', 'ID2875421', 'id', '', 'id12x', 'id-5',
+           'id' + '9' * 17, 'id' + '9' * 18, 'id' + '1' * 25, None, np.nan, '42', ' id42']
+
+
+def trips(n=3000, seed=0):
+    # Trips with repeated IDs, repeated signatures, exact duplicates and NaN fields
+    rng = np.random.default_rng(seed)
+    pickup = pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 50, n), unit='min')
+    df = pd.DataFrame({
+        'id': [f'id{value:07d}' for value in rng.integers(0, n // 2, n)],
+        'vendor_id': rng.integers(1, 3, n),
+        'pickup_datetime': pickup,
+        'dropoff_datetime': pickup + pd.Timedelta(minutes=10),
+        'passenger_count': rng.integers(1, 3, n).astype(float),
+        'pickup_longitude': rng.choice([-73.98, -73.95], n),
+        'pickup_latitude': rng.choice([40.75, 40.76], n),
+        'dropoff_longitude': -73.99,
+        'dropoff_latitude': 40.7,
+        'store_and_fwd_flag': rng.choice(['N', 'Y'], n),
+    })
+    df.loc[rng.random(n) < 0.05, 'passenger_count'] = np.nan
+    df.loc[rng.random(n) < 0.05, 'pickup_latitude'] = np.nan
+    df.loc[rng.random(n) < 0.02, 'store_and_fwd_flag'] = None
+    df.loc[rng.random(n) < 0.05, 'id'] = rng.choice(ODD_IDS[:-4], 1)[0]
+    # Exact copies of earlier rows, NaNs included
+    return pd.concat([df, df.sample(300, random_state=seed)], ignore_index=True)
+
+
+@pytest.mark.parametrize('dtype', ['str', 'string', object])
+def test_odd_ids_match_pandas_duplicated(dtype):
+    # read_csv gives str IDs, where None and NaN are both the missing value; object columns
+    # keep them apart in pandas, but trip_id_keys treats every missing ID as one key
+    odd_ids = ODD_IDS if dtype != object else [value for value in ODD_IDS if value is not None]
+    ids = pd.Series(odd_ids * 3, dtype=dtype)
+    np.testing.assert_array_equal(duplicated(trip_id_keys(ids)), ids.duplicated().to_numpy())
+    # Distinct IDs get distinct keys (leading zeros and case matter)
+    keys = trip_id_keys(ids.iloc[:len(odd_ids)])
+    assert len(np.unique(keys)) == ids.nunique(dropna=False)
+
+
+def test_parsed_and_hashed_keys_do_not_collide():
+    parsed = trip_id_keys(['id1', 'id01', 'id' + '9' * 17])
+    hashed = trip_id_keys(['x1', 'id' + '9' * 18])
+    assert (parsed >= 0).all() and (hashed < 0).all()
+    assert len(np.unique(parsed)) == 3
+
+
+@pytest.mark.parametrize('typed_ids', [False, True])
+def test_fingerprint_masks_match_pandas(typed_ids):
+    df = trips()
+    if typed_ids:
+        df['id'] = df['id'].astype('string')
+    keys = fingerprint(df)
+    np.testing.assert_array_equal(duplicated(keys['row']), df.duplicated().to_numpy())
+    np.testing.assert_array_equal(duplicated_rows(df, keys['row']), df.duplicated().to_numpy())
+    np.testing.assert_array_equal(duplicated(keys['id']), df.duplicated(subset=['id']).to_numpy())
+    np.testing.assert_array_equal(duplicated(keys['signature']),
+                                  df.duplicated(subset=SIGNATURE_COLUMNS).to_numpy())
+
+
+def test_row_key_collisions_are_not_duplicates():
+    # Every row shares one key, as if all hashes collided: only identical rows are dropped
+    df = trips()
+    np.testing.assert_array_equal(duplicated_rows(df, np.zeros(len(df), dtype=np.uint64)),
+                                  df.duplicated().to_numpy())
+
+
+def test_row_keys_depend_on_which_column_holds_a_value():
+    # The same values in swapped columns make different rows
+    df = trips().iloc[:2].assign(vendor_id=[1, 2], passenger_count=[2.0, 1.0])
+    swapped = df.assign(vendor_id=[2, 1], passenger_count=[1.0, 2.0])
+    assert not np.isin(fingerprint(swapped)['row'], fingerprint(df)['row']).any()
+
+
+def test_index_across_chunks_matches_whole_frame():
+    # 40 chunks push the index past its segment limit, so compaction is exercised too
+    df = trips(6000, seed=1)
+    index = DedupIndex()
+    masks = []
+    for rows in np.array_split(np.arange(len(df)), 40):
+        chunk = df.iloc[rows]
+        keys = fingerprint(chunk)
+        repeated = duplicated(keys['id']) | index.contains_ids(keys['id'])
+        repeated_trip = duplicated(keys['signature']) | index.contains_signatures(keys['signature'])
+        masks.append((repeated, repeated_trip))
+        index.add(keys['id'], keys['signature'])
+    np.testing.assert_array_equal(np.concatenate([ids for ids, _ in masks]),
+                                  df.duplicated(subset=['id']).to_numpy())
+    np.testing.assert_array_equal(np.concatenate([signatures for _, signatures in masks]),
+                                  df.duplicated(subset=SIGNATURE_COLUMNS).to_numpy())
+    assert len(np.unique(index.ids())) == df['id'].nunique(dropna=False)
+
+
+def test_merge_and_copy():
+    keys = trip_id_keys(trips()['id'])
+    left, right = DedupIndex().add(keys[:1000]), DedupIndex().add(keys[1000:])
+    snapshot = left.copy()
+    left.merge(right)
+    assert left.contains_ids(keys).all()
+    np.testing.assert_array_equal(snapshot.contains_ids(keys), np.isin(keys, keys[:1000]))
+
+
+@pytest.mark.parametrize('with_signatures', [False, True])
+def test_save_load_round_trip(tmp_path, with_signatures):
+    keys = fingerprint(trips())
+    index = DedupIndex().add(keys['id'][:2000], keys['signature'][:2000] if with_signatures else None)
+    path = tmp_path / 'seen_ids.npz'
+    index.save(path)
+    loaded = DedupIndex.load(path)
+    np.testing.assert_array_equal(loaded.ids(), np.unique(keys['id'][:2000]))
+    np.testing.assert_array_equal(loaded.contains_ids(keys['id']), index.contains_ids(keys['id']))
+    np.testing.assert_array_equal(loaded.contains_signatures(keys['signature']),
+                                  index.contains_signatures(keys['signature']))
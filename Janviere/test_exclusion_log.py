@@ -0,0 +1,97 @@
+import contextlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning_script import TRANSPARENCY_LOG_FILES, TrainDataCleaner
+from exclusion_log import REASON_COLUMN, ExclusionLog
+from synthetic_trips import write_synthetic_trips
+
+
+def write_source(path, n=3000, seed=0, blank_lines=False, line_ending='\n'):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': [f'id{i:07d}' for i in range(n)],
+        'value': rng.normal(0, 1, n).round(6),
+        'label': rng.choice(['a', 'b, quoted', ''], n),
+    })
+    lines = df.to_csv(index=False, lineterminator=line_ending).split(line_ending)
+    if blank_lines:
+        # pandas skips blank lines, so they must not shift the row numbers
+        for position in sorted(rng.choice(np.arange(2, n), 50, replace=False), reverse=True):
+            lines.insert(position, '')
+    with open(path, 'w', newline='') as f:
+        f.write(line_ending.join(lines))
+    return pd.read_csv(path)
+
+
+@pytest.mark.parametrize('blank_lines, line_ending', [(False, '\n'), (True, '\n'), (False, '\r\n')])
+@pytest.mark.parametrize('block_bytes, flush_bytes', [(64 * 1024**2, 16 * 1024**2), (997, 500)])
+def test_recorded_rows_read_back_from_source(tmp_path, blank_lines, line_ending, block_bytes, flush_bytes):
+    path = tmp_path / 'source.csv'
+    source = write_source(path, blank_lines=blank_lines, line_ending=line_ending)
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(source), 400, replace=False)
+    log = ExclusionLog()
+    # Recorded out of order, in several parts, with a per-row column
+    for part in np.array_split(rows, 5):
+        log.add('dropped', part, score=part * 0.5)
+    assert log.count('dropped') == len(rows)
+
+    pieces = list(log.read_rows(path, block_bytes=block_bytes, flush_bytes=flush_bytes))
+    records = pd.concat([frame for _, frame in pieces])
+    expected = source.loc[np.sort(rows)].assign(score=np.sort(rows) * 0.5)
+    pd.testing.assert_frame_equal(records, expected, check_index_type=False)
+    if flush_bytes < 1000:
+        assert len(pieces) > 1
+
+
+def test_reason_bits_are_named():
+    log = ExclusionLog({'invalid_records': ['bad_lat', 'bad_lon', 'zero_passengers']})
+    log.add('invalid_records', [4, 1, 2], **{REASON_COLUMN: np.array([0b001, 0b110, 0b011])})
+    rows, columns = log.entries('invalid_records')
+    np.testing.assert_array_equal(rows, [1, 2, 4])
+    names = ExclusionLog._reason_names(columns[REASON_COLUMN], log.reason_labels['invalid_records'])
+    assert list(names) == ['bad_lon;zero_passengers', 'bad_lat;bad_lon', 'bad_lat']
+
+
+def test_rows_past_the_end_are_reported(tmp_path):
+    path = tmp_path / 'source.csv'
+    source = write_source(path, n=100)
+    log = ExclusionLog().add('dropped', [5, len(source)])
+    with pytest.raises(ValueError):
+        list(log.read_rows(path))
+
+
+def test_streamed_logs_hold_the_excluded_source_rows(tmp_path):
+    # Row numbers recorded chunk by chunk refer to the source file, so every logged removal is a
+    # source row that is missing from the output, and together with the output they cover the source
+    source_path = write_synthetic_trips(str(tmp_path / 'train.csv'), 8000, seed=2, missing_rate=0.01,
+                                        duplicate_rate=0.02, out_of_box_rate=0.01)
+    cleaner = TrainDataCleaner(source_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaner.clean_in_chunks(str(tmp_path / 'out' / 'train_cleaned.csv'), chunksize=1500)
+    source = pd.read_csv(source_path)
+    written = pd.read_csv(cleaner.written_path)
+
+    removal_logs = ['invalid_records', 'removed_missing_records', 'removed_exact_duplicates',
+                    'removed_id_duplicates', 'duration_mismatch_records']
+    removed = []
+    for log_name in removal_logs:
+        rows, _ = cleaner.exclusions.entries(log_name)
+        if len(rows) == 0:
+            continue
+        log_path = os.path.join(tmp_path, 'out', TRANSPARENCY_LOG_FILES[log_name])
+        logged = pd.read_csv(log_path)
+        # A log without missing values reads back with int columns where the source has floats
+        pd.testing.assert_frame_equal(logged[source.columns], source.loc[rows].reset_index(drop=True),
+                                      check_dtype=False)
+        removed.append(rows)
+    removed = np.concatenate(removed)
+    assert len(np.unique(removed)) == len(removed)
+    assert len(removed) + len(written) == len(source)
+    kept = np.setdiff1d(np.arange(len(source)), removed)
+    np.testing.assert_array_equal(source['id'].to_numpy()[kept], written['id'].to_numpy())
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from od_matrix import OD_ZONE_ZOOM, ODMatrix, ZoneDistanceCache
+from spatial_index import cell_centers, cell_codes, haversine_km
+
+
+def trip_frame(n=4000, seed=0, cells=True):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'pickup_latitude': rng.uniform(40.70, 40.80, n),
+        'pickup_longitude': rng.uniform(-74.02, -73.93, n),
+        'dropoff_latitude': rng.uniform(40.70, 40.80, n),
+        'dropoff_longitude': rng.uniform(-74.02, -73.93, n),
+        'trip_duration': rng.integers(60, 3600, n),
+        'trip_speed_kmh': rng.uniform(5, 40, n),
+    })
+    if cells:
+        df['pickup_cell'] = cell_codes(df['pickup_latitude'], df['pickup_longitude'])
+        df['dropoff_cell'] = cell_codes(df['dropoff_latitude'], df['dropoff_longitude'])
+    return df
+
+
+def grouped_flows(df, zoom=OD_ZONE_ZOOM):
+    # The same flows by a pandas groupby on the zone codes
+    zones = df.assign(origin_zone=cell_codes(df['pickup_latitude'], df['pickup_longitude'], zoom),
+                      destination_zone=cell_codes(df['dropoff_latitude'], df['dropoff_longitude'], zoom))
+    flows = zones.groupby(['origin_zone', 'destination_zone']).agg(
+        trip_count=('trip_duration', 'size'), mean_duration_sec=('trip_duration', 'mean'),
+        mean_speed_kmh=('trip_speed_kmh', 'mean')).reset_index()
+    origin_lat, origin_lon = cell_centers(flows['origin_zone'].to_numpy(), zoom)
+    destination_lat, destination_lon = cell_centers(flows['destination_zone'].to_numpy(), zoom)
+    flows['centroid_distance_km'] = haversine_km(origin_lat, origin_lon, destination_lat, destination_lon)
+    return flows
+
+
+def assert_same_flows(matrix, expected):
+    columns = list(expected.columns)
+    pd.testing.assert_frame_equal(matrix.flows()[columns], expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('cells', [True, False])
+def test_flows_match_a_groupby(cells):
+    df = trip_frame(cells=cells)
+    matrix = ODMatrix.from_frame(df, distances=ZoneDistanceCache())
+    assert matrix.trips == len(df)
+    assert_same_flows(matrix, grouped_flows(df))
+
+
+def test_merged_chunks_match_one_pass():
+    df = trip_frame()
+    distances = ZoneDistanceCache()
+    merged = ODMatrix(distances=distances)
+    for rows in np.array_split(np.arange(len(df)), 7):
+        merged.update(df.iloc[rows])
+    assert_same_flows(merged, grouped_flows(df))
+    # Each zone pair's distance is computed once; asking again is a cache hit
+    assert distances.misses == len(merged)
+    merged.centroid_distances()
+    assert distances.misses == len(merged) and distances.hits == len(merged)
+
+
+def test_saved_matrix_loads_and_extends(tmp_path):
+    df = trip_frame()
+    first, second = df.iloc[:2500], df.iloc[2500:]
+    path = ODMatrix.from_frame(first, distances=ZoneDistanceCache()).save(str(tmp_path / 'od_matrix.npz'))
+    distances = ZoneDistanceCache()
+    loaded = ODMatrix.load(path, distances)
+    assert_same_flows(loaded, grouped_flows(first))
+    # Stored distances seed the cache: no pair of the saved matrix is computed again
+    assert len(distances) == len(loaded) and distances.misses == 0
+    loaded.flows()
+    assert distances.misses == 0
+    assert_same_flows(loaded.update(second), grouped_flows(df))
+
+
+def test_merge_needs_the_same_zoom():
+    df = trip_frame(200)
+    with pytest.raises(ValueError):
+        ODMatrix.from_frame(df, 12).merge(ODMatrix.from_frame(df, 14))
+    with pytest.raises(ValueError):
+        ODMatrix(zoom=16)
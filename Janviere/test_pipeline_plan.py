@@ -0,0 +1,66 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from cleaning_script import TrainDataCleaner
+from pipeline_plan import ROW_LOCAL_PASS
+from synthetic_trips import write_synthetic_trips
+
+CLEANING_CHAIN = [
+    ('load_data', {}),
+    ('handle_missing_values', {}),
+    ('parse_datetime_columns', {}),
+    ('remove_duplicates', {}),
+    ('validate_data_integrity', {}),
+    ('validate_trip_durations', {}),
+    ('handle_outliers', {'method': 'cap'}),
+    ('normalize_data', {}),
+    ('create_derived_features', {}),
+]
+# Features first, checks after: the integrity check only reads raw columns, so it moves ahead of the features
+FEATURES_FIRST_CHAIN = [
+    ('load_data', {'typed': True}),
+    ('handle_missing_values', {}),
+    ('remove_duplicates', {}),
+    ('normalize_data', {'parse_datetimes': False}),
+    ('create_derived_features', {}),
+    ('validate_data_integrity', {}),
+    ('validate_trip_durations', {'action': 'remove'}),
+]
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'train.csv'
+    return write_synthetic_trips(str(path), 5000, seed=3, missing_rate=0.01, duplicate_rate=0.02,
+                                 out_of_box_rate=0.03, outlier_rate=0.01)
+
+
+def run(source, chain, lazy):
+    cleaner = TrainDataCleaner(source)
+    pipeline = cleaner.lazy() if lazy else cleaner
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, kwargs in chain:
+            getattr(pipeline, name)(**kwargs)
+        if lazy:
+            pipeline.collect()
+    return cleaner, pipeline
+
+
+@pytest.mark.parametrize('chain', [CLEANING_CHAIN, FEATURES_FIRST_CHAIN])
+def test_lazy_chain_matches_eager(source, chain):
+    eager, _ = run(source, chain, lazy=False)
+    lazy, _ = run(source, chain, lazy=True)
+    pd.testing.assert_frame_equal(lazy.df, eager.df)
+    pd.testing.assert_series_equal(lazy.validation_counts, eager.validation_counts)
+
+
+def test_filter_moves_ahead_of_derived_features(source):
+    _, pipeline = run(source, FEATURES_FIRST_CHAIN, lazy=True)
+    plan = pipeline.plan()
+    assert plan.notes[0] == "validate_data_integrity moved ahead of create_derived_features"
+    # validate_trip_durations adds duration_mismatch when flagging, so moving it could reorder the columns
+    fused = [[node.name for node in nodes] for nodes, shared in plan.steps if shared == ROW_LOCAL_PASS]
+    assert fused == [['validate_data_integrity', 'create_derived_features', 'validate_trip_durations']]
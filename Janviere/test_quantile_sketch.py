@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import EXACT_FALLBACK_ACCURACY, QuantileSketch
+
+QUANTILES = [0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]
+
+
+def trip_durations(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.rint(rng.lognormal(6.5, 0.8, n))
+
+
+def signed_values(n=20_000, seed=1):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 50, n)
+    values[:100] = 0.0
+    return values
+
+
+@pytest.mark.parametrize('values', [trip_durations(), signed_values(), np.array([3.0]), np.array([1.0, 1.0, 2.0])])
+def test_exact_mode_matches_pandas(values):
+    sketch = QuantileSketch.from_values(values)
+    expected = pd.Series(values).quantile(QUANTILES).to_numpy()
+    np.testing.assert_allclose(sketch.quantiles(QUANTILES), expected, rtol=1e-12)
+
+
+def test_nans_are_ignored():
+    values = trip_durations()
+    with_nans = np.concatenate([values, [np.nan] * 50])
+    assert QuantileSketch.from_values(with_nans).quantiles(QUANTILES) == QuantileSketch.from_values(values).quantiles(
+        QUANTILES)
+    assert np.isnan(QuantileSketch().quantile(0.5))
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.001])
+@pytest.mark.parametrize('values', [trip_durations(), signed_values()])
+def test_approximate_mode_within_relative_accuracy(values, accuracy):
+    sketch = QuantileSketch.from_values(values, accuracy)
+    expected = pd.Series(values).quantile(QUANTILES).to_numpy()
+    estimates = np.array(sketch.quantiles(QUANTILES))
+    assert np.all(np.abs(estimates - expected) <= accuracy * np.abs(expected) + 1e-12)
+
+
+@pytest.mark.parametrize('accuracy', [None, 0.01])
+def test_merge_of_halves_equals_whole(accuracy):
+    values = signed_values()
+    whole = QuantileSketch.from_values(values, accuracy)
+    merged = QuantileSketch.from_values(values[:7_000], accuracy).merge(
+        QuantileSketch.from_values(values[7_000:], accuracy))
+    assert merged.count == whole.count
+    assert (merged.min, merged.max) == (whole.min, whole.max)
+    assert merged.quantiles(QUANTILES) == whole.quantiles(QUANTILES)
+    assert merged.count_outside(-10, 10) == whole.count_outside(-10, 10)
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(None))
+
+
+@pytest.mark.parametrize('accuracy', [None, 0.01])
+def test_dict_round_trip(accuracy):
+    sketch = QuantileSketch.from_values(signed_values(), accuracy)
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.quantiles(QUANTILES) == sketch.quantiles(QUANTILES)
+    # A restored sketch keeps merging like the original
+    more = QuantileSketch.from_values(trip_durations(), accuracy)
+    assert restored.merge(more).quantiles(QUANTILES) == sketch.merge(more).quantiles(QUANTILES)
+
+
+def test_empty_dict_round_trip():
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(QuantileSketch(0.01).to_dict())))
+    assert restored.count == 0
+    assert np.isnan(restored.quantile(0.5))
+
+
+def test_exact_mode_falls_back_to_buckets_past_the_distinct_value_cap():
+    # Float values are nearly all distinct: the exact table would grow with the row count
+    values = signed_values(50_000)
+    sketch = QuantileSketch(max_exact_values=10_000)
+    for chunk in np.array_split(values, 10):
+        sketch.update(chunk)
+        assert not sketch.exact or len(sketch.positive[0]) <= 10_000
+    assert not sketch.exact and sketch.relative_accuracy is None
+    expected = pd.Series(values).quantile(QUANTILES).to_numpy()
+    estimates = np.array(sketch.quantiles(QUANTILES))
+    assert np.all(np.abs(estimates - expected) <= EXACT_FALLBACK_ACCURACY * np.abs(expected) + 1e-12)
+    # Buckets are filled as if the values had been bucketed from the start
+    direct = QuantileSketch.from_values(values, EXACT_FALLBACK_ACCURACY)
+    assert sketch.quantiles(QUANTILES) == direct.quantiles(QUANTILES)
+
+
+@pytest.mark.parametrize('fallen_back_first', [True, False])
+def test_exact_and_fallen_back_sketches_merge(fallen_back_first):
+    values = signed_values(30_000)
+    fallen_back = QuantileSketch.from_values(values[:20_000])
+    fallen_back.max_exact_values = 1_000
+    fallen_back.update(values[20_000:25_000])
+    exact = QuantileSketch.from_values(values[25_000:26_000].round())
+    assert exact.exact and not fallen_back.exact
+    merged = fallen_back.merge(exact) if fallen_back_first else exact.merge(fallen_back)
+    assert not merged.exact and merged.count == 26_000
+    whole = np.concatenate([values[:25_000], values[25_000:26_000].round()])
+    direct = QuantileSketch.from_values(whole, EXACT_FALLBACK_ACCURACY)
+    assert merged.quantiles(QUANTILES) == direct.quantiles(QUANTILES)
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(merged.to_dict())))
+    assert not restored.exact and restored.quantiles(QUANTILES) == merged.quantiles(QUANTILES)
@@ -0,0 +1,69 @@
+import json
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+from query_cache import QueryCache
+from table_writer import write_output_version
+from trip_query_api import CachedTripQueries, TripDataSource
+
+
+def write_trips(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'pickup_datetime': (pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 86400, n), unit='s')
+                            ).strftime('%Y-%m-%d %H:%M:%S'),
+        'trip_duration': rng.integers(60, 3600, n),
+        'trip_distance_km': rng.lognormal(0.7, 0.8, n).round(3),
+        'pickup_longitude': rng.uniform(-74.02, -73.93, n),
+        'pickup_latitude': rng.uniform(40.70, 40.80, n),
+        'dropoff_longitude': rng.uniform(-74.02, -73.93, n),
+        'dropoff_latitude': rng.uniform(40.70, 40.80, n),
+    }).to_csv(path, index=False)
+    return write_output_version(path, n)['version']
+
+
+def test_new_output_version_drops_cached_responses(tmp_path):
+    path = str(tmp_path / 'train_cleaned.csv')
+    first_version = write_trips(path, 500)
+    queries = CachedTripQueries(TripDataSource(path, check_interval=0))
+
+    status, headers, body = queries.respond('/api/trips/summary', 'hour=8')
+    assert status == HTTPStatus.OK and headers['X-Cache'] == 'MISS'
+    # Same request after normalization (parameter order, '8' == '08', blank parameters)
+    status, headers, cached = queries.respond('/api/trips/summary', 'zone=&hour=08')
+    assert headers['X-Cache'] == 'HIT' and headers['X-Data-Version'] == first_version
+    assert cached == body
+
+    # A new save_cleaned_data run: new rows and a new version marker
+    second_version = write_trips(path, 800, seed=1)
+    status, headers, body = queries.respond('/api/trips/summary', 'hour=8')
+    assert headers['X-Cache'] == 'MISS' and headers['X-Data-Version'] == second_version
+    assert json.loads(queries.respond('/api/trips/summary', '')[2])['total_trips'] == 800
+    stats = queries.cache.stats()
+    assert stats['version'] == second_version and stats['invalidations'] == 1 and stats['hits'] == 1
+
+
+def test_entries_of_an_old_version_are_not_stored_or_served():
+    cache = QueryCache()
+    cache.set_version('v1')
+    assert cache.put('key', 'old', 3, 'v1')
+    cache.set_version('v2')
+    assert cache.get('key', 'v2') is None and len(cache) == 0
+    # A response computed from v1 that finishes after the switch is not kept
+    assert not cache.put('key', 'old', 3, 'v1')
+    assert cache.get('key', 'v1') is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = QueryCache(max_bytes=10)
+    cache.set_version('v1')
+    for key in 'abc':
+        cache.put(key, key, 4, 'v1')
+    assert cache.get('a', 'v1') is None     # evicted to stay under 10 bytes
+    cache.get('b', 'v1')
+    cache.put('d', 'd', 4, 'v1')            # evicts c, the least recently used
+    assert [key for key in 'abcd' if cache.get(key, 'v1') is not None] == ['b', 'd']
+    assert cache.size_bytes <= 10 and cache.stats()['evictions'] == 2
+    assert not cache.put('big', 'x', 11, 'v1')
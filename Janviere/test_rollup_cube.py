@@ -0,0 +1,55 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning_script import TrainDataCleaner
+from rollup_cube import RollupCube
+from synthetic_trips import write_synthetic_trips
+from trip_query_api import TripQueryService, TripStore
+
+ENDPOINTS = ['/api/trips/summary', '/api/trips/time-distribution', '/api/trips/duration-histogram']
+
+
+@pytest.fixture(scope='module')
+def cleaned(tmp_path_factory):
+    source = write_synthetic_trips(str(tmp_path_factory.mktemp('data') / 'train.csv'), 8000, seed=6, days=20)
+    cleaner = TrainDataCleaner(source)
+    with contextlib.redirect_stdout(io.StringIO()):
+        (cleaner.load_data().handle_missing_values().parse_datetime_columns().remove_duplicates()
+         .validate_data_integrity().normalize_data().create_derived_features())
+    return cleaner.df.reset_index(drop=True)
+
+
+def answers(service, query):
+    return [service.handle(path, query)[2] for path in ENDPOINTS]
+
+
+@pytest.mark.parametrize('query', ['', 'date=2016-01-05', 'hour=8', 'date=2016-01-05&hour=17',
+                                   'distance=3', 'distance=5&hour=8', 'distance=3.7', 'date=2015-01-01'])
+def test_rollup_answers_match_a_scan(cleaned, query):
+    store = TripStore.from_frame(cleaned)
+    with_cube = TripQueryService(store, rollups=RollupCube.from_frame(cleaned))
+    assert answers(with_cube, query) == answers(TripQueryService(store), query)
+
+
+def test_cube_answers_whole_category_cutoffs(cleaned):
+    cube = RollupCube.from_frame(cleaned)
+    filters = {'date': None, 'hour': 8, 'distance': 3.0, 'fare': None, 'zone': None}
+    assert cube.cells_for(filters) is not None
+    # 3.7 km falls inside the 3-5 km category, so only a scan is exact
+    assert cube.cells_for(dict(filters, distance=3.7)) is None
+    assert cube.cells_for(dict(filters, zone='Midtown')) is None
+
+
+def test_merged_and_reloaded_cubes_match(cleaned, tmp_path):
+    full = RollupCube.from_frame(cleaned)
+    merged = RollupCube()
+    for rows in np.array_split(np.arange(len(cleaned)), 5):
+        merged.merge(RollupCube.from_frame(cleaned.iloc[rows]))
+    loaded = RollupCube.load(full.save(str(tmp_path / 'trip_rollups.csv')))
+    for cube in (merged, loaded):
+        assert cube.trip_count == len(cleaned)
+        pd.testing.assert_frame_equal(cube.cells[full.cells.columns], full.cells, check_dtype=False)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from spatial_index import HEATMAP_ZOOMS, SpatialGridIndex, cell_centers, cell_codes, coarsen, haversine_km
+
+
+def nyc_points(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.normal(40.75, 0.05, n)
+    lon = rng.normal(-73.97, 0.06, n)
+    # A few exact repeats, as many trips start at the same spot
+    lat[:200], lon[:200] = lat[200:400], lon[200:400]
+    return lat, lon
+
+
+@pytest.fixture(scope='module')
+def index():
+    return SpatialGridIndex(*nyc_points())
+
+
+@pytest.mark.parametrize('box', [(40.70, -74.02, 40.80, -73.93), (40.7500, -73.9800, 40.7510, -73.9790),
+                                 (40.0, -75.0, 41.5, -72.0), (10.0, 10.0, 11.0, 11.0),
+                                 # A box whose edges sit exactly on points
+                                 None])
+def test_bbox_matches_brute_force(index, box):
+    if box is None:
+        box = (index.lat[5], index.lon[7], index.lat[5] + 0.01, index.lon[7] + 0.01)
+    lat_min, lon_min, lat_max, lon_max = box
+    expected = np.flatnonzero((index.lat >= lat_min) & (index.lat <= lat_max)
+                              & (index.lon >= lon_min) & (index.lon <= lon_max))
+    np.testing.assert_array_equal(index.query_bbox(*box), expected)
+
+
+@pytest.mark.parametrize('center, radius_km', [((40.75, -73.97), 0.5), ((40.75, -73.97), 5.0),
+                                               ((40.70, -74.05), 2.0), ((40.75, -73.97), 0.0),
+                                               ((0.0, 0.0), 10.0)])
+def test_radius_matches_brute_force(index, center, radius_km):
+    expected = np.flatnonzero(haversine_km(*center, index.lat, index.lon) <= radius_km)
+    np.testing.assert_array_equal(index.query_radius(*center, radius_km), expected)
+
+
+def test_precomputed_codes_give_the_same_answers(index):
+    reused = SpatialGridIndex(index.lat, index.lon, cell_codes(index.lat, index.lon))
+    box = (40.72, -74.0, 40.78, -73.95)
+    np.testing.assert_array_equal(reused.query_bbox(*box), index.query_bbox(*box))
+    np.testing.assert_array_equal(reused.query_radius(40.75, -73.97, 1.5), index.query_radius(40.75, -73.97, 1.5))
+
+
+@pytest.mark.parametrize('zoom', HEATMAP_ZOOMS + [11])
+def test_heatmap_counts_every_point_once(index, zoom):
+    lat, lon, counts = index.heatmap(zoom)
+    assert counts.sum() == len(index)
+    cells, expected = np.unique(coarsen(cell_codes(index.lat, index.lon), zoom), return_counts=True)
+    np.testing.assert_array_equal(counts, expected)
+    np.testing.assert_allclose((lat, lon), cell_centers(cells, zoom))
+    rows = index.query_bbox(40.72, -74.0, 40.78, -73.95)
+    assert index.heatmap(zoom, rows)[2].sum() == len(rows)
@@ -0,0 +1,78 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning_script import SUMMARY_NUMERIC_COLUMNS, TrainDataCleaner
+from summary_stats import SUMMARY_QUANTILE_ACCURACY, SummaryStats
+from synthetic_trips import write_synthetic_trips
+
+NUMERIC_COLUMNS = ['trip_duration', 'passenger_count', 'pickup_longitude', 'pickup_latitude', 'trip_distance_km']
+
+
+def trip_frame(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'trip_duration': rng.integers(60, 5000, n),
+        'passenger_count': rng.integers(1, 7, n),
+        'pickup_longitude': rng.normal(-73.97, 0.03, n),
+        'pickup_latitude': rng.normal(40.75, 0.02, n),
+        'trip_distance_km': rng.lognormal(0.7, 0.8, n),
+        'vendor_id': rng.choice([1, 2], n),
+        'store_and_fwd_flag': rng.choice(['N', 'Y'], n, p=[0.99, 0.01]),
+        'pickup_datetime': pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 10**7, n), unit='s'),
+    })
+    df.loc[rng.random(n) < 0.01, 'trip_distance_km'] = np.nan
+    return df
+
+
+def summary_of(chunks):
+    summary = SummaryStats(NUMERIC_COLUMNS, ['vendor_id', 'store_and_fwd_flag'], ['pickup_datetime'])
+    for chunk in chunks:
+        summary.merge(SummaryStats(NUMERIC_COLUMNS, ['vendor_id', 'store_and_fwd_flag'],
+                                   ['pickup_datetime']).update(chunk))
+    return summary
+
+
+def assert_matches_describe(summary, df, columns):
+    expected = df[columns].describe()
+    actual = summary.describe(columns)
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    pd.testing.assert_frame_equal(actual.loc[exact], expected.loc[exact], rtol=1e-9)
+    # Quartiles: exact for integer columns, within the sketch accuracy for float columns
+    quartiles = ['25%', '50%', '75%']
+    tolerance = SUMMARY_QUANTILE_ACCURACY * expected.loc[quartiles].abs()
+    assert ((actual.loc[quartiles] - expected.loc[quartiles]).abs() <= tolerance + 1e-12).all().all()
+
+
+@pytest.mark.parametrize('n_chunks', [1, 7, 40])
+def test_merged_chunks_match_describe(n_chunks):
+    df = trip_frame()
+    summary = summary_of(df.iloc[rows] for rows in np.array_split(np.arange(len(df)), n_chunks))
+    assert len(summary) == len(df)
+    assert_matches_describe(summary, df, NUMERIC_COLUMNS)
+    for col in ['vendor_id', 'store_and_fwd_flag']:
+        pd.testing.assert_series_equal(summary.frequencies(col), df[col].value_counts(), check_index_type=False)
+    assert summary.datetime_range('pickup_datetime') == (df['pickup_datetime'].min(), df['pickup_datetime'].max())
+
+
+def test_merge_with_empty_and_all_missing_chunks():
+    df = trip_frame(5000)
+    empty = df.iloc[:0]
+    missing = df.iloc[:10].assign(trip_distance_km=np.nan)
+    summary = summary_of([empty, df.iloc[:2500], missing.iloc[:0], df.iloc[2500:], empty])
+    assert_matches_describe(summary, df, NUMERIC_COLUMNS)
+    assert summary_of([empty]).describe(NUMERIC_COLUMNS).loc['count'].eq(0).all()
+
+
+def test_streamed_summary_matches_written_output(tmp_path):
+    # clean_in_chunks accumulates the summary chunk by chunk; it describes the rows it wrote
+    source = write_synthetic_trips(str(tmp_path / 'train.csv'), 12_000, seed=4)
+    cleaner = TrainDataCleaner(source)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaner.clean_in_chunks(str(tmp_path / 'out' / 'train_cleaned.csv'), chunksize=2500)
+    written = pd.read_csv(cleaner.written_path)
+    assert len(cleaner.summary) == len(written) == cleaner.rows_written
+    assert_matches_describe(cleaner.summary, written, list(SUMMARY_NUMERIC_COLUMNS))
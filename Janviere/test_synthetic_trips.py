@@ -0,0 +1,49 @@
+import filecmp
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic_trips import TRIP_COLUMNS, synthetic_trip_chunks, write_synthetic_trips
+
+
+def trips(n_rows, **options):
+    return pd.concat(synthetic_trip_chunks(n_rows, **options), ignore_index=True)
+
+
+def test_same_seed_gives_the_same_trips():
+    options = dict(seed=3, chunk_rows=700, duplicate_rate=0.05, outlier_rate=0.05, missing_rate=0.05)
+    first = trips(2000, **options)
+    pd.testing.assert_frame_equal(first, trips(2000, **options))
+    assert not first.equals(trips(2000, **dict(options, seed=4)))
+    assert list(first.columns) == TRIP_COLUMNS and len(first) == 2000
+
+
+def test_chunks_do_not_depend_on_the_row_count():
+    # Each chunk has its own random stream, so a longer file starts with the shorter one
+    short = trips(1500, seed=1, chunk_rows=500)
+    long = trips(3200, seed=1, chunk_rows=500)
+    pd.testing.assert_frame_equal(long.iloc[:1500], short)
+
+
+def test_timestamps_follow_the_durations():
+    df = trips(3000, seed=2, chunk_rows=1000, outlier_rate=0.05, duplicate_rate=0)
+    assert df['id'].tolist() == [f'id{row:07d}' for row in range(3000)]
+    np.testing.assert_array_equal((df['dropoff_datetime'] - df['pickup_datetime']).dt.total_seconds(),
+                                  df['trip_duration'])
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet'])
+def test_written_files_are_reproducible(tmp_path, output_format):
+    paths = [write_synthetic_trips(str(tmp_path / f'{name}.csv'), 1200, seed=5, output_format=output_format,
+                                   chunk_rows=500)
+             for name in ('first', 'second')]
+    if output_format == 'csv':
+        assert filecmp.cmp(*paths, shallow=False)
+    else:
+        pd.testing.assert_frame_equal(*(pd.read_parquet(path) for path in paths))
+
+
+def test_rates_must_be_fractions():
+    with pytest.raises(ValueError):
+        trips(10, duplicate_rate=1.5)
@@ -0,0 +1,109 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from timestamps import _arrow_string_bytes, calendar_features, epoch_seconds, parse_timestamps
+
+
+def trip_timestamps(n=5000, seed=0, start='2016-01-01'):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, 366 * 86400, n), unit='s')
+    return pd.Series(times.strftime('%Y-%m-%d %H:%M:%S'), dtype=object)
+
+
+def assert_matches_pandas(values, fast_path=True):
+    values = pd.Series(values)
+    assert (epoch_seconds(values) is not None) == fast_path
+    try:
+        expected = pd.to_datetime(values)
+    except (ValueError, pd.errors.OutOfBoundsDatetime) as error:
+        # Values pandas rejects raise the same error
+        with pytest.raises(type(error), match=re.escape(str(error))):
+            parse_timestamps(values)
+    else:
+        pd.testing.assert_series_equal(parse_timestamps(values), expected)
+
+
+def test_trip_timestamps_match_pandas():
+    # 2016 is a leap year, so Feb 29 is in here
+    assert_matches_pandas(trip_timestamps())
+
+
+@pytest.mark.parametrize('value', ['2016-02-29 12:00:00', '2000-02-29 00:00:00', '2016-12-31 23:59:59',
+                                   '1969-12-31 23:59:59', '1970-01-01 00:00:00'])
+def test_leap_days_and_boundaries_match_pandas(value):
+    assert_matches_pandas(pd.Series([value, '2016-03-01 00:00:00'] * 3))
+
+
+@pytest.mark.parametrize('value', ['2016-02-30 12:00:00', '2015-02-29 12:00:00', '1900-02-29 00:00:00',
+                                   '2016-04-31 00:00:00', '2016-01-01 24:00:00', '2016-13-01 00:00:00',
+                                   '2016-00-10 00:00:00', '2016-01-01 12:60:00', '2016-01-01 12:00:99'])
+def test_invalid_dates_take_the_generic_path(value):
+    values = pd.Series(['2016-02-29 12:00:00', value, '2016-03-01 00:00:00'])
+    assert epoch_seconds(values) is None
+    with pytest.raises((ValueError, pd.errors.OutOfBoundsDatetime)):
+        pd.to_datetime(values)
+    assert_matches_pandas(values, fast_path=False)
+
+
+@pytest.mark.parametrize('value', ['2016-01-01 12:00:60', '2016-01-01 12:00:61'])
+def test_overflowing_seconds_are_left_to_pandas(value):
+    # pandas rolls seconds 60 and 61 over into the next minute; the fast path defers to it
+    assert_matches_pandas(pd.Series(['2016-02-29 12:00:00', value]), fast_path=False)
+
+
+@pytest.mark.parametrize('missing', [None, np.nan])
+@pytest.mark.parametrize('dtype', [object, 'str'])
+def test_missing_values_match_pandas(missing, dtype):
+    values = trip_timestamps(200).astype(dtype)
+    values.iloc[[0, 17, 199]] = missing
+    assert_matches_pandas(values, fast_path=False)
+    assert parse_timestamps(values).isna().sum() == 3
+
+
+def test_all_missing_matches_pandas():
+    assert_matches_pandas(pd.Series([None, np.nan], dtype=object), fast_path=False)
+
+
+@pytest.mark.parametrize('odd', ['2016-01-01T00:00:00', '2016-1-1 0:00:00', '2016-01-01 00:00',
+                                 '2016-01-01 00:00:00.5', '01/02/2016 00:00:00', '2016-01-01  0:00:00'])
+def test_mixed_layouts_fall_back(odd):
+    # The odd value is missed by the layout sample but caught by the full fixed-width check
+    values = trip_timestamps(1000)
+    values.iloc[501] = odd
+    assert_matches_pandas(values, fast_path=False)
+
+
+@pytest.mark.parametrize('dtype', ['str', 'string[pyarrow]', pd.ArrowDtype(pa.string()),
+                                   pd.ArrowDtype(pa.large_string())])
+def test_arrow_strings_are_read_from_their_buffers(dtype):
+    values = trip_timestamps().astype(dtype)
+    assert _arrow_string_bytes(values) is not None
+    assert_matches_pandas(values)
+
+
+def test_chunked_and_sliced_arrow_strings():
+    strings = trip_timestamps(3000).tolist()
+    chunked = pa.chunked_array([pa.array(strings[:1000]), pa.array([], pa.string()), pa.array(strings[1000:])])
+    values = pd.Series(pd.arrays.ArrowExtensionArray(chunked))
+    assert_matches_pandas(values)
+    # A slice starts partway into the offsets buffer
+    assert_matches_pandas(values.iloc[777:2222])
+    assert_matches_pandas(pd.Series(strings, dtype='str').iloc[333:1500])
+
+
+def test_index_and_name_are_kept():
+    values = trip_timestamps(50)
+    values.index, values.name = np.arange(100, 150), 'pickup_datetime'
+    assert_matches_pandas(values)
+
+
+def test_calendar_features_match_pandas():
+    timestamps = parse_timestamps(trip_timestamps())
+    features = calendar_features(timestamps)
+    np.testing.assert_array_equal(features['hour'], timestamps.dt.hour)
+    np.testing.assert_array_equal(features['month'], timestamps.dt.month)
+    np.testing.assert_array_equal(features['day_name'], timestamps.dt.day_name())
@@ -0,0 +1,168 @@
+import json
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sort_index import build_sort_index
+from table_writer import TableWriter
+from trip_query_api import TripQueryService, TripStore, parse_filters, read_cleaned_data
+
+ENDPOINTS = ['/api/trips', '/api/trips/summary', '/api/trips/time-distribution',
+             '/api/trips/duration-histogram', '/api/trips/pickup-heatmap']
+
+
+def trip_frame(n=2000, seed=0, zones=False, fares=False):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'pickup_datetime': pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 30 * 86400, n), unit='s'),
+        'trip_duration': rng.integers(60, 3600, n),
+        'trip_distance_km': rng.lognormal(0.7, 0.8, n),
+        'pickup_longitude': rng.uniform(-74.02, -73.93, n),
+        'pickup_latitude': rng.uniform(40.70, 40.80, n),
+        'dropoff_longitude': rng.uniform(-74.02, -73.93, n),
+        'dropoff_latitude': rng.uniform(40.70, 40.80, n),
+    })
+    if fares:
+        df['fare_amount'] = (2.5 + 1.56 * df['trip_distance_km'] + rng.normal(0, 1, n)).round(2)
+    if zones:
+        df['pickup_zone'] = rng.choice(['Midtown', 'SoHo', 'Harlem'], n)
+        df['dropoff_zone'] = rng.choice(['Midtown', 'SoHo', 'Harlem'], n)
+    return df
+
+
+def get(service, path, query=''):
+    status, headers, body = service.handle(path, query)
+    return status, headers, json.loads(json.dumps(body))
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_zone_and_fare_are_ignored_without_their_columns(path):
+    service = TripQueryService(TripStore.from_frame(trip_frame()))
+    status, headers, body = get(service, path, 'zone=Midtown&fare=10&hour=8')
+    assert status == HTTPStatus.OK
+    assert headers['X-Unavailable-Filters'] == 'fare,zone'
+    assert body == get(service, path, 'hour=8')[2]
+
+
+def test_fares_are_not_made_up():
+    # The training data has no fares: the table shows none and can't be sorted by them
+    service = TripQueryService(TripStore.from_frame(trip_frame()))
+    status, _, body = get(service, '/api/trips', 'page_size=5')
+    assert status == HTTPStatus.OK
+    assert [trip['fare'] for trip in body] == [None] * 5
+    assert get(service, '/api/trips', 'sort=fare')[0] == HTTPStatus.BAD_REQUEST
+    assert 'fare_amount' not in build_sort_index(trip_frame())
+
+
+def test_fare_filters_with_fare_column():
+    df = trip_frame(fares=True)
+    service = TripQueryService(TripStore.from_frame(df))
+    status, headers, body = get(service, '/api/trips/summary', 'fare=10')
+    assert status == HTTPStatus.OK
+    assert headers['X-Unavailable-Filters'] == 'zone'
+    assert body['total_trips'] == (df['fare_amount'].astype(np.float32) <= 10).sum()
+
+
+def test_zone_filters_with_zone_columns():
+    df = trip_frame(zones=True, fares=True)
+    service = TripQueryService(TripStore.from_frame(df))
+    status, headers, body = get(service, '/api/trips/summary', 'zone=midtown')
+    assert status == HTTPStatus.OK
+    assert 'X-Unavailable-Filters' not in headers
+    expected = ((df['pickup_zone'] == 'Midtown') | (df['dropoff_zone'] == 'Midtown')).sum()
+    assert body['total_trips'] == expected
+
+
+def sorted_store(df):
+    store = TripStore.from_frame(df)
+    assert store.attach_sort_index(build_sort_index(df))
+    return store
+
+
+@pytest.mark.parametrize('count', ['1', '0'])
+@pytest.mark.parametrize('sort', ['duration', '-distance', 'fare'])
+def test_sorted_pages_match_a_full_sort(sort, count):
+    df = trip_frame(5000, fares=True)
+    service = TripQueryService(sorted_store(df))
+    query = f'sort={sort}&hour=8&page_size=20&count={count}'
+    status, headers, first_page = get(service, '/api/trips', query + '&page=1')
+    assert status == HTTPStatus.OK
+    hour = pd.to_datetime(df['pickup_datetime']).dt.hour == 8
+    if count == '1':
+        assert headers['X-Total-Count'] == str(hour.sum())
+    else:
+        assert 'X-Total-Count' not in headers
+    column = {'duration': 'duration_sec', 'distance': 'distance_km', 'fare': 'fare'}[sort.lstrip('-')]
+    pages = first_page + get(service, '/api/trips', query + '&page=2')[2]
+    values = [trip[column] for trip in pages]
+    assert values == sorted(values, reverse=sort.startswith('-'))
+    everything = get(service, '/api/trips', f'sort={sort}&hour=8&page_size=1000')[2]
+    assert values == [trip[column] for trip in everything][:40]
+
+
+@pytest.mark.parametrize('indexed', [True, False])
+@pytest.mark.parametrize('sort', ['duration', '-duration', 'distance', '-fare'])
+@pytest.mark.parametrize('query', ['', 'hour=8', 'distance=40'])
+def test_top_k_pages_match_a_stable_full_sort(indexed, sort, query):
+    # Durations are whole seconds, so there are many ties: equal keys come in pickup order
+    # (newest first when descending), with or without the sort index
+    df = trip_frame(5000, fares=True)
+    df.loc[df.sample(50, random_state=0).index, 'trip_distance_km'] = np.nan
+    store = sorted_store(df) if indexed else TripStore.from_frame(df)
+    service = TripQueryService(store)
+    field = {'duration': 'trip_duration', 'distance': 'trip_distance_km', 'fare': 'fare_amount'}[sort.lstrip('-')]
+    rows = store.select(parse_filters(parse_qs(query)))
+    keys = store.columns[field][rows]
+    descending = sort.startswith('-')
+    valid, missing = rows[~np.isnan(keys)], rows[np.isnan(keys)]
+    ordered = valid[np.argsort(store.columns[field][valid], kind='stable')]
+    expected = np.concatenate([ordered[::-1], missing[::-1]] if descending else [ordered, missing])
+    for page in (1, 3):
+        body = get(service, '/api/trips', f'{query}&sort={sort}&page={page}&page_size=25')[2]
+        positions = expected[(page - 1) * 25:page * 25]
+        assert [trip['pickup_datetime'] for trip in body] == [
+            time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts)) for ts in store.columns['pickup_ts'][positions]]
+        assert [trip['duration_sec'] for trip in body] == store.columns['trip_duration'][positions].round(1).tolist()
+
+
+def test_total_is_counted_once_per_filters(monkeypatch):
+    # A filter most trips pass: pages come from a walk of the sort index, so after the first
+    # page's count no request scans the whole date range
+    store = sorted_store(trip_frame(5000))
+    service = TripQueryService(store)
+    scans = []
+    mask = store._mask
+    monkeypatch.setattr(store, '_mask', lambda filters, positions, *args, **kwargs: (
+        scans.append(isinstance(positions, slice)) or mask(filters, positions, *args, **kwargs)))
+    totals = []
+    for page in (1, 2, 3):
+        scans.clear()
+        headers = get(service, '/api/trips', f'sort=duration&distance=40&page={page}')[1]
+        totals.append(headers['X-Total-Count'])
+        assert scans.count(True) == (1 if page == 1 else 0)
+    assert len(set(totals)) == 1
+    # count=0 skips the first count as well
+    scans.clear()
+    headers = get(service, '/api/trips', 'sort=duration&distance=30&count=0')[1]
+    assert 'X-Total-Count' not in headers and scans.count(True) == 0
+
+
+@pytest.mark.parametrize('output_format, partition_cols', [('parquet', None), ('feather', None),
+                                                          ('parquet', ['pickup_month'])])
+def test_read_cleaned_data_keeps_categoricals(tmp_path, output_format, partition_cols):
+    rng = np.random.default_rng(0)
+    df = trip_frame(500).assign(
+        vendor_id=pd.Categorical(rng.choice([1.0, 2.0], 500)),
+        store_and_fwd_flag=pd.Categorical(rng.choice(['N', 'Y'], 500)),
+        trip_duration_category=pd.Categorical(rng.choice(['Short', 'Long'], 500), categories=['Short', 'Long'],
+                                              ordered=True),
+        pickup_month=1,
+    )
+    path = TableWriter(output_format, partition_cols=partition_cols).write(df, str(tmp_path / 'train_cleaned.csv'))
+    columns = ['vendor_id', 'store_and_fwd_flag', 'trip_duration_category', 'trip_duration']
+    back = read_cleaned_data(path, columns)
+    pd.testing.assert_frame_equal(back[columns], df[columns])
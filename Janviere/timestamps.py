@@ -0,0 +1,233 @@
+"""
+Fast parsing and calendar features for the trip timestamps.
+
+The trip files write every timestamp as 'YYYY-MM-DD HH:MM:SS' (TIMESTAMP_LAYOUT).
+parse_timestamps checks a sample for that layout and parses matching columns on a
+fixed-width fast path. The strings are viewed as one block of 19-byte records, the
+digits are turned into integers, and a days-from-civil formula gives int64 epoch
+seconds with no per-row format inference or strptime. Arrow-backed string columns
+are read straight from their data buffer. A column that is off the layout anywhere,
+or holds an impossible date, goes through pd.to_datetime as before, so errors and
+results are the same as the generic path.
+
+calendar_features derives hour, month and day name from the epoch seconds. Hour is
+integer arithmetic. Month and day name come from a DayCalendar: lookup tables over
+the contiguous range of day numbers seen so far, shared across calls. A few months
+of trips only touch a couple of hundred distinct days, so each is worked out once.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_LAYOUT = '%Y-%m-%d %H:%M:%S'
+TIMESTAMP_LENGTH = 19
+DIGIT_POSITIONS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+SEPARATORS = {4: b'-', 7: b'-', 10: b' ', 13: b':', 16: b':'}
+SAMPLE_SIZE = 100
+MAX_CALENDAR_DAYS = 100_000        # larger day ranges are looked up per distinct day instead
+_LAYOUT_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int32)
+
+
+def has_fixed_layout(values, sample_size=SAMPLE_SIZE):
+    # Whether an evenly spaced sample of the (non-null) strings matches TIMESTAMP_LAYOUT
+    values = pd.Series(values).dropna()
+    if len(values) == 0:
+        return False
+    sample = values.iloc[np.linspace(0, len(values) - 1, min(sample_size, len(values))).astype(np.int64)]
+    return all(isinstance(value, str) and _LAYOUT_PATTERN.fullmatch(value) for value in sample)
+
+
+def _arrow_string_bytes(values):
+    # Arrow-backed strings whose offsets all step by 19: the data buffers already are the
+    # fixed-width block (no per-string copies). None for anything else.
+    arrow = getattr(values.array, '__arrow_array__', None)
+    if arrow is None:
+        return None
+    try:
+        import pyarrow as pa
+        chunks = pa.chunked_array(arrow()).chunks
+    except (ImportError, TypeError, ValueError):
+        return None
+    blocks = []
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        if pa.types.is_large_string(chunk.type):
+            offset_type = np.int64
+        elif pa.types.is_string(chunk.type):
+            offset_type = np.int32
+        else:
+            return None
+        offsets = np.frombuffer(chunk.buffers()[1], dtype=offset_type)[chunk.offset:chunk.offset + len(chunk) + 1]
+        if not (np.diff(offsets) == TIMESTAMP_LENGTH).all():
+            return None
+        blocks.append(np.frombuffer(chunk.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]])
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=np.uint8)
+
+
+def _fixed_width_bytes(values):
+    # (n, 19) uint8 view of the strings, or None if they are not all 19 ASCII bytes
+    values = pd.Series(values)
+    if values.isna().any():
+        return None
+    raw = _arrow_string_bytes(values)
+    if raw is None:
+        try:
+            raw = np.frombuffer(''.join(values.to_numpy(dtype=object)).encode('ascii'), dtype=np.uint8)
+        except (TypeError, UnicodeEncodeError):
+            return None
+    if len(raw) != len(values) * TIMESTAMP_LENGTH:
+        return None
+    return raw.reshape(-1, TIMESTAMP_LENGTH)
+
+
+def days_from_civil(year, month, day):
+    # Days since 1970-01-01 for proleptic Gregorian dates (vectorized, H. Hinnant's algorithm)
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era.astype(np.int64) * 146097 + day_of_era - 719468
+
+
+def _month_lengths(year, month):
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return _DAYS_IN_MONTH[month - 1] + ((month == 2) & leap)
+
+
+def _epoch_days(year, month, day):
+    # Day numbers for validated digit fields, or None for an impossible date such as Feb 30.
+    # Dates repeat heavily, so every date in the span is resolved once through a small table
+    # indexed by (year * 12 + month - 1) * 31 + day - 1.
+    keys = (year * 12 + (month - 1)) * 31 + (day - 1)
+    low, high = int(keys.min()), int(keys.max())
+    if high - low < MAX_CALENDAR_DAYS:
+        span = np.arange(low, high + 1)
+        span_year, span_month, span_day = span // 372, span // 31 % 12 + 1, span % 31 + 1
+        table = np.where(span_day <= _month_lengths(span_year, span_month),
+                         days_from_civil(span_year, span_month, span_day), np.iinfo(np.int64).min)
+        days = table[keys - low]
+        return None if (days == np.iinfo(np.int64).min).any() else days
+    if not (day <= _month_lengths(year, month)).all():
+        return None
+    return days_from_civil(year, month, day)
+
+
+def epoch_seconds(values):
+    # int64 seconds since the epoch for strings in TIMESTAMP_LAYOUT, or None when any row is off
+    # the layout or out of range (callers fall back to pd.to_datetime)
+    raw = _fixed_width_bytes(values)
+    if raw is None:
+        return None
+    for position, separator in SEPARATORS.items():
+        if not (raw[:, position] == separator[0]).all():
+            return None
+    # One contiguous row per digit position; non-digits wrap around to values above 9
+    digits = raw.T[DIGIT_POSITIONS] - np.uint8(48)
+    if (digits > 9).any():
+        return None
+    digits = digits.astype(np.int32)
+
+    def number(first, width):
+        value = digits[first]
+        for i in range(first + 1, first + width):
+            value = value * 10 + digits[i]
+        return value
+
+    year, month, day = number(0, 4), number(4, 2), number(6, 2)
+    hour, minute, second = number(8, 2), number(10, 2), number(12, 2)
+    # Unsigned comparisons check both ends of each range at once
+    if not (((month - 1).view(np.uint32) < 12).all() and ((day - 1).view(np.uint32) < 31).all()
+            and (hour < 24).all() and (minute < 60).all() and (second < 60).all()):
+        return None
+    days = _epoch_days(year, month, day)
+    if days is None:
+        return None
+    return days * 86400 + (hour * 3600 + minute * 60 + second)
+
+
+def parse_timestamps(values):
+    # Timestamp strings -> datetime64 Series (same dtype and values as pd.to_datetime), fast path
+    # for TIMESTAMP_LAYOUT; datetime columns are returned unchanged
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    if has_fixed_layout(values):
+        seconds = epoch_seconds(values)
+        if seconds is not None and len(seconds) > 0:
+            # Use the unit pandas picks for these strings; out-of-range values take the generic path
+            dtype = pd.to_datetime(values.iloc[:1]).dtype
+            per_second = np.timedelta64(1, 's') // np.timedelta64(1, np.datetime_data(dtype)[0])
+            if (np.abs(seconds) < np.iinfo(np.int64).max // per_second).all():
+                return pd.Series(seconds.astype('datetime64[s]').astype(dtype), index=values.index, name=values.name)
+    return pd.to_datetime(values)
+
+
+class DayCalendar:
+    # Month/day-name lookup tables over a contiguous range of day numbers (days since the epoch)
+    def __init__(self, max_days=MAX_CALENDAR_DAYS):
+        self.max_days = max_days
+        self._table = None      # (first day, months, day names), replaced as a whole when the range grows
+
+    def __len__(self):
+        return 0 if self._table is None else len(self._table[1])
+
+    def lookup(self, days):
+        # (months as int32, day names) for an int64 array of day numbers
+        days = np.asarray(days, dtype=np.int64)
+        if len(days) == 0:
+            return np.empty(0, dtype=np.int32), self._names(pd.DatetimeIndex([], dtype='datetime64[s]'))
+        table = self._table
+        low, high = int(days.min()), int(days.max())
+        if table is not None:
+            low, high = min(low, table[0]), max(high, table[0] + len(table[1]) - 1)
+        if high - low + 1 > self.max_days:
+            # Too sparse for a table: work out each distinct day once
+            unique_days, inverse = np.unique(days, return_inverse=True)
+            dates = self._dates(unique_days)
+            return dates.month.to_numpy(dtype=np.int32)[inverse], self._names(dates).take(inverse)
+        if table is None or table[0] != low or len(table[1]) != high - low + 1:
+            dates = self._dates(np.arange(low, high + 1))
+            table = (low, dates.month.to_numpy(dtype=np.int32), self._names(dates))
+            self._table = table
+        first_day, months, day_names = table
+        positions = days - first_day
+        return months[positions], day_names.take(positions)
+
+    @staticmethod
+    def _dates(days):
+        return pd.DatetimeIndex(np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[s]'))
+
+    @staticmethod
+    def _names(dates):
+        # Day names with the dtype pandas' dt.day_name() gives
+        return pd.Series(dates).dt.day_name().array
+
+
+CALENDAR = DayCalendar()
+
+
+def datetime_seconds(timestamps):
+    # int64 seconds since the epoch for a datetime64 Series or array without NaT
+    return np.asarray(timestamps).astype('datetime64[s]').astype(np.int64)
+
+
+def calendar_features(timestamps, calendar=None):
+    # {'day_name', 'hour', 'month'} for a datetime64 Series, matching dt.day_name()/dt.hour/dt.month
+    timestamps = pd.Series(timestamps)
+    if timestamps.isna().any() or getattr(timestamps.dtype, 'tz', None) is not None:
+        return {'day_name': timestamps.dt.day_name(), 'hour': timestamps.dt.hour, 'month': timestamps.dt.month}
+    calendar = calendar if calendar is not None else CALENDAR
+    seconds = datetime_seconds(timestamps)
+    days = seconds // 86400
+    months, day_names = calendar.lookup(days)
+    index = timestamps.index
+    return {
+        'day_name': pd.Series(day_names, index=index),
+        'hour': pd.Series(((seconds - days * 86400) // 3600).astype(np.int32), index=index),
+        'month': pd.Series(months, index=index),
+    }
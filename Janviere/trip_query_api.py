@@ -0,0 +1,754 @@
+"""
+Local trip-query API for the dashboard (frontend/js/main.js).
+
+The cleaned dataset written by TrainDataCleaner.save_cleaned_data (CSV, Parquet,
+Feather, a partitioned Parquet directory or a columnar store) is loaded once into a TripStore: one
+NumPy array per column, sorted by pickup time. Every request is answered from those
+arrays, so nothing is re-read from disk:
+- a date filter is a binary search on the sorted pickup times (a slice, no scan)
+- the other filters are vectorized masks over that slice
+- sorted table pages walk the presorted index written after cleaning (sort_index) until
+  the page is full, or use argpartition for the requested page when there is no index or
+  the filters match too few trips for a walk to pay off (no full sort either way)
+
+Endpoints (GET, JSON):
+    /api/trips                       paginated trip table (?sort=, ?page=, ?page_size=, ?count=0)
+    /api/trips/summary               total trips, average duration, busiest hour
+    /api/trips/time-distribution     trips per pickup hour
+    /api/trips/duration-histogram    trips per 5-minute duration bin
+    /api/trips/pickup-heatmap        trip counts per grid cell (?zoom=, ?side=pickup|dropoff)
+
+Filters (all optional): date=YYYY-MM-DD, hour=0-23, distance=<max km>, fare=<max $>,
+zone=<name>, bbox=min_lon,min_lat,max_lon,max_lat and near=lat,lon,radius_km on pickups
+(dropoff_bbox/dropoff_near on dropoffs), answered by the spatial grid index.
+fare needs a fare_amount column and zone pickup_zone/dropoff_zone columns in the cleaned
+data (the training data has neither). A filter the data can't answer is ignored and every
+response lists it in an X-Unavailable-Filters header; trips then have fare null and
+sort=fare is rejected.
+When the cleaning run wrote a RollupCube (trip_rollups.csv), summary, time-distribution
+and histogram queries are answered from its cells whenever the filters allow it.
+
+Usage:
+    python trip_query_api.py --data ../processed/train_cleaned.csv --port 8000
+The dashboard (index.html and frontend/) is served from the same port.
+The table's X-Total-Count header is counted once per set of filters and remembered with
+the loaded data, so later pages don't rescan; with ?count=0 a sorted page skips the count
+when it is not known yet, and the header is left out.
+Responses are cached per normalized request (query_cache, --cache-mb; hit rates at
+/api/cache/stats). The data is reloaded and the cache dropped when a new output version
+is written next to the data (train_cleaned.version.json); a sort index for that version
+(train_cleaned.sort_index.npz) is picked up when it appears.
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import threading
+import time
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from rollup_cube import DURATION_BIN_COUNT, ROLLUP_FILE, RollupCube, duration_bin_labels, duration_bins
+from columnar_store import ColumnarStore, is_columnar_store
+from query_cache import QueryCache
+from sort_index import SortIndex, sort_index_path_for, trip_sort_keys
+from spatial_index import HEATMAP_ZOOMS, MAX_ZOOM, SpatialGridIndex
+from table_writer import read_output_version
+
+STORE_COLUMNS = ['pickup_datetime', 'trip_duration', 'trip_distance_km',
+                 'pickup_longitude', 'pickup_latitude', 'dropoff_longitude', 'dropoff_latitude']
+OPTIONAL_COLUMNS = ['fare_amount', 'pickup_zone', 'dropoff_zone', 'pickup_cell', 'dropoff_cell']
+
+# sort=<name> (or -<name> for descending) -> store column; names match the table's data-sort attributes
+SORT_FIELDS = {
+    'pickup': 'pickup_ts', 'pickup_datetime': 'pickup_ts',
+    'dropoff': 'dropoff_ts', 'dropoff_datetime': 'dropoff_ts',
+    'duration': 'trip_duration', 'duration_sec': 'trip_duration', 'trip_duration': 'trip_duration',
+    'distance': 'trip_distance_km', 'distance_km': 'trip_distance_km', 'trip_distance_km': 'trip_distance_km',
+    'fare': 'fare_amount', 'fare_amount': 'fare_amount',
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+HEATMAP_DEFAULT_ZOOM = 14
+HEATMAP_MAX_CELLS = 5000
+SPATIAL_FILTERS = ['bbox', 'near', 'dropoff_bbox', 'dropoff_near']
+MAX_REMEMBERED_COUNTS = 1024     # match counts kept per loaded dataset (one per set of filters)
+
+
+def read_cleaned_data(path, columns):
+    # Read only the columns the store needs from any save_cleaned_data output
+    if is_columnar_store(path):
+        # Memory-mapped columns, no parsing
+        store = ColumnarStore(path)
+        return store.to_frame([col for col in columns if col in store.columns])
+    if os.path.isdir(path) or path.endswith(('.parquet', '.feather')):
+        import pyarrow.dataset as ds
+        file_format = 'feather' if path.endswith('.feather') else 'parquet'
+        dataset = ds.dataset(path, format=file_format, partitioning='hive')
+        table = dataset.to_table(columns=[col for col in columns if col in dataset.schema.names])
+        return _restore_categoricals(table.to_pandas(), dataset.schema.pandas_metadata)
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, usecols=[col for col in columns if col in header])
+
+
+def _restore_categoricals(df, pandas_metadata):
+    # Parquet keeps dictionaries only for strings, so numeric categoricals such as vendor_id come
+    # back as plain numbers; the pandas metadata written with the file still names them
+    for entry in (pandas_metadata or {}).get('columns', []):
+        name = entry.get('name')
+        if entry.get('pandas_type') == 'categorical' and name in df.columns \
+                and not isinstance(df[name].dtype, pd.CategoricalDtype):
+            ordered = bool((entry.get('metadata') or {}).get('ordered', False))
+            df[name] = df[name].astype(pd.CategoricalDtype(ordered=ordered))
+    return df
+
+
+class TripStore:
+    def __init__(self, columns):
+        # columns: name -> NumPy array, all the same length and sorted by pickup_ts
+        self.columns = columns
+        self.size = len(columns['pickup_ts'])
+        # column -> (store positions in ascending key order, number of non-NaN keys);
+        # pickup order is the store order, the others come from a SortIndex (attach_sort_index)
+        self.sorted = {'pickup_ts': (np.arange(self.size), self.size)}
+        # Grid indexes over store positions (cell codes from cleaning are reused when present)
+        self.spatial = {
+            side: SpatialGridIndex(columns[f'{side}_latitude'], columns[f'{side}_longitude'],
+                                   columns.get(f'{side}_cell'))
+            for side in ['pickup', 'dropoff']
+        }
+        # Normalized filters -> number of matching trips, so paging doesn't recount
+        self._counts = {}
+        self._counts_lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        keys = trip_sort_keys(df)
+        order = np.argsort(keys['pickup_ts'], kind='stable')
+        duration = keys['trip_duration'][order]
+        distance = keys['trip_distance_km'][order]
+        pickup = keys['pickup_ts'][order]
+        columns = {
+            'pickup_ts': pickup,
+            'dropoff_ts': pickup + np.rint(duration).astype(np.int64),
+            'pickup_hour': ((pickup // 3600) % 24).astype(np.int8),
+            'trip_duration': duration,
+            'trip_distance_km': distance,
+            # Histogram bin per trip, computed once so the endpoint is a bincount
+            'duration_bin': duration_bins(duration),
+        }
+        for col in ['pickup_longitude', 'pickup_latitude', 'dropoff_longitude', 'dropoff_latitude']:
+            columns[col] = df[col].to_numpy(dtype=np.float32)[order]
+        for col in ['pickup_cell', 'dropoff_cell']:
+            if col in df.columns:
+                columns[col] = df[col].to_numpy(dtype=np.int64)[order]
+        if 'fare_amount' in keys:
+            columns['fare_amount'] = keys['fare_amount'][order]
+        for col in ['pickup_zone', 'dropoff_zone']:
+            if col in df.columns:
+                # Zones are dictionary-encoded so the filter compares small integers
+                codes, names = pd.factorize(df[col].astype('string').str.lower())
+                columns[col] = codes[order].astype(np.int32)
+                columns[col + '_names'] = np.asarray(names, dtype=object)
+        return cls(columns)
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_frame(read_cleaned_data(path, STORE_COLUMNS + OPTIONAL_COLUMNS))
+
+    def attach_sort_index(self, sort_index):
+        # Use a SortIndex of the loaded data for sorted pages; False if it doesn't fit the data
+        if sort_index.rows != self.size or 'pickup_ts' not in sort_index:
+            return False
+        # Output row -> store position (the index's pickup order is the store order)
+        positions = np.empty(self.size, dtype=sort_index.permutations['pickup_ts'].dtype)
+        positions[sort_index.permutations['pickup_ts']] = np.arange(self.size)
+        sorted_columns = {}
+        for column, rows_in_order in sort_index.permutations.items():
+            if column == 'pickup_ts' or column not in self.columns:
+                continue
+            in_order = positions[rows_in_order]
+            valid = sort_index.valid[column]
+            keys = self.columns[column][in_order[:valid]]
+            if not (keys[1:] >= keys[:-1]).all():
+                return False    # built from other data
+            sorted_columns[column] = (in_order, valid)
+        # One assignment, so queries running meanwhile see the old or the new set
+        self.sorted = dict(self.sorted, **sorted_columns)
+        return True
+
+    def select(self, filters):
+        # Row positions matching the filters (pickup-time order)
+        start, stop = self._date_range(filters)
+        mask = self._mask(filters, slice(start, stop))
+        if mask is None:
+            return np.arange(start, stop)
+        return start + np.flatnonzero(mask)
+
+    def count(self, filters):
+        # Number of trips matching the filters
+        total = self.known_count(filters)
+        if total is None:
+            start, stop = self._date_range(filters)
+            mask = self._mask(filters, slice(start, stop))
+            total = self.remember_count(filters, int(stop - start) if mask is None else int(np.count_nonzero(mask)))
+        return total
+
+    def known_count(self, filters):
+        # Number of matching trips if it costs no scan (no filters, or counted before), else None
+        if all(value is None for value in filters.values()):
+            return self.size
+        return self._counts.get(tuple(sorted(filters.items())))
+
+    def remember_count(self, filters, total):
+        with self._counts_lock:
+            if len(self._counts) >= MAX_REMEMBERED_COUNTS:
+                self._counts.pop(next(iter(self._counts)))
+            self._counts[tuple(sorted(filters.items()))] = total
+        return total
+
+    def sorted_page(self, field, descending, filters, offset, limit, with_total=True):
+        # (store positions of trips offset..offset+limit in field order, number of matching trips).
+        # Equal keys are in pickup order, reversed for descending; NaN keys come last either way.
+        # with_total=False skips counting when the count isn't known and a presorted walk can
+        # fill the page; the total is None then.
+        needed = offset + limit
+        filtered = any(value is not None for value in filters.values())
+        total = self.known_count(filters)
+        rows = None
+        if total is None and (with_total or field not in self.sorted):
+            # One scan gives both the count and the rows for argpartition
+            rows = self.select(filters)
+            total = self.remember_count(filters, len(rows))
+        if total == 0 or (total is not None and offset >= total):
+            return np.empty(0, dtype=np.int64), total
+        # A walk passes about needed * size / total positions; argpartition touches the total matches
+        if field in self.sorted and (total is None or needed * self.size < total * total):
+            return self._walk_sorted(field, descending, filters if filtered else None, offset, needed), total
+
+        rows = rows if rows is not None else self.select(filters)
+        keys = self.columns[field][rows]
+        if descending:
+            # Stable sort of the negated keys over reversed rows = the ascending order reversed
+            rows, keys = rows[::-1], -keys[::-1]
+        k = min(needed, len(rows))
+        kth = keys[np.argpartition(keys, k - 1)[k - 1]] if k < len(rows) else np.nan
+        if np.isnan(kth):
+            order = np.argsort(keys, kind='stable')
+        else:
+            # The keys below the k-th plus the first rows equal to it, so ties keep row order
+            head = keys < kth
+            head[np.flatnonzero(keys == kth)[:k - np.count_nonzero(head)]] = True
+            head = np.flatnonzero(head)
+            order = head[np.argsort(keys[head], kind='stable')]
+        return rows[order][offset:needed], total
+
+    def _walk_sorted(self, field, descending, filters, offset, needed):
+        # Walk the presorted positions in growing blocks, keeping matches until the page is full
+        in_order, valid = self.sorted[field]
+        segments = [in_order[:valid][::-1], in_order[valid:][::-1]] if descending else [in_order]
+        members = self._spatial_members(filters) if filters is not None else None
+        block = max(needed, 64)
+        found = []
+        count = 0
+        for segment in segments:
+            start = 0
+            while start < len(segment) and count < needed:
+                positions = segment[start:start + block]
+                if filters is not None:
+                    mask = self._mask(filters, positions, members, with_date=True)
+                    if mask is not None:
+                        positions = positions[mask]
+                found.append(positions)
+                count += len(positions)
+                start += block
+                block *= 2
+        return np.concatenate(found)[offset:needed] if found else np.empty(0, dtype=np.int64)
+
+    def _date_range(self, filters):
+        # Store positions [start, stop) of the date filter's day (pickup times are sorted)
+        if filters.get('date') is None:
+            return 0, self.size
+        day_start = (np.datetime64(filters['date'], 's') - np.datetime64(0, 's')).astype(np.int64)
+        start, stop = np.searchsorted(self.columns['pickup_ts'], [day_start, day_start + 86400])
+        return int(start), int(stop)
+
+    def _mask(self, filters, positions, members=None, with_date=False):
+        # AND of the filters at positions (a slice or an array of store positions); None when no
+        # filter applies. The date filter is left to the caller unless with_date.
+        # members: spatial filter name -> store-wide bool mask (see _spatial_members)
+        mask = None
+        def narrow(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        if with_date and filters.get('date') is not None:
+            day_start, day_stop = self._date_range({'date': filters['date']})
+            narrow((positions >= day_start) & (positions < day_stop))
+        if filters.get('hour') is not None:
+            narrow(self.columns['pickup_hour'][positions] == filters['hour'])
+        if filters.get('distance') is not None:
+            narrow(self.columns['trip_distance_km'][positions] <= filters['distance'])
+        if filters.get('fare') is not None:
+            narrow(self.columns['fare_amount'][positions] <= filters['fare'])
+        if filters.get('zone') is not None:
+            narrow(self._zone_mask(filters['zone'], positions))
+        members = members if members is not None else self._spatial_members(filters)
+        for name, member in members.items():
+            narrow(member[positions])
+        return mask
+
+    @property
+    def unavailable_filters(self):
+        # Filters the loaded data can't answer (ignored by the service)
+        unavailable = [] if 'fare_amount' in self.columns else ['fare']
+        if 'pickup_zone' not in self.columns and 'dropoff_zone' not in self.columns:
+            unavailable.append('zone')
+        return unavailable
+
+    def _zone_mask(self, zone, positions):
+        if 'zone' in self.unavailable_filters:
+            raise ValueError("zone filter needs pickup_zone/dropoff_zone columns in the cleaned data")
+        mask = np.zeros(len(self.columns['pickup_hour'][positions]), dtype=bool)
+        for col in ['pickup_zone', 'dropoff_zone']:
+            if col in self.columns:
+                matches = np.flatnonzero(self.columns[col + '_names'] == zone.lower())
+                if len(matches):
+                    mask |= self.columns[col][positions] == matches[0]
+        return mask
+
+    def _spatial_members(self, filters):
+        # Spatial filter name -> bool mask over all store positions, from the grid indexes
+        members = {}
+        for name in SPATIAL_FILTERS:
+            if filters.get(name) is None:
+                continue
+            side = 'dropoff' if name.startswith('dropoff') else 'pickup'
+            index = self.spatial[side]
+            if name.endswith('bbox'):
+                lon_min, lat_min, lon_max, lat_max = filters[name]
+                rows = index.query_bbox(lat_min, lon_min, lat_max, lon_max)
+            else:
+                lat, lon, radius_km = filters[name]
+                rows = index.query_radius(lat, lon, radius_km)
+            member = np.zeros(self.size, dtype=bool)
+            member[rows] = True
+            members[name] = member
+        return members
+
+    def column(self, name, rows):
+        return self.columns[name][rows]
+
+
+def parse_filters(params):
+    # Validate the dashboard's query parameters (ValueError -> 400)
+    def single(name):
+        values = params.get(name)
+        return values[-1] if values and values[-1] != '' else None
+
+    filters = {'date': None, 'hour': None, 'distance': None, 'fare': None, 'zone': single('zone'),
+               **{name: None for name in SPATIAL_FILTERS}}
+    if single('date') is not None:
+        try:
+            filters['date'] = date.fromisoformat(single('date')).isoformat()
+        except ValueError:
+            raise ValueError("date must be YYYY-MM-DD")
+    if single('hour') is not None:
+        hour = int(single('hour'))
+        if not 0 <= hour <= 23:
+            raise ValueError("hour must be between 0 and 23")
+        filters['hour'] = hour
+    for name in ['distance', 'fare']:
+        if single(name) is not None:
+            value = float(single(name))
+            if not np.isfinite(value) or value < 0:
+                raise ValueError(f"{name} must be a non-negative number")
+            filters[name] = value
+    for name in SPATIAL_FILTERS:
+        if single(name) is not None:
+            filters[name] = _parse_area(name, single(name))
+    return filters
+
+
+def _parse_area(name, value):
+    # bbox=min_lon,min_lat,max_lon,max_lat or near=lat,lon,radius_km
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if name.endswith('bbox'):
+        if len(numbers) != 4 or numbers[0] > numbers[2] or numbers[1] > numbers[3]:
+            raise ValueError(f"{name} must be min_lon,min_lat,max_lon,max_lat")
+    elif len(numbers) != 3 or numbers[2] < 0:
+        raise ValueError(f"{name} must be lat,lon,radius_km")
+    if not all(np.isfinite(numbers)):
+        raise ValueError(f"{name} must contain finite numbers")
+    return tuple(numbers)
+
+
+def parse_page(params):
+    page = int(params.get('page', ['1'])[-1] or 1)
+    page_size = int(params.get('page_size', [str(DEFAULT_PAGE_SIZE)])[-1] or DEFAULT_PAGE_SIZE)
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+    return page, page_size
+
+
+def _location(lat, lon):
+    return f"{lat:.5f}, {lon:.5f}"
+
+
+class TripQueryService:
+    def __init__(self, store, rollups=None):
+        self.store = store
+        # Optional RollupCube of the same data for summary/time-distribution/histogram queries
+        self.rollups = rollups
+        self.routes = {
+            '/api/trips': self.trips,
+            '/api/trips/summary': self.summary,
+            '/api/trips/time-distribution': self.time_distribution,
+            '/api/trips/duration-histogram': self.duration_histogram,
+            '/api/trips/pickup-heatmap': self.pickup_heatmap,
+        }
+
+    def handle(self, path, query_string):
+        # Synchronous request handler: (status, extra headers, JSON-serializable body)
+        route = self.routes.get(path.rstrip('/') or '/')
+        if route is None:
+            return HTTPStatus.NOT_FOUND, {}, {'error': f"unknown endpoint {path}"}
+        params = parse_qs(query_string, keep_blank_values=True)
+        # Filters the data can't answer are dropped, and listed so the dashboard can hide them
+        unavailable = self.store.unavailable_filters
+        for name in unavailable:
+            params.pop(name, None)
+        extra_headers = {'X-Unavailable-Filters': ','.join(unavailable)} if unavailable else {}
+        try:
+            status, headers, body = route(params)
+        except ValueError as e:
+            status, headers, body = HTTPStatus.BAD_REQUEST, {}, {'error': str(e)}
+        return status, dict(headers, **extra_headers), body
+
+    def _rollup_cells(self, filters):
+        # Precomputed cells answering these filters, or None to scan the trips
+        return self.rollups.cells_for(filters) if self.rollups is not None else None
+
+    def summary(self, params):
+        filters = parse_filters(params)
+        cells = self._rollup_cells(filters)
+        if cells is not None:
+            return HTTPStatus.OK, {}, RollupCube.summarize(cells)
+        rows = self.store.select(filters)
+        if len(rows) == 0:
+            return HTTPStatus.OK, {}, {'total_trips': 0, 'avg_duration_sec': None, 'busiest_hour': None}
+        hours = np.bincount(self.store.column('pickup_hour', rows), minlength=24)
+        return HTTPStatus.OK, {}, {
+            'total_trips': int(len(rows)),
+            'avg_duration_sec': round(float(self.store.column('trip_duration', rows).mean()), 1),
+            'busiest_hour': int(hours.argmax()),
+        }
+
+    def trips(self, params):
+        filters = parse_filters(params)
+        page, page_size = parse_page(params)
+        offset = (page - 1) * page_size
+        count = params.get('count', ['1'])[-1] or '1'
+        if count not in ('0', '1'):
+            raise ValueError("count must be 0 or 1")
+
+        sort = params.get('sort', [''])[-1]
+        if sort:
+            descending = sort.startswith('-')
+            field = SORT_FIELDS.get(sort.lstrip('-'))
+            if field is None:
+                raise ValueError(f"cannot sort by {sort.lstrip('-')}; use one of {sorted(set(SORT_FIELDS))}")
+            if field not in self.store.columns:
+                raise ValueError(f"cannot sort by {sort.lstrip('-')}: the data has no {field} column")
+            # Only the rows up to the end of the requested page are ordered (see TripStore.sorted_page)
+            page_rows, total = self.store.sorted_page(field, descending, filters, offset, page_size,
+                                                      with_total=count == '1')
+        else:
+            rows = self.store.select(filters)
+            total = self.store.remember_count(filters, len(rows))
+            page_rows = rows[offset:offset + page_size]
+        columns = {name: self.store.column(name, page_rows).tolist() for name in [
+            'pickup_latitude', 'pickup_longitude', 'dropoff_latitude', 'dropoff_longitude',
+            'pickup_ts', 'trip_duration', 'trip_distance_km', 'fare_amount'] if name in self.store.columns}
+        fares = [round(fare, 2) for fare in columns['fare_amount']] if 'fare_amount' in columns else \
+            [None] * len(page_rows)
+        body = [{
+            'pickup_location': _location(columns['pickup_latitude'][i], columns['pickup_longitude'][i]),
+            'dropoff_location': _location(columns['dropoff_latitude'][i], columns['dropoff_longitude'][i]),
+            'pickup_datetime': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(columns['pickup_ts'][i])),
+            'duration_sec': round(columns['trip_duration'][i], 1),
+            'distance_km': round(columns['trip_distance_km'][i], 2),
+            'fare': fares[i],
+        } for i in range(len(page_rows))]
+        # The body stays a plain array (what main.js renders); paging info goes in headers
+        headers = {'X-Page': str(page), 'X-Page-Size': str(page_size)}
+        if total is not None:
+            headers['X-Total-Count'] = str(total)
+        return HTTPStatus.OK, headers, body
+
+    def time_distribution(self, params):
+        filters = parse_filters(params)
+        cells = self._rollup_cells(filters)
+        if cells is not None:
+            counts = RollupCube.hourly_counts(cells)
+        else:
+            counts = np.bincount(self.store.column('pickup_hour', self.store.select(filters)), minlength=24)
+        return HTTPStatus.OK, {}, {'hours': list(range(24)), 'counts': counts.tolist()}
+
+    def duration_histogram(self, params):
+        filters = parse_filters(params)
+        cells = self._rollup_cells(filters)
+        if cells is not None:
+            counts = RollupCube.duration_histogram(cells)
+        else:
+            rows = self.store.select(filters)
+            counts = np.bincount(self.store.column('duration_bin', rows), minlength=DURATION_BIN_COUNT + 1)
+        return HTTPStatus.OK, {}, {'bins': duration_bin_labels(), 'counts': counts.tolist()}
+
+    def pickup_heatmap(self, params):
+        # Trip counts per grid cell (?zoom=, ?side=pickup|dropoff) instead of raw points;
+        # unfiltered requests at HEATMAP_ZOOMS come straight from the precomputed levels
+        filters = parse_filters(params)
+        zoom = int(params.get('zoom', [str(HEATMAP_DEFAULT_ZOOM)])[-1] or HEATMAP_DEFAULT_ZOOM)
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"zoom must be between 0 and {MAX_ZOOM}")
+        side = params.get('side', ['pickup'])[-1] or 'pickup'
+        if side not in self.store.spatial:
+            raise ValueError("side must be pickup or dropoff")
+
+        unfiltered = all(value is None for value in filters.values())
+        rows = None if unfiltered else self.store.select(filters)
+        lat, lon, counts = self.store.spatial[side].heatmap(zoom, rows)
+        total = int(counts.sum())
+        if len(counts) > HEATMAP_MAX_CELLS:
+            # Keep the densest cells
+            densest = np.sort(np.argpartition(counts, -HEATMAP_MAX_CELLS)[-HEATMAP_MAX_CELLS:])
+            lat, lon, counts = lat[densest], lon[densest], counts[densest]
+        locations = [{'x': round(x, 5), 'y': round(y, 5), 'count': count}
+                     for x, y, count in zip(lon.tolist(), lat.tolist(), counts.tolist())]
+        return HTTPStatus.OK, {}, {'locations': locations, 'zoom': zoom, 'total': total,
+                                   'available_zooms': HEATMAP_ZOOMS}
+
+
+def cache_key(path, params):
+    # Equivalent requests share a cache entry: filters are compared after parsing
+    # ('25' == '25.0', parameter order and blank parameters don't matter)
+    filters = parse_filters(params)
+    extra = tuple(sorted((name, values[-1]) for name, values in params.items()
+                         if name not in filters and values[-1] != ''))
+    return path.rstrip('/'), tuple(sorted(filters.items())), extra
+
+
+class TripDataSource:
+    # The cleaned data behind the API, reloaded when save_cleaned_data writes a new version
+    def __init__(self, data_path, rollup_path=None, check_interval=1.0):
+        self.data_path = data_path
+        self.rollup_path = rollup_path or os.path.join(os.path.dirname(os.path.abspath(data_path)), ROLLUP_FILE)
+        self.sort_index_path = sort_index_path_for(data_path)
+        self.check_interval = check_interval
+        self.version = None
+        self.service = None
+        self.sort_index_attached = False
+        self._sort_index_seen = None     # (size, mtime) of the last sort index file read
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current_version(self):
+        # Version id from the output's version marker (file size/mtime for outputs without one)
+        info = read_output_version(self.data_path)
+        if info is not None:
+            return info['version']
+        stat = os.stat(self.data_path)
+        return f"mtime-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def current(self):
+        # (version, TripQueryService); the marker is checked at most every check_interval seconds
+        with self._lock:
+            now = time.monotonic()
+            if self.service is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = self.current_version()
+                if version != self.version:
+                    self.service = self._load(version)
+                    self.version = version
+                elif not self.sort_index_attached:
+                    # The sort index is built after the data is saved, so it may show up later
+                    sort_index = self._sort_index(version)
+                    if sort_index is not None:
+                        self._attach_sort_index(self.service.store, sort_index)
+            return self.version, self.service
+
+    def _sort_index(self, version):
+        # The SortIndex written for this version of the data, or None
+        try:
+            stat = os.stat(self.sort_index_path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) == self._sort_index_seen:
+            return None
+        self._sort_index_seen = (stat.st_size, stat.st_mtime_ns)
+        try:
+            sort_index = SortIndex.load(self.sort_index_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return sort_index if sort_index.version == version else None
+
+    def _attach_sort_index(self, store, sort_index):
+        self.sort_index_attached = store.attach_sort_index(sort_index)
+        if self.sort_index_attached:
+            print(f"Using sort index {self.sort_index_path} for {', '.join(sorted(store.sorted))}")
+        else:
+            print(f"Ignoring {self.sort_index_path}: it doesn't match the data")
+
+    def _load(self, version):
+        start_time = time.time()
+        store = TripStore.load(self.data_path)
+        print(f"Loaded {store.size} trips from {self.data_path} in {time.time() - start_time:.2f}s")
+        self.sort_index_attached = False
+        self._sort_index_seen = None
+        sort_index = self._sort_index(version)
+        if sort_index is not None:
+            self._attach_sort_index(store, sort_index)
+
+        rollups = None
+        if os.path.exists(self.rollup_path):
+            rollups = RollupCube.load(self.rollup_path)
+            # A cube left over from a different run would give wrong answers, so it must match the data
+            if rollups.trip_count != store.size:
+                print(f"Ignoring {self.rollup_path}: {rollups.trip_count} trips, data has {store.size}")
+                rollups = None
+            else:
+                print(f"Loaded {len(rollups)} rollup cells from {self.rollup_path}")
+        return TripQueryService(store, rollups)
+
+
+class CachedTripQueries:
+    # Serialized API responses with an LRU cache in front of the query service
+    def __init__(self, source, cache=None):
+        self.source = source
+        self.cache = cache if cache is not None else QueryCache()
+
+    def respond(self, path, query_string):
+        # (status, headers, JSON body bytes)
+        if path.rstrip('/') == '/api/cache/stats':
+            return HTTPStatus.OK, {}, json.dumps(self.cache.stats()).encode()
+
+        version, service = self.source.current()
+        self.cache.set_version(version)
+        try:
+            key = cache_key(path, parse_qs(query_string, keep_blank_values=True))
+        except ValueError:
+            key = None   # invalid parameters: the service answers with a 400, which isn't cached
+        if key is not None:
+            cached = self.cache.get(key, version)
+            if cached is not None:
+                status, headers, body = cached
+                return status, dict(headers, **{'X-Cache': 'HIT', 'X-Data-Version': version}), body
+
+        status, headers, payload = service.handle(path, query_string)
+        body = json.dumps(payload).encode()
+        if key is not None and status == HTTPStatus.OK:
+            self.cache.put(key, (status, headers, body), len(body), version)
+        return status, dict(headers, **{'X-Cache': 'MISS', 'X-Data-Version': version}), body
+
+
+class TripQueryServer:
+    def __init__(self, queries, static_dir=None):
+        self.queries = queries
+        self.static_dir = os.path.realpath(static_dir) if static_dir else None
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        _, service = self.queries.source.current()
+        print(f"Serving {service.store.size} trips on http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Headers are read and discarded; every response closes the connection
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] not in ('GET', 'HEAD'):
+                status, headers, body = HTTPStatus.METHOD_NOT_ALLOWED, {}, b''
+            else:
+                url = urlsplit(parts[1])
+                if url.path.startswith('/api/'):
+                    # Queries run on a worker thread so the event loop keeps accepting connections
+                    loop = asyncio.get_running_loop()
+                    status, headers, body = await loop.run_in_executor(
+                        None, self.queries.respond, url.path, url.query)
+                    headers = dict(headers, **{'Content-Type': 'application/json'})
+                else:
+                    status, headers, body = self._static_file(unquote(url.path))
+                if parts[0] == 'HEAD':
+                    headers['Content-Length'] = str(len(body))
+                    body = b''
+            writer.write(self._response(status, headers, body))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _static_file(self, path):
+        # index.html and frontend/ assets, confined to static_dir
+        if self.static_dir is None:
+            return HTTPStatus.NOT_FOUND, {}, b''
+        relative = 'index.html' if path in ('', '/') else path.lstrip('/')
+        full_path = os.path.realpath(os.path.join(self.static_dir, relative))
+        if os.path.commonpath([full_path, self.static_dir]) != self.static_dir or not os.path.isfile(full_path):
+            return HTTPStatus.NOT_FOUND, {}, b''
+        with open(full_path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        return HTTPStatus.OK, {'Content-Type': content_type}, body
+
+    @staticmethod
+    def _response(status, headers, body):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        headers = dict(headers)
+        headers.setdefault('Content-Length', str(len(body)))
+        headers['Connection'] = 'close'
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Serve the dashboard trip API from cleaned data")
+    parser.add_argument('--data', default=os.path.join(base_dir, '..', 'processed', 'train_cleaned.csv'),
+                        help="save_cleaned_data output (csv, parquet, feather, columnar store or partitioned directory)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--rollups', default=None,
+                        help=f"RollupCube file (default: {ROLLUP_FILE} next to the data, if present)")
+    parser.add_argument('--static-dir', default=os.path.join(base_dir, '..'),
+                        help="directory holding index.html and frontend/")
+    parser.add_argument('--cache-mb', type=float, default=64, help="query result cache size (0 disables it)")
+    args = parser.parse_args()
+
+    source = TripDataSource(args.data, args.rollups)
+    source.current()
+    queries = CachedTripQueries(source, QueryCache(int(args.cache_mb * 1024**2)))
+    server = TripQueryServer(queries, static_dir=args.static_dir)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
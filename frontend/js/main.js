@@ -88,18 +88,39 @@ document.addEventListener("DOMContentLoaded", function () {
     if (hour) params.push(`hour=${hour}`);
     if (distance) params.push(`distance=${distance}`);
     if (zone) params.push(`zone=${encodeURIComponent(zone)}`);
-    if (fare) params.push(`fare=${fare}`);
+    if (fare && !fareSlider.parentElement.hidden) params.push(`fare=${fare}`);
     // Return concatenated query string or empty if no filters applied
     return params.length ? "?" + params.join("&") : "";
   }
 
+  // Hide filters the loaded data can't answer (e.g. zone without zone columns, fare without fares);
+  // the API ignores them, and a table column without data can't be sorted either
+  function hideUnavailableFilters(names) {
+    if (!names) return;
+    names.split(",").forEach(name => {
+      const input = document.getElementById(name);
+      if (input) {
+        input.value = "";
+        input.parentElement.hidden = true;
+      }
+      const header = document.querySelector(`#tripTable th[data-sort="${name}"]`);
+      if (header) {
+        header.removeAttribute("data-sort");
+        header.onclick = null;
+      }
+    });
+  }
+
   // Fetch all relevant data from backend API endpoints and update UI components accordingly
   function fetchAndUpdate() {
     const params = buildQueryParams();
 
     // Fetch summary statistics like total trips, average duration, busiest hour
     fetch(`/api/trips/summary${params}`)
-      .then(res => res.json())
+      .then(res => {
+        hideUnavailableFilters(res.headers.get("X-Unavailable-Filters"));
+        return res.json();
+      })
       .then(data => {
         document.getElementById("trip-count").textContent = `Trips: ${data.total_trips}`;
         document.getElementById("avg-duration").textContent = `Avg Duration: ${data.avg_duration_sec} sec`;
@@ -137,7 +158,7 @@ document.addEventListener("DOMContentLoaded", function () {
                       <td>${trip.dropoff_location}</td>
                       <td>${trip.duration_sec}</td>
                       <td>${trip.distance_km}</td>
-                      <td>${trip.fare}</td>`;
+                      <td>${trip.fare ?? "n/a"}</td>`;
       tbody.appendChild(tr);
     });
   }